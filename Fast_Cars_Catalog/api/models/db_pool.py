@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+from sqlalchemy import create_engine as _create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine as _create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .metrics import Histogram, _escape, registry
+
+
+# Engine factory: sized, pre-pinged and instrumented connection pools.
+#
+# The services build their SQLAlchemy engines here (Flask-SQLAlchemy through
+# SQLALCHEMY_ENGINE_OPTIONS = engine_options(...)), so every engine reads the
+# same DB_POOL_* settings and reports its pool on /metrics: connections
+# checked out, the wait for a connection, and connections opened beyond
+# pool_size (overflow). When no connection frees up within DB_POOL_TIMEOUT
+# seconds SQLAlchemy raises TimeoutError (PoolTimeout here); the services
+# answer it with 503 and a Retry-After header instead of holding the client.
+#
+#   DB_POOL_SIZE      connections kept open
+#   DB_MAX_OVERFLOW   extra connections allowed under load, closed when returned
+#   DB_POOL_TIMEOUT   seconds a request waits for a free connection
+#   DB_POOL_RECYCLE   seconds after which a connection is replaced (-1 = never)
+#   DB_POOL_PRE_PING  test connections on checkout (default: on, except for SQLite files)
+#   DB_RETRY_AFTER    Retry-After seconds sent with the 503
+
+POOL_SETTINGS = (
+    ("pool_size", "DB_POOL_SIZE", "5", int),
+    ("max_overflow", "DB_MAX_OVERFLOW", "10", int),
+    ("pool_timeout", "DB_POOL_TIMEOUT", "10", float),
+    ("pool_recycle", "DB_POOL_RECYCLE", "-1", int),
+    ("pool_pre_ping", "DB_POOL_PRE_PING", "", lambda value: value.lower() in ("1", "true", "yes", "on")),
+)
+
+RETRY_AFTER = os.getenv("DB_RETRY_AFTER", "1")
+POOL_TIMEOUT_MESSAGE = "Database busy, retry later"
+
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a pooled connection, including opening a new one.",
+    ("engine",), WAIT_BUCKETS)
+
+
+def pool_settings(environ=None) -> dict:
+    """The pool keyword arguments of create_engine(), with environment overrides.
+
+    `pool_pre_ping` is None when DB_POOL_PRE_PING is blank (decided per URL).
+    """
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for name, env_var, default, parse in POOL_SETTINGS:
+        value = environ.get(env_var, default).strip()
+        try:
+            settings[name] = parse(value) if value else None
+        except ValueError:
+            raise ValueError(f"Invalid value for {env_var}: {value!r}") from None
+    return settings
+
+
+class PoolStats:
+    """Counters of one engine's pool; `pool` is its current pool (dispose() replaces it)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.overflow_connections = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def overflowed(self):
+        with self._lock:
+            self.overflow_connections += 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+_pool_stats = {}
+
+
+def pool_stats(name: str) -> PoolStats:
+    stats = _pool_stats.get(name)
+    if stats is None:
+        stats = _pool_stats[name] = PoolStats(name)
+    return stats
+
+
+class _InstrumentedPool:
+    # create_engine() hands its `pool_stats` argument to the pool class
+    def __init__(self, creator, pool_stats: PoolStats = None, **kw):
+        super().__init__(creator, **kw)
+        self.pool_stats = pool_stats
+        if pool_stats is not None:
+            pool_stats.pool = self
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.pool_stats = self.pool_stats
+        if self.pool_stats is not None:
+            self.pool_stats.pool = pool
+        return pool
+
+    def _do_get(self):
+        if self.pool_stats is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            self.pool_stats.timed_out()
+            raise
+        finally:
+            checkout_wait.observe(time.perf_counter() - started, self.pool_stats.name)
+
+    def _create_connection(self):
+        # QueuePool counts the new connection before opening it; above zero it is overflow
+        if self.pool_stats is not None and self.overflow() > 0:
+            self.pool_stats.overflowed()
+        return super()._create_connection()
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, name: str = "primary", settings: dict = None) -> dict:
+    """Pool keyword arguments for create_engine()/create_async_engine() or SQLALCHEMY_ENGINE_OPTIONS."""
+    parsed = make_url(url)
+    sqlite = parsed.get_backend_name() == "sqlite"
+    if sqlite and parsed.database in (None, "", ":memory:"):
+        # in-memory SQLite uses a single shared connection; there is no pool to size
+        return {}
+    options = dict(pool_settings() if settings is None else settings)
+    if options["pool_pre_ping"] is None:
+        # a SQLite file cannot drop a connection; a database server (or a proxy) can
+        options["pool_pre_ping"] = not sqlite
+    options = {key: value for key, value in options.items() if value is not None}
+    options["poolclass"] = InstrumentedAsyncQueuePool if parsed.get_dialect().is_async else InstrumentedQueuePool
+    options["pool_stats"] = pool_stats(name)
+    return options
+
+
+def create_engine(url: str, name: str = "primary", **kwargs):
+    return _create_engine(url, **engine_options(url, name), **kwargs)
+
+
+def create_async_engine(url: str, name: str = "primary", **kwargs):
+    return _create_async_engine(url, **engine_options(url, name), **kwargs)
+
+
+def render_pool_metrics() -> list:
+    gauges = (
+        ("db_pool_size", "gauge", "Connections the pool keeps open.", lambda stats: stats.pool.size()),
+        ("db_pool_checked_out", "gauge", "Connections currently checked out.", lambda stats: stats.pool.checkedout()),
+        ("db_pool_overflow", "gauge", "Open connections beyond pool_size.", lambda stats: max(stats.pool.overflow(), 0)),
+        ("db_pool_overflow_connections_total", "counter", "Connections opened beyond pool_size.",
+         lambda stats: stats.overflow_connections),
+        ("db_pool_checkout_timeouts_total", "counter", "Checkouts that gave up after pool_timeout.",
+         lambda stats: stats.timeouts),
+    )
+    engines = [stats for _, stats in sorted(_pool_stats.items()) if stats.pool is not None]
+    lines = []
+    for metric, kind, help, value in gauges:
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{engine="{_escape(stats.name)}"}} {value(stats)}' for stats in engines]
+    return lines + checkout_wait.render()
+
+
+registry.collectors.append(render_pool_metrics)
+
+
+# 503 + Retry-After for a pool timeout
+
+def retry_headers() -> dict:
+    return {"Retry-After": RETRY_AFTER}
+
+
+def asgi_pool_timeout_handler(body: dict = None):
+    """A FastAPI/Starlette exception handler for PoolTimeout."""
+    from starlette.responses import JSONResponse
+
+    body = {"detail": POOL_TIMEOUT_MESSAGE} if body is None else body
+
+    async def handle_pool_timeout(request, exc):
+        return JSONResponse(body, 503, headers=retry_headers())
+
+    return handle_pool_timeout
+
+
+def flask_pool_timeout_response(body: dict = None):
+    """The 503 response, for views (like Flask-RESTful resources) that handle errors themselves."""
+    from flask import jsonify
+
+    response = jsonify({"error": POOL_TIMEOUT_MESSAGE} if body is None else body)
+    response.status_code = 503
+    response.headers.update(retry_headers())
+    return response
+
+
+def init_flask(app, body: dict = None):
+    """Answer PoolTimeout raised by any view of `app` with 503."""
+    app.register_error_handler(PoolTimeout, lambda error: flask_pool_timeout_response(body))
+    return app
+
+
+def graphql_error_formatter(error, debug: bool = False) -> dict:
+    """Ariadne error_formatter that lets a PoolTimeout out of graphql(), so it becomes the 503."""
+    from ariadne import format_error
+
+    if isinstance(error.original_error, PoolTimeout):
+        raise error.original_error
+    return format_error(error, debug)
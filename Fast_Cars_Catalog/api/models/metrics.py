@@ -0,0 +1,262 @@
+import time
+import bisect
+import threading
+import contextvars
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Per-request timings and Prometheus-style metrics.
+#
+# Each request gets a RequestMetrics in a context variable. SQLAlchemy cursor
+# events add SQL time and the query count to it. Payload encoding adds
+# serialization time and the number of rows returned. When the request ends,
+# the values feed the histograms served on /metrics and go back to the client
+# as a Server-Timing header. The same module is shared by the FastAPI
+# service (MetricsMiddleware) and the Flask services (init_flask), so their
+# numbers line up.
+
+METRICS_PATH = "/metrics"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {values[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        labels = ("method", "route", "status")
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Request latency.", labels, LATENCY_BUCKETS)
+        self.sql_seconds = Histogram(
+            "http_request_sql_seconds", "Time spent in SQL per request.", labels, LATENCY_BUCKETS)
+        self.sql_queries = Histogram(
+            "http_request_sql_queries", "SQL statements per request.", labels, QUERY_BUCKETS)
+        self.rows = Histogram(
+            "http_response_rows", "Rows encoded into the response payload (0 when served from a cache).", labels, ROW_BUCKETS)
+        self.serialize_seconds = Histogram(
+            "http_response_serialize_seconds", "Time spent encoding the response.", labels, LATENCY_BUCKETS)
+        self.histograms = (self.request_seconds, self.sql_seconds, self.sql_queries, self.rows, self.serialize_seconds)
+        # callables returning more exposition lines (e.g. the pool metrics of db_pool.py)
+        self.collectors = []
+
+    def observe(self, request: "RequestMetrics", method: str, route: str, status: int):
+        labels = (method, route, str(status))
+        self.request_seconds.observe(request.elapsed, *labels)
+        self.sql_seconds.observe(request.sql_seconds, *labels)
+        self.sql_queries.observe(request.queries, *labels)
+        self.rows.observe(request.rows, *labels)
+        self.serialize_seconds.observe(request.serialize_seconds, *labels)
+
+    def render(self) -> str:
+        lines = [line for histogram in self.histograms for line in histogram.render()]
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    __slots__ = ("started", "elapsed", "sql_seconds", "queries", "rows", "serialize_seconds")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.sql_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+
+    def finish(self) -> "RequestMetrics":
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def server_timing(self) -> str:
+        return (
+            f"app;dur={self.elapsed * 1000:.2f}, "
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize_seconds * 1000:.2f};desc="{self.rows} rows"'
+        )
+
+
+registry = MetricsRegistry()
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def payload_rows(content) -> int:
+    """Rows in a response payload: a list, or the list (or object) under "data"."""
+    if isinstance(content, dict):
+        content = content.get("data")
+        if isinstance(content, dict):
+            return 1
+    return len(content) if isinstance(content, list) else 0
+
+
+def record_serialization(seconds: float, content):
+    request = _current.get()
+    if request is not None:
+        request.serialize_seconds += seconds
+        request.rows += payload_rows(content)
+
+
+# SQLAlchemy: every Engine (sync, or the sync side of an async engine)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_query_start"].pop()
+    request = _current.get()
+    if request is not None:
+        request.sql_seconds += time.perf_counter() - started
+        request.queries += 1
+
+
+def instrument_sqlalchemy():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ASGI (FastAPI / Starlette)
+
+class MetricsMiddleware:
+    """Times every HTTP request and serves the registry on METRICS_PATH."""
+
+    def __init__(self, app, path: str = METRICS_PATH):
+        self.app = app
+        self.path = path
+        instrument_sqlalchemy()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if scope["path"] == self.path:
+            return await self._serve_metrics(send)
+
+        request = RequestMetrics()
+        token = _current.set(request)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                request.finish()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", request.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if not request.elapsed:
+                request.finish()
+            route = scope.get("route")
+            registry.observe(request, scope["method"], getattr(route, "path", "unmatched"), status)
+
+    async def _serve_metrics(self, send):
+        body = registry.render().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/plain; version=0.0.4"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Flask
+
+def init_flask(app, path: str = METRICS_PATH):
+    """Install the request hooks, timed JSON encoding and the metrics route on a Flask app."""
+    from flask import Response, request
+
+    instrument_sqlalchemy()
+
+    class TimedJSONProvider(type(app.json)):
+        def response(self, *args, **kwargs):
+            started = time.perf_counter()
+            response = super().response(*args, **kwargs)
+            content = args[0] if len(args) == 1 else (args or kwargs)
+            record_serialization(time.perf_counter() - started, content)
+            return response
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_metrics():
+        if request.path != path:
+            request.environ["metrics.token"] = _current.set(RequestMetrics())
+
+    def finish(status: int, response=None):
+        token = request.environ.pop("metrics.token", None)
+        if token is None:
+            return
+        request_metrics = _current.get().finish()
+        _current.reset(token)
+        if response is not None:
+            response.headers["Server-Timing"] = request_metrics.server_timing()
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        registry.observe(request_metrics, request.method, route, status)
+
+    @app.after_request
+    def finish_request_metrics(response):
+        finish(response.status_code, response)
+        return response
+
+    @app.teardown_request
+    def finish_failed_request_metrics(error):
+        # after_request hooks are skipped when an exception leaves the app
+        # (PROPAGATE_EXCEPTIONS, as in debug and testing) or an earlier hook
+        # raised; the request still counts, as a 500 without Server-Timing
+        finish(500)
+
+    app.add_url_rule(path, "metrics", lambda: Response(registry.render(), mimetype="text/plain; version=0.0.4"))
+    return app
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional
+    msgspec = None
+
+
+# JSON encoding for the read endpoints.
+#
+# Handlers select plain columns, so rows come back as `Row` tuples with no
+# ORM instances or identity-map bookkeeping. Each row becomes one dict, and
+# the body goes to the fastest available encoder in a single pass:
+# FastJSONResponse does not go through `jsonable_encoder`. orjson and
+# msgspec are optional; set JSON_ENCODER to pick one, otherwise the first
+# installed of orjson, msgspec and json is used.
+
+
+def _stdlib_dumps(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+ENCODERS = {"json": _stdlib_dumps}
+if msgspec is not None:
+    ENCODERS["msgspec"] = msgspec.json.Encoder().encode
+if orjson is not None:
+    ENCODERS["orjson"] = orjson.dumps
+
+PREFERRED_ENCODERS = ("orjson", "msgspec", "json")
+
+
+def encoder_name(environ=None) -> str:
+    """JSON_ENCODER if it is installed, else the first available of PREFERRED_ENCODERS."""
+    environ = os.environ if environ is None else environ
+    name = environ.get("JSON_ENCODER", "").strip().lower()
+    if name in ENCODERS:
+        return name
+    return next(name for name in PREFERRED_ENCODERS if name in ENCODERS)
+
+
+ENCODER = encoder_name()
+dumps = ENCODERS[ENCODER]
+
+
+# Called with (seconds, content) after every encode() (see metrics.py)
+render_hooks = []
+
+
+def encode(content) -> bytes:
+    """`dumps(content)`, reported to the render hooks."""
+    if not render_hooks:
+        return dumps(content)
+    started = time.perf_counter()
+    body = dumps(content)
+    elapsed = time.perf_counter() - started
+    for hook in render_hooks:
+        hook(elapsed, content)
+    return body
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded with `encode`; content must already be plain JSON types."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode(content)
+
+
+def columns(model) -> list:
+    """The table columns of `model`, for `select(*columns(model))`."""
+    return list(model.__table__.columns)
+
+
+def row_dicts(rows, fields: tuple = ()) -> list:
+    """One dict per `Row`, keyed by column label, limited to `fields` if given."""
+    rows = list(rows)
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    if not fields or tuple(fields) == tuple(keys):
+        return [dict(zip(keys, row)) for row in rows]
+    positions = [(field, keys.index(field)) for field in fields]
+    return [{field: row[i] for field, i in positions} for row in rows]
+
+
+def project(items: list, fields: tuple = ()) -> list:
+    """`items` (dicts) limited to `fields`, or unchanged when no fields are given."""
+    if not fields:
+        return items
+    return [{field: item[field] for field in fields} for item in items]
@@ -1,18 +1,63 @@
-from sqlalchemy import create_engine
+import os
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import Base
+from .db_pool import create_async_engine, create_engine
+from .count_cache import count_cache
+from .sqlite_tuning import apply_pragmas, pragma_settings, read_pragmas
 
-DATABASE_URL = "sqlite:///carcatlog.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///carcatlog.db")
 
-engine: Engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# How the request handlers reach the database, chosen at startup:
+#   sync  - `def` handlers with a Session, run on FastAPI's threadpool
+#   async - `async def` handlers with an AsyncSession (aiosqlite), run on the event loop
+DB_MODES = ('sync', 'async')
+DB_MODE = os.getenv("DB_MODE", "sync").strip().lower()
+if DB_MODE not in DB_MODES:
+    raise ValueError(f"Invalid DB_MODE: {DB_MODE!r} (expected one of {', '.join(DB_MODES)})")
+
+# Async driver URL; derived from DATABASE_URL (sqlite:// -> sqlite+aiosqlite://) unless set
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+
+def async_url(url: str) -> str:
+    """`url` with the async driver of its dialect (only SQLite is mapped)."""
+    parsed = make_url(url)
+    if parsed.drivername in ("sqlite", "sqlite+pysqlite"):
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+# Pool sizing, pre-ping and pool metrics: DB_POOL_* settings (see db_pool.py)
+engine: Engine = create_engine(DATABASE_URL, "sync", connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# WAL, mmap, cache_size, ... on every pooled connection (see sqlite_tuning.py)
+sqlite_pragmas = apply_pragmas(engine, pragma_settings())
+
+# Startup, seeding and the export stream always use the sync engine; the
+# async engine only exists in async mode (it needs aiosqlite)
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == 'async':
+    _async_url = ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+    async_engine = create_async_engine(_async_url, "async")
+    apply_pragmas(async_engine, sqlite_pragmas)
+    AsyncSessionLocal = sessionmaker(bind=async_engine, expire_on_commit=False, class_=AsyncSession)
+
 
 def init_db():
     # Reset DB and create tables
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    count_cache.invalidate()
+
+
+def applied_pragmas() -> dict:
+    """The SQLite settings in effect on a pooled connection."""
+    with engine.connect() as conn:
+        return read_pragmas(conn, sqlite_pragmas)
 
 
 def get_db():
@@ -21,3 +66,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
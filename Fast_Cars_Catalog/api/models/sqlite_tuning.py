@@ -0,0 +1,64 @@
+import os
+import re
+from sqlalchemy import event
+
+
+# Connection-level SQLite settings, applied to every pooled connection as it
+# is opened. Each one can be overridden with an environment variable; an
+# empty value leaves SQLite's own default in place.
+#
+#   journal_mode=WAL     readers no longer block the writer (and vice versa)
+#   synchronous=NORMAL   safe under WAL; fsync at checkpoints, not on every commit
+#   cache_size           negative values are KiB (-65536 = 64 MiB page cache)
+#   mmap_size            bytes of the file read through memory-mapped I/O
+#   temp_store=MEMORY    sorts and temp b-trees stay off disk
+#   busy_timeout         ms a writer waits for the lock instead of failing
+SQLITE_PRAGMAS = (
+    ("journal_mode", "SQLITE_JOURNAL_MODE", "WAL"),
+    ("synchronous", "SQLITE_SYNCHRONOUS", "NORMAL"),
+    ("cache_size", "SQLITE_CACHE_SIZE", "-65536"),
+    ("mmap_size", "SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    ("temp_store", "SQLITE_TEMP_STORE", "MEMORY"),
+    ("busy_timeout", "SQLITE_BUSY_TIMEOUT", "5000"),
+)
+
+_PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+def pragma_settings(environ=None) -> dict:
+    """The pragmas to apply, with environment overrides and blanks dropped."""
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for name, env_var, default in SQLITE_PRAGMAS:
+        value = environ.get(env_var, default).strip()
+        if not value:
+            continue
+        if not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"Invalid value for {env_var}: {value!r}")
+        settings[name] = value
+    return settings
+
+
+def apply_pragmas(engine, settings: dict):
+    """Run `settings` as PRAGMA statements on every new connection of `engine`.
+
+    Accepts both sync and async engines; for an async engine the hook is
+    registered on its underlying sync engine.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return settings
+
+
+def read_pragmas(connection, settings: dict) -> dict:
+    """Read back the values SQLite actually uses for `settings` (sync Connection)."""
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in settings}
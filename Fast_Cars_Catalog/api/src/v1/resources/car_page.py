@@ -0,0 +1,113 @@
+import math
+from typing import Optional
+from fastapi import Query
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.models.models import Car
+from api.models.count_cache import COUNT_MODES, count_cache
+from api.models.query_builder import CarQuery, CarQuerySpec
+from api.models.serialization import row_dicts
+
+car_query = CarQuery(Car)
+
+
+class PageQuery:
+    """Query parameters shared by getcarsbypage and getcarsbypagebymultisort."""
+
+    def __init__(self, page: int, size: int, count: str, filters: dict):
+        self.page = page
+        self.size = size
+        self.count = count
+        self.filters = filters
+
+    def spec(self) -> CarQuerySpec:
+        return car_query.spec(**self.filters)
+
+
+async def page_query(
+    page: int = Query(1, ge=1),
+    size: int = Query(10, ge=1),
+    brand: str = '%',
+    model: str = '%',
+    transmission: str = '%',
+    price_operator: Optional[str] = None,
+    price: int = 0,
+    price_max: Optional[int] = None,
+    sort_by: Optional[str] = None,
+    sort_direction: str = 'asc',
+    count: str = 'exact',
+    fields: Optional[str] = None,
+) -> PageQuery:
+    # async so it runs on the event loop; a sync dependency would take a threadpool hop in async mode
+    return PageQuery(page, size, count, dict(
+        brand=brand, model=model, transmission=transmission,
+        price_operator=price_operator, price=price, price_max=price_max,
+        sort_by=sort_by, sort_direction=sort_direction, fields=fields
+    ))
+
+
+def _check_count_mode(count: str):
+    if count not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode: {count}")
+
+
+def _uncounted_page(cars: list, spec: CarQuerySpec, page: int, size: int) -> dict:
+    # one extra row was fetched instead of counting to know if a next page exists
+    return {
+        'data': row_dicts(cars[:size], spec.fields),
+        'page': page,
+        'size': size,
+        'total_elements': None,
+        'total_page': None,
+        'has_next': len(cars) > size
+    }
+
+
+def _counted_page(cars, spec: CarQuerySpec, page: int, size: int, total: int) -> dict:
+    return {
+        'data': row_dicts(cars, spec.fields),
+        'page': page,
+        'size': size,
+        'total_elements': total,
+        'total_page': math.ceil(total / size) if total > 0 else 0
+    }
+
+
+def fetch_car_page(db: Session, spec: CarQuerySpec, page: int, size: int, count: str = 'exact') -> dict:
+    """Run the count and page statements for `spec` and build the page response."""
+    _check_count_mode(count)
+    offset = (page - 1) * size
+
+    if count == 'none':
+        stmt, params = car_query.page(spec, offset, size + 1)
+        return _uncounted_page(db.execute(stmt, params).all(), spec, page, size)
+
+    total = count_cache.get(spec.count_key, allow_stale=(count == 'estimate'))
+    if total is None:
+        generation = count_cache.generation
+        stmt, params = car_query.count(spec)
+        total = db.execute(stmt, params).scalar_one()
+        count_cache.put(spec.count_key, total, generation)
+
+    stmt, params = car_query.page(spec, offset, size)
+    return _counted_page(db.execute(stmt, params), spec, page, size, total)
+
+
+async def fetch_car_page_async(db: AsyncSession, spec: CarQuerySpec, page: int, size: int, count: str = 'exact') -> dict:
+    """`fetch_car_page` on an AsyncSession (DB_MODE=async)."""
+    _check_count_mode(count)
+    offset = (page - 1) * size
+
+    if count == 'none':
+        stmt, params = car_query.page(spec, offset, size + 1)
+        return _uncounted_page((await db.execute(stmt, params)).all(), spec, page, size)
+
+    total = count_cache.get(spec.count_key, allow_stale=(count == 'estimate'))
+    if total is None:
+        generation = count_cache.generation
+        stmt, params = car_query.count(spec)
+        total = (await db.execute(stmt, params)).scalar_one()
+        count_cache.put(spec.count_key, total, generation)
+
+    stmt, params = car_query.page(spec, offset, size)
+    return _counted_page(await db.execute(stmt, params), spec, page, size, total)
@@ -0,0 +1,62 @@
+import io
+import csv
+import json
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from api.models.models import Car
+from api.models.session import engine
+
+# Rows fetched from the cursor per batch; memory use is bounded by one batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _ndjson_chunks(columns, partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def _csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_cars(fmt: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the whole car table encoded as `fmt`, one batch of rows at a time.
+
+    Plain column tuples are read through a streaming cursor, so no ORM
+    objects are built and the full table is never held in memory. The
+    connection is opened here rather than taken from `get_db` because it must
+    stay open until the response body has been sent.
+    """
+    columns = [c.name for c in Car.__table__.columns]
+    stmt = select(*Car.__table__.columns)
+    encode = _ndjson_chunks if fmt == 'ndjson' else _csv_chunks
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        yield from encode(columns, result.partitions())
+
+
+def export_cars(format: str = 'ndjson'):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid export format: {format}")
+
+    return StreamingResponse(
+        stream_cars(format),
+        media_type=EXPORT_FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="cars.{format}"'}
+    )
@@ -1,13 +1,38 @@
 from fastapi import Depends, HTTPException
-from typing import List
+from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from api.models.models import Car
-from api.models.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.models.query_builder import InvalidQuery
+from api.models.db_pool import PoolTimeout
+from api.models.session import get_async_db, get_db
+from api.models.serialization import FastJSONResponse, row_dicts
+from .car_page import car_query
 
 
-def get_cars(db: Session = Depends(get_db)) -> List[dict]:
+def _selected_columns(fields: Optional[str]) -> list:
     try:
-        cars = db.query(Car).all()
-        return [car.to_json() for car in cars]
+        return car_query.select_list(car_query.fields(fields))
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_cars(fields: Optional[str] = None, db: Session = Depends(get_db)) -> FastJSONResponse:
+    selected = _selected_columns(fields)
+    try:
+        # plain rows straight to JSON, without the ORM or response validation
+        return FastJSONResponse(row_dicts(db.execute(select(*selected))))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def get_cars_async(fields: Optional[str] = None, db: AsyncSession = Depends(get_async_db)) -> FastJSONResponse:
+    selected = _selected_columns(fields)
+    try:
+        return FastJSONResponse(row_dicts(await db.execute(select(*selected))))
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,64 +1,35 @@
-from fastapi import Depends, HTTPException, Query
-from typing import Optional
+from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
-from api.models.models import Car
-from api.models.session import get_db
-from sqlalchemy import and_, asc, desc
-import math
+from sqlalchemy.ext.asyncio import AsyncSession
+from api.models.db_pool import PoolTimeout
+from api.models.session import get_async_db, get_db
+from api.models.serialization import FastJSONResponse
+from .car_page import PageQuery, fetch_car_page, fetch_car_page_async, page_query
 
 
-def get_cars_by_page(
-    page: int = Query(1, ge=1),
-    size: int = Query(10, ge=1),
-    brand: str = '%',
-    model: str = '%',
-    transmission: str = '%',
-    price_operator: Optional[str] = None,
-    price: int = 0,
-    price_max: Optional[int] = None,
-    sort_by: Optional[str] = None,
-    sort_direction: str = 'asc',
-    db: Session = Depends(get_db)
-):
-    try:
-        price_max_value = price_max if price_max is not None else price + 1
-
-        query = db.query(Car)
-
-        query = query.filter(
-            and_(
-                Car.brand.ilike(f"%{brand}%"),
-                Car.model.ilike(f"%{model}%"),
-                Car.transmission.ilike(f"%{transmission}%")
-            )
-        )
-
-        if price_operator == 'lte':
-            query = query.filter(Car.price <= price)
-        elif price_operator == 'gte':
-            query = query.filter(Car.price >= price)
-        elif price_operator == 'between':
-            query = query.filter(Car.price >= price, Car.price <= price_max_value)
+def _single_sort_spec(query: PageQuery):
+    # this endpoint sorts on one field; getcarsbypagebymultisort takes a list
+    sort_by = query.filters['sort_by']
+    if sort_by and ',' in sort_by:
+        raise ValueError(f"Invalid sort field: {sort_by}")
+    return query.spec()
 
-        if sort_by:
-            if sort_direction == 'asc':
-                query = query.order_by(asc(getattr(Car, sort_by)))
-            else:
-                query = query.order_by(desc(getattr(Car, sort_by)))
 
-        total = query.count()
-        pages = math.ceil(total / size) if total > 0 else 0
-        offset = (page - 1) * size
-        cars = query.offset(offset).limit(size).all()
+def get_cars_by_page(query: PageQuery = Depends(page_query), db: Session = Depends(get_db)):
+    try:
+        spec = _single_sort_spec(query)
+        return FastJSONResponse(fetch_car_page(db, spec, query.page, query.size, query.count))
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        cars_response = [car.to_json() for car in cars]
 
-        return {
-            'data': cars_response,
-            'page': page,
-            'size': size,
-            'total_elements': total,
-            'total_page': pages
-        }
+async def get_cars_by_page_async(query: PageQuery = Depends(page_query), db: AsyncSession = Depends(get_async_db)):
+    try:
+        spec = _single_sort_spec(query)
+        return FastJSONResponse(await fetch_car_page_async(db, spec, query.page, query.size, query.count))
+    except PoolTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
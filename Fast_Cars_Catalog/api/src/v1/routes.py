@@ -2,12 +2,33 @@ from fastapi import APIRouter
 from typing import List
 
 from . import schemas
-from .resources.get_cars import get_cars
-from .resources.getcars_bypage import get_cars_by_page
-from .resources.getcars_multisort import get_cars_by_multisort
+from api.models.serialization import FastJSONResponse
+from api.models.session import DB_MODE
+from .resources.get_cars import get_cars, get_cars_async
+from .resources.getcars_bypage import get_cars_by_page, get_cars_by_page_async
+from .resources.getcars_multisort import get_cars_by_multisort, get_cars_by_multisort_async
+from .resources.export_cars import export_cars
 
 router = APIRouter(prefix='/requests', tags=["requests"])
 
-router.get('/getcars', response_model=List[schemas.CarSchema])(get_cars)
-router.get('/getcarsbypage')(get_cars_by_page)
-router.get('/getcarsbypagebymultisort')(get_cars_by_multisort)
+# /getcars answers with FastJSONResponse and no response_model: with `fields`
+# each car carries only the listed columns, which CarSchema would reject.
+# The schema is still documented, as the full-row shape.
+GET_CARS_RESPONSES = {
+    200: {
+        "model": List[schemas.CarSchema],
+        "description": "Every car; with `fields=`, only the listed columns of each.",
+    },
+}
+
+# DB_MODE=async swaps in the AsyncSession handlers (see api/models/session.py);
+# the export stream stays on the sync engine in both modes
+if DB_MODE == 'async':
+    router.get('/getcars', response_class=FastJSONResponse, responses=GET_CARS_RESPONSES)(get_cars_async)
+    router.get('/getcarsbypage')(get_cars_by_page_async)
+    router.get('/getcarsbypagebymultisort')(get_cars_by_multisort_async)
+else:
+    router.get('/getcars', response_class=FastJSONResponse, responses=GET_CARS_RESPONSES)(get_cars)
+    router.get('/getcarsbypage')(get_cars_by_page)
+    router.get('/getcarsbypagebymultisort')(get_cars_by_multisort)
+router.get('/export')(export_cars)
@@ -1,23 +1,39 @@
 import uuid
 import random
+import logging
 import uvicorn
 from fastapi import FastAPI
-from api.models.session import init_db, SessionLocal
+from api.models import serialization
+from api.models.metrics import MetricsMiddleware, record_serialization
+from api.models.db_pool import PoolTimeout, asgi_pool_timeout_handler, pool_settings
+from api.models.session import DB_MODE, async_engine, init_db, applied_pragmas, SessionLocal
 from api.models.models import Car
 from api.src.v1 import v1_router
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
 
 
 app = FastAPI(title="Fast Cars Catalog")
+logger = logging.getLogger("fast_cars_catalog")
+
+# /metrics and Server-Timing, as in Fast_pagination (see api/models/metrics.py)
+app.add_middleware(MetricsMiddleware)
+serialization.render_hooks.append(record_serialization)
+
+# Pool exhausted for DB_POOL_TIMEOUT seconds: 503 with Retry-After (see api/models/db_pool.py)
+app.add_exception_handler(PoolTimeout, asgi_pool_timeout_handler())
 
 
 @app.on_event("startup")
 def startup_event():
     # Initialize DB and populate sample data
     init_db()
+    logger.info("SQLite settings: %s", ", ".join(f"{k}={v}" for k, v in applied_pragmas().items()))
+    logger.info("DB mode: %s", DB_MODE)
+    logger.info("Connection pool: %s", ", ".join(f"{k}={'auto' if v is None else v}" for k, v in pool_settings().items()))
     db = SessionLocal()
     try:
-        # Seed with 100 cars
+        # Seed with 100 cars in one executemany and one commit
+        rows = []
         for i in range(1, 101):
             if i <= 33:
                 brand = 'Honda'
@@ -30,13 +46,26 @@ def startup_event():
             transmission = 'AUTOMATIC' if i % 2 != 0 else 'MANUAL'
             price = random.randint(30000, 80000)
             release_year = 2020 + (i % 3)
-            car = Car(str(uuid.uuid4()), brand, model, transmission, price, release_year)
-            db.add(car)
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'brand': brand,
+                'model': model,
+                'transmission': transmission,
+                'price': price,
+                'release_year': release_year
+            })
+        db.execute(insert(Car), rows)
         db.commit()
     finally:
         db.close()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 app.include_router(v1_router)
 
 
@@ -1,3 +1,5 @@
+import json
+import pytest
 from fastapi.testclient import TestClient
 from app import app
 
@@ -5,6 +7,13 @@ from app import app
 client = TestClient(app)
 
 
+@pytest.fixture(scope='module', autouse=True)
+def seeded_db():
+    # Entering the client runs the startup handler, which creates and seeds the DB
+    with client:
+        yield
+
+
 def test_get_cars_root():
     response = client.get('/v1/carsdetails/requests/getcars')
     assert response.status_code == 200
@@ -25,3 +34,62 @@ def test_get_cars_multisort():
     data = response.json()
     assert 'data' in data
     assert isinstance(data['data'], list)
+
+
+def test_get_cars_by_page_without_count():
+    response = client.get('/v1/carsdetails/requests/getcarsbypage?page=1&size=5&count=none')
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data['data']) == 5
+    assert data['total_elements'] is None
+    assert data['has_next'] is True
+
+
+def test_export_cars_ndjson():
+    response = client.get('/v1/carsdetails/requests/export?format=ndjson')
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == len(client.get('/v1/carsdetails/requests/getcars').json())
+    assert set(json.loads(lines[0])) == {'id', 'brand', 'model', 'transmission', 'price', 'release_year'}
+
+
+def test_export_cars_csv():
+    response = client.get('/v1/carsdetails/requests/export?format=csv')
+    assert response.status_code == 200
+    assert response.text.splitlines()[0] == 'id,brand,model,transmission,price,release_year'
+
+
+def test_pool_timeout_returns_503(monkeypatch):
+    from api.models.db_pool import PoolTimeout
+    from api.models.session import async_engine, engine
+
+    def exhausted():
+        raise PoolTimeout("QueuePool limit reached")
+
+    # the handlers of the active DB_MODE check out from this pool
+    monkeypatch.setattr((async_engine or engine).pool, '_do_get', exhausted)
+    response = client.get('/v1/carsdetails/requests/getcarsbypage?page=1&size=5&brand=Ford')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_get_cars_with_fields_is_documented_not_validated():
+    response = client.get('/v1/carsdetails/requests/getcars?fields=id,price')
+    assert response.status_code == 200
+    assert all(set(car) == {"id", "price"} for car in response.json())
+
+    operation = client.get('/openapi.json').json()['paths']['/v1/carsdetails/requests/getcars']['get']
+    content = operation['responses']['200']['content']['application/json']
+    assert content['schema']['items']['$ref'].endswith('/CarSchema')
+
+
+def test_multisort_directions_ignore_case():
+    url = '/v1/carsdetails/requests/getcarsbypagebymultisort?sort_by=price&size=20'
+    prices = [car['price'] for car in client.get(url + '&sort_direction=ASC').json()['data']]
+    assert prices == sorted(prices)
+    prices = [car['price'] for car in client.get(url + '&sort_direction=Desc').json()['data']]
+    assert prices == sorted(prices, reverse=True)
+
+    response = client.get(url + '&sort_direction=dsc')
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid sort direction: dsc'
@@ -1,17 +1,33 @@
+import os
 import math
+import time
 import uuid
-import logging
 from typing import Optional
 from pydantic import BaseModel
 from models import Base, Car, CarSummary
+from pagination import CursorError, decode_cursor, cursor_links
+from count_cache import COUNT_MODES, count_cache, is_unfiltered
+from search import ensure_search_index
+from response_cache import cache_key, etag_matches, response_cache
+import serialization
+from serialization import FastJSONResponse, columns, encode, project, row_dicts
+from metrics import MetricsMiddleware, record_serialization
+from id_lookup import CarLookup
+from index_advisor import IndexAdvisor
+from query_builder import CarQuerySpec, InvalidQuery
+from catalog_query import CatalogQuery
+from bulk import CAR_FIELDS, DEFAULT_BATCH_SIZE, bulk_insert_cars, car_row
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import asynccontextmanager
-from database import async_session, engine
-from sqlalchemy import select, and_, func, text
+from database import engine, session_router, sqlite_pragmas
+from db_pool import PoolTimeout, asgi_pool_timeout_handler, pool_settings
+from routing import READ_METHODS, STICKY_COOKIE, is_sticky_session, parse_last_write
+from sqlite_tuning import read_pragmas
+from sqlalchemy import select, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
-from logging.handlers import RotatingFileHandler
+from queue_logging import parse_sample_rates, setup_logging
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi import FastAPI, Depends, Query, HTTPException, Request, Response
 
 
 class CarCreate(BaseModel):
@@ -22,6 +38,10 @@ class CarCreate(BaseModel):
     release_year: int
 
 
+class CarBulkCreate(BaseModel):
+    cars: list[CarCreate]
+
+
 class CarIdList(BaseModel):
     ids: list[str]
 
@@ -32,8 +52,14 @@ async def lifespan(app: FastAPI):
     # create tables if not exist
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database tables ensured on startup")
+        fts = await conn.run_sync(ensure_search_index)
+        pragmas = await conn.run_sync(read_pragmas, sqlite_pragmas)
+    logger.info("Database tables ensured on startup (full-text search %s)", "enabled" if fts else "unavailable")
+    logger.info("SQLite settings: %s", ", ".join(f"{k}={v}" for k, v in pragmas.items()))
+    logger.info("Read engines: %d (sticky window %ss)", len(session_router.replicas), session_router.sticky_seconds)
+    logger.info("Connection pool: %s", ", ".join(f"{k}={'auto' if v is None else v}" for k, v in pool_settings().items()))
     yield
+    await session_router.dispose()
 
 
 app = FastAPI(title="Fast Pagination API", lifespan=lifespan)
@@ -47,35 +73,194 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency, SQL time/count, rows and serialization time per request, served on
+# /metrics and echoed in a Server-Timing header (see metrics.py)
+app.add_middleware(MetricsMiddleware)
+serialization.render_hooks.append(record_serialization)
+
+# Pool exhausted for DB_POOL_TIMEOUT seconds: 503 with Retry-After (see db_pool.py)
+app.add_exception_handler(PoolTimeout, asgi_pool_timeout_handler())
 
-async def get_session() -> AsyncSession:
-    async with async_session() as session:
+
+async def get_session(request: Request, response: Response) -> AsyncSession:
+    # GET handlers read from a replica; writes go to the primary and pin the
+    # client's reads to it for a short while (see routing.py)
+    write = request.method not in READ_METHODS
+    if write and session_router.sticky_seconds > 0:
+        response.set_cookie(STICKY_COOKIE, str(time.time()), max_age=math.ceil(session_router.sticky_seconds), httponly=True)
+    last_write = parse_last_write(request.cookies.get(STICKY_COOKIE))
+    async with session_router.session(write, last_write) as session:
         yield session
 
 
-# Configure rotating file logger (5 MB max, keep 5 backups)
-logger = logging.getLogger("fast_pagination")
-logger.setLevel(logging.INFO)
-if not logger.handlers:
-    fh = RotatingFileHandler("fast_pagination.log", maxBytes=5 * 1024 * 1024, backupCount=5)
-    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-    # also log to console at INFO
-    ch = logging.StreamHandler()
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
+# Rotating file (5 MB max, keep 5 backups) and console, written by a
+# background thread so request handlers never wait on log I/O (see
+# queue_logging.py). LOG_FILE='' logs to the console only; the per-request
+# find_cars lines are sampled with LOG_SAMPLE_RATES.
+logger = setup_logging(
+    "fast_pagination",
+    os.getenv("LOG_FILE", "fast_pagination.log"),
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    fmt=os.getenv("LOG_FORMAT", "json"),
+    sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "find_cars=0.1,find_cars_multisort=0.1")),
+)
+
+
+car_query = CatalogQuery(Car)
+car_lookup = CarLookup(Car)
+index_advisor = IndexAdvisor(car_query)
 
+# Upper bound on ids in a GET multi-get (the POST body is not limited)
+MAX_GET_IDS = 1000
 
-def _validate_sort_field(field: str):
-    # Basic validation: ensure attribute exists on model
-    # Accept fields present on either the full Car model or the CarSummary view
-    if not (hasattr(Car, field) or hasattr(CarSummary, field)):
-        raise HTTPException(status_code=400, detail=f"Invalid sort field: {field}")
+
+def _car_spec(**params) -> CarQuerySpec:
+    try:
+        return car_query.spec(**params)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _car_fields(fields: Optional[str]) -> tuple:
+    try:
+        return car_query.fields(fields)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _validate_paging(paging: str):
+    if paging not in ('offset', 'cursor'):
+        raise HTTPException(status_code=400, detail=f"Invalid paging mode: {paging}")
+
+
+def _validate_count_mode(count: str):
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid count mode: {count}")
+
+
+async def _count_cars(session: AsyncSession, count: str, key: tuple, total_q, params: Optional[dict] = None) -> Optional[int]:
+    """Resolve the total for the requested count mode, using the count cache."""
+    if count == 'none':
+        return None
+
+    # sticky reads must see the client's own write, which a total cached from a replica may lack
+    use_cache = not is_sticky_session(session)
+    cached = count_cache.get(key, allow_stale=(count == 'estimate')) if use_cache else None
+    if cached is not None:
+        return cached
+
+    if count == 'estimate' and is_unfiltered(key):
+        # rowid only grows, so max(rowid) approximates the row count in O(log n)
+        result = await session.execute(text("SELECT max(rowid) FROM car"))
+        return result.scalar_one() or 0
+
+    generation = count_cache.generation
+    total_result = await session.execute(total_q, params or {})
+    total = total_result.scalar_one()
+    if use_cache:
+        count_cache.put(key, total, generation)
+    return total
+
+
+def _page_totals(total: Optional[int], size: int, has_next: bool) -> dict:
+    if total is None:
+        return {"total_element": None, "total_page": None, "has_next": has_next}
+    return {"total_element": total, "total_page": math.ceil(total / size) if size else 0}
+
+
+async def _find_cars(session: AsyncSession, spec: CarQuerySpec, page: int, size: int, paging: str, cursor: Optional[str], count: str) -> dict:
+    """Shared body of find_cars and find_cars_multisort."""
+    _validate_paging(paging)
+    _validate_count_mode(count)
+
+    if cursor or paging == 'cursor':
+        return await _find_cars_by_cursor(session, spec, size, cursor, count)
+
+    total = await _count_cars(session, count, spec.count_key, *car_query.count(spec))
+    index_advisor.record(spec)
+
+    # without a total, one extra row tells whether a next page exists
+    q, params = car_query.page(spec, (page - 1) * size, size if total is not None else size + 1)
+    result = await session.execute(q, params)
+    cars = result.all()
+    has_next = len(cars) > size
+    cars = cars[:size]
+
+    return {
+        "data": row_dicts(cars, spec.fields),
+        "page": page,
+        "size": size,
+        **_page_totals(total, size, has_next),
+    }
+
+
+async def _find_cars_by_cursor(session: AsyncSession, spec: CarQuerySpec, size: int, cursor: Optional[str], count: str) -> dict:
+    """Seek-based page of cars in the order of `spec.sort` plus `id`."""
+    sort_keys = car_query.seek_keys(spec)
+    values, backward = None, False
+    if cursor:
+        try:
+            values, backward = decode_cursor(cursor, sort_keys)
+        except CursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    total = await _count_cars(session, count, spec.count_key, *car_query.count(spec))
+
+    index_advisor.record(spec, keyset=True)
+    q, params = car_query.seek(spec, size, values, backward)
+    result = await session.execute(q, params)
+    rows = list(result.all())
+    # going forward the extra row means a next page; going backward it means a
+    # previous one, and a next page always exists (the page we came from)
+    cars, next_cursor, prev_cursor = cursor_links(rows, sort_keys, size, cursor, backward)
+    has_next = next_cursor is not None
+
+    return {
+        "data": row_dicts(cars, spec.fields),
+        "size": size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        **_page_totals(total, size, has_next),
+    }
+
+
+async def _cars_by_ids(session: AsyncSession, ids: list, max_ids: Optional[int] = None, fields: tuple = ()) -> dict:
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids list cannot be empty")
+    if max_ids is not None and len(ids) > max_ids:
+        raise HTTPException(status_code=400, detail=f"At most {max_ids} ids per request")
+
+    rows, missing = await car_lookup.fetch(session, ids)
+    return {
+        # cached rows are whole; the projection is applied on the way out
+        "data": project(rows, fields),
+        "count": len(rows),
+        "missing_ids": missing,
+    }
+
+
+async def _cached_find_cars(request: Request, session: AsyncSession, spec: CarQuerySpec, page: int, size: int, paging: str, cursor: Optional[str], count: str) -> Response:
+    """`_find_cars` behind the response cache, answering If-None-Match with 304."""
+    by_cursor = bool(cursor) or paging == 'cursor'
+    key = cache_key('cars', spec, None if by_cursor else page, size, by_cursor, cursor, count)
+
+    # sticky reads bypass the cache, which replica reads fill (see routing.py)
+    use_cache = not is_sticky_session(session)
+    entry = response_cache.get(key) if use_cache else None
+    if entry is None:
+        generation = response_cache.generation
+        body = await _find_cars(session, spec, page, size, paging, cursor, count)
+        entry = response_cache.put(key, encode(body), generation, store=use_cache)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/cars")
 async def find_cars(
+    request: Request,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=1000),
     brand: str = "%",
@@ -86,57 +271,59 @@ async def find_cars(
     price_max: Optional[int] = None,
     sort_by: Optional[str] = None,
     sort_direction: str = "asc",
+    paging: str = "offset",
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    match: str = "contains",
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
 ):
-    try:
-        filters = [
-            Car.brand.ilike(f"%{brand}%"),
-            Car.model.ilike(f"%{model}%"),
-            Car.transmission.ilike(f"%{transmission}%"),
-        ]
-
-        if price_operator == 'lte':
-            filters.append(Car.price <= price)
-        elif price_operator == 'gte':
-            filters.append(Car.price >= price)
-        elif price_operator == 'between':
-            if price_max is None:
-                price_max = price + 1
-            filters.append(Car.price >= price)
-            filters.append(Car.price <= price_max)
-
-        order_by_clause = None
-        if sort_by:
-            _validate_sort_field(sort_by)
-            col = getattr(Car, sort_by)
-            order_by_clause = col.asc() if sort_direction == 'asc' else col.desc()
-
-        # total count
-        total_q = select(func.count()).select_from(Car).where(and_(*filters))
-        total_result = await session.execute(total_q)
-        total = total_result.scalar_one()
+    """Paginated car search.
 
-        offset = (page - 1) * size
-        q = select(Car).where(and_(*filters))
-        if order_by_clause is not None:
-            q = q.order_by(order_by_clause)
-        q = q.offset(offset).limit(size)
+    `paging=offset` (default) pages with `page`/`size`. `paging=cursor`, or
+    passing a `cursor` from a previous response, seeks on the sort key
+    instead and returns `next_cursor`/`prev_cursor` in place of `page`.
 
-        result = await session.execute(q)
-        cars = result.scalars().all()
+    `count` selects how `total_element` is produced: `exact` (default),
+    `estimate`, or `none`, which skips counting and reports `has_next`.
 
-        total_pages = math.ceil(total / size) if size else 0
+    `match` controls the text filters: `contains` (default, full-text
+    index), `prefix` or `exact` (b-tree index lookups). Filters left at
+    '%' are not applied at all.
 
-        logger.info("find_cars: page=%s size=%s filters=%s sort=%s %s", page, size, [brand, model, transmission], sort_by, sort_direction)
+    Pages are served from the response cache until the next write and carry
+    an ETag; a matching If-None-Match gets 304 without a database query.
 
-        return {
-            "data": [c.to_dict() for c in cars],
-            "page": page,
-            "size": size,
-            "total_element": total,
-            "total_page": total_pages,
-        }
-    except HTTPException:
+    `ids` (comma separated) switches to a multi-get: the listed cars in the
+    given order, plus the ids that were not found. Paging and filters are
+    ignored.
+
+    `fields` (comma separated column names) limits each car to those
+    columns; only they are selected from the database.
+    """
+    try:
+        if ids is not None:
+            id_list = [car_id.strip() for car_id in ids.split(",") if car_id.strip()]
+            response = await _cars_by_ids(session, id_list, MAX_GET_IDS, _car_fields(fields))
+            logger.info("find_cars: ids requested=%s found=%s", len(id_list), response["count"], extra={"endpoint": "find_cars"})
+            return FastJSONResponse(response)
+
+        # one sort field, as in the other catalog services; /api/multisort takes a list
+        if sort_by and ',' in sort_by:
+            raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+
+        spec = _car_spec(
+            brand=brand, model=model, transmission=transmission,
+            price_operator=price_operator, price=price, price_max=price_max,
+            sort_by=sort_by, sort_direction=sort_direction, match=match, fields=fields,
+        )
+        response = await _cached_find_cars(request, session, spec, page, size, paging, cursor, count)
+
+        logger.info("find_cars: page=%s size=%s paging=%s filters=%s sort=%s %s", page, size, paging, [brand, model, transmission], sort_by, sort_direction, extra={"endpoint": "find_cars"})
+
+        return response
+    except (HTTPException, PoolTimeout):
         raise
     except SQLAlchemyError as e:
         logger.exception("Database error in find_cars: %s", e)
@@ -153,15 +340,13 @@ async def get_car_by_id(
 ):
     """Get a single car by its ID."""
     try:
-        q = select(Car).where(Car.id == car_id)
-        result = await session.execute(q)
-        car = result.scalars().first()
+        rows, _ = await car_lookup.fetch(session, [car_id])
 
-        if not car:
+        if not rows:
             raise HTTPException(status_code=404, detail=f"Car with ID {car_id} not found")
 
-        return {"data": car.to_dict()}
-    except HTTPException:
+        return FastJSONResponse({"data": rows[0]})
+    except (HTTPException, PoolTimeout):
         raise
     except SQLAlchemyError as e:
         logger.exception("Database error in get_car_by_id: %s", e)
@@ -189,6 +374,8 @@ async def create_car(
         session.add(new_car)
         await session.commit()
         await session.refresh(new_car)
+        count_cache.invalidate()
+        response_cache.invalidate()
 
         logger.info("Car created: %s", new_car.id)
 
@@ -196,6 +383,8 @@ async def create_car(
             "data": new_car.to_dict(),
             "message": "Car created successfully",
         }
+    except PoolTimeout:
+        raise
     except SQLAlchemyError as e:
         logger.exception("Database error in create_car: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
@@ -204,28 +393,53 @@ async def create_car(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@app.post("/api/cars/search/by-ids")
-async def search_cars_by_ids(
-    payload: CarIdList,
+@app.post("/api/cars/bulk")
+async def create_cars_bulk(
+    payload: CarBulkCreate,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000),
     session: AsyncSession = Depends(get_session),
 ):
-    """Search for multiple cars by their IDs."""
+    """Create many cars in one transaction using batched Core inserts."""
     try:
-        if not payload.ids:
-            raise HTTPException(status_code=400, detail="ids list cannot be empty")
+        if not payload.cars:
+            raise HTTPException(status_code=400, detail="cars list cannot be empty")
 
-        q = select(Car).where(Car.id.in_(payload.ids))
-        result = await session.execute(q)
-        cars = result.scalars().all()
+        rows = [car_row({field: getattr(car, field) for field in CAR_FIELDS}) for car in payload.cars]
+        inserted = await bulk_insert_cars(session, rows, batch_size)
+        await session.commit()
+        count_cache.invalidate()
+        response_cache.invalidate()
 
-        logger.info("search_cars_by_ids: requested=%s found=%s", len(payload.ids), len(cars))
+        logger.info("create_cars_bulk: inserted=%s batch_size=%s", inserted, batch_size)
 
         return {
-            "data": [c.to_dict() for c in cars],
-            "count": len(cars),
-            "requested_ids": payload.ids,
+            "ids": [row["id"] for row in rows],
+            "count": inserted,
+            "message": "Cars created successfully",
         }
-    except HTTPException:
+    except (HTTPException, PoolTimeout):
+        raise
+    except SQLAlchemyError as e:
+        logger.exception("Database error in create_cars_bulk: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        logger.exception("Unexpected error in create_cars_bulk: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@app.post("/api/cars/search/by-ids")
+async def search_cars_by_ids(
+    payload: CarIdList,
+    session: AsyncSession = Depends(get_session),
+):
+    """Search for multiple cars by their IDs, in the order given."""
+    try:
+        response = await _cars_by_ids(session, payload.ids)
+
+        logger.info("search_cars_by_ids: requested=%s found=%s", len(payload.ids), response["count"], extra={"endpoint": "search_cars_by_ids"})
+
+        return FastJSONResponse(response)
+    except (HTTPException, PoolTimeout):
         raise
     except SQLAlchemyError as e:
         logger.exception("Database error in search_cars_by_ids: %s", e)
@@ -237,6 +451,7 @@ async def search_cars_by_ids(
 
 @app.get("/api/multisort")
 async def find_cars_multisort(
+    request: Request,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=1000),
     brand: str = "%",
@@ -247,66 +462,26 @@ async def find_cars_multisort(
     price_max: Optional[int] = None,
     sort_by: Optional[str] = None,
     sort_direction: str = "asc",
+    paging: str = "offset",
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    match: str = "contains",
+    fields: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
 ):
+    """Same as `/api/cars`; `sort_by`/`sort_direction` take comma separated lists."""
     try:
-        filters = [
-            Car.brand.ilike(f"%{brand}%"),
-            Car.model.ilike(f"%{model}%"),
-            Car.transmission.ilike(f"%{transmission}%"),
-        ]
-
-        if price_operator == 'lte':
-            filters.append(Car.price <= price)
-        elif price_operator == 'gte':
-            filters.append(Car.price >= price)
-        elif price_operator == 'between':
-            if price_max is None:
-                price_max = price + 1
-            filters.append(Car.price >= price)
-            filters.append(Car.price <= price_max)
-
-        order_by_clauses = []
-        if sort_by:
-            list_sort_by = [s.strip() for s in sort_by.split(',') if s.strip()]
-            list_sort_direction = [s.strip() for s in sort_direction.split(',') if s.strip()]
-
-            # pad directions
-            while len(list_sort_direction) < len(list_sort_by):
-                list_sort_direction.append('asc')
-
-            for idx, sb in enumerate(list_sort_by):
-                _validate_sort_field(sb)
-                col = getattr(Car, sb)
-                dir = list_sort_direction[idx] if idx < len(list_sort_direction) else 'asc'
-                order_by_clauses.append(col.asc() if dir == 'asc' else col.desc())
-
-        # total count
-        total_q = select(func.count()).select_from(Car).where(and_(*filters))
-        total_result = await session.execute(total_q)
-        total = total_result.scalar_one()
-
-        offset = (page - 1) * size
-        q = select(Car).where(and_(*filters))
-        if order_by_clauses:
-            q = q.order_by(*order_by_clauses)
-        q = q.offset(offset).limit(size)
-
-        result = await session.execute(q)
-        cars = result.scalars().all()
-
-        total_pages = math.ceil(total / size) if size else 0
+        spec = _car_spec(
+            brand=brand, model=model, transmission=transmission,
+            price_operator=price_operator, price=price, price_max=price_max,
+            sort_by=sort_by, sort_direction=sort_direction, match=match, fields=fields,
+        )
+        response = await _cached_find_cars(request, session, spec, page, size, paging, cursor, count)
 
-        logger.info("find_cars_multisort: page=%s size=%s filters=%s sort_by=%s sort_dir=%s", page, size, [brand, model, transmission], sort_by, sort_direction)
+        logger.info("find_cars_multisort: page=%s size=%s paging=%s filters=%s sort_by=%s sort_dir=%s", page, size, paging, [brand, model, transmission], sort_by, sort_direction, extra={"endpoint": "find_cars_multisort"})
 
-        return {
-            "data": [c.to_dict() for c in cars],
-            "page": page,
-            "size": size,
-            "total_element": total,
-            "total_page": total_pages,
-        }
-    except HTTPException:
+        return response
+    except (HTTPException, PoolTimeout):
         raise
     except SQLAlchemyError as e:
         logger.exception("Database error in find_cars_multisort: %s", e)
@@ -320,35 +495,70 @@ async def find_cars_multisort(
 async def getcars(
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=1000),
+    count: str = "exact",
     session: AsyncSession = Depends(get_session),
 ):
     """Return paginated rows from the `car_summary` view (id, brand, price)."""
     try:
+        _validate_count_mode(count)
+
         # total count from view
         total_q = select(func.count()).select_from(CarSummary)
-        total_result = await session.execute(total_q)
-        total = total_result.scalar_one()
+        total = await _count_cars(session, count, ('car_summary',), total_q)
 
         offset = (page - 1) * size
-        q = select(CarSummary).offset(offset).limit(size)
+        q = select(*columns(CarSummary)).offset(offset).limit(size if total is not None else size + 1)
 
         result = await session.execute(q)
-        rows = result.scalars().all()
-
-        total_pages = math.ceil(total / size) if size else 0
+        rows = result.all()
+        has_next = len(rows) > size
+        rows = rows[:size]
 
-        logger.info("getcars: page=%s size=%s returned=%s total=%s", page, size, len(rows), total)
+        logger.info("getcars: page=%s size=%s returned=%s total=%s", page, size, len(rows), total, extra={"endpoint": "getcars"})
 
-        return {
-            "data": [r.to_dict() for r in rows],
+        return FastJSONResponse({
+            "data": row_dicts(rows),
             "page": page,
             "size": size,
-            "total_element": total,
-            "total_page": total_pages,
-        }
+            **_page_totals(total, size, has_next),
+        })
+    except (HTTPException, PoolTimeout):
+        raise
     except SQLAlchemyError as e:
         logger.exception("Database error in getcars: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         logger.exception("Unexpected error in getcars: %s", e)
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@app.get("/api/admin/index-advice")
+async def index_advice():
+    """Query plans of the filter/sort shapes served so far, with index suggestions."""
+    try:
+        async with engine.connect() as conn:
+            reports = await conn.run_sync(index_advisor.analyze)
+        return {"shapes": reports}
+    except PoolTimeout:
+        raise
+    except SQLAlchemyError as e:
+        logger.exception("Database error in index_advice: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
+
+
+@app.post("/api/admin/index-advice")
+async def apply_index_advice():
+    """Create the suggested indexes (requires INDEX_ADVISOR_CREATE=1)."""
+    try:
+        async with engine.begin() as conn:
+            reports = await conn.run_sync(index_advisor.analyze)
+            created = await conn.run_sync(index_advisor.create_indexes, reports)
+        logger.info("apply_index_advice: created=%s", created)
+        return {"created": created}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except PoolTimeout:
+        raise
+    except SQLAlchemyError as e:
+        logger.exception("Database error in apply_index_advice: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
@@ -0,0 +1,126 @@
+import os
+import glob
+import time
+import asyncio
+import argparse
+import tempfile
+from logging.handlers import RotatingFileHandler
+from queue_logging import get_setup, setup_logging, shutdown_logging
+
+
+# Event-loop stall caused by request logging:
+#
+#   direct   rotating file (+ console) handlers on the logger, the old setup
+#   queued   the same handlers behind queue_logging's QueueHandler/QueueListener
+#
+# --tasks coroutines log find_cars lines, yielding to the loop after each one,
+# while a ticker sleeps --tick-ms at a time and records how late it wakes up.
+# A small --max-bytes makes the file rotate during the run, and
+# --write-delay-ms simulates a slow disk.
+#
+#     python bench_logging.py --records 50000 --max-bytes 1000000 --write-delay-ms 0.2
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def slow_disk(delay: float):
+    """Make every RotatingFileHandler write take at least `delay` seconds longer."""
+    emit = RotatingFileHandler.emit
+
+    def delayed_emit(self, record):
+        time.sleep(delay)
+        emit(self, record)
+
+    RotatingFileHandler.emit = delayed_emit
+
+
+async def run(mode: str, args, directory: str) -> dict:
+    name = f"bench_logging.{mode}"
+    path = os.path.join(directory, "bench.log")
+    logger = setup_logging(
+        name, path, fmt=args.format, console=args.console, queued=mode == "queued",
+        sample_rates={"find_cars": args.sample_rate} if args.sample_rate < 1 else None,
+        queue_size=args.queue_size, max_bytes=args.max_bytes, backup_count=1000,
+    )
+    call_seconds, lags = [], []
+    running = True
+
+    async def ticker():
+        interval = args.tick_ms / 1000
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - started - interval)
+
+    async def client(records: int):
+        for i in range(records):
+            started = time.perf_counter()
+            logger.info(
+                "find_cars: page=%s size=%s paging=%s filters=%s sort=%s %s",
+                i, 10, "offset", ["%", "%", "%"], "price", "asc", extra={"endpoint": "find_cars"},
+            )
+            call_seconds.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(args.records // args.tasks) for _ in range(args.tasks)))
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick
+
+    dropped = get_setup(name).dropped
+    drain_started = time.perf_counter()
+    shutdown_logging(name)
+    drain = time.perf_counter() - drain_started
+
+    written = 0
+    for log_file in glob.glob(path + "*"):
+        with open(log_file, "rb") as f:
+            written += sum(1 for _ in f)
+    return {
+        "records_per_second": len(call_seconds) / elapsed,
+        "call_p99_ms": percentile(call_seconds, 0.99) * 1000,
+        "call_max_ms": max(call_seconds) * 1000,
+        "logging_ms": sum(call_seconds) * 1000,
+        "lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "lag_max_ms": max(lags, default=0.0) * 1000,
+        "drain_ms": drain * 1000,
+        "written": written,
+        "dropped": dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event-loop stalls caused by logging")
+    parser.add_argument("--records", type=int, default=50000, help="find_cars lines logged per mode")
+    parser.add_argument("--tasks", type=int, default=32, help="concurrent logging coroutines")
+    parser.add_argument("--tick-ms", type=float, default=1.0, help="ticker interval used to measure loop lag")
+    parser.add_argument("--max-bytes", type=int, default=1_000_000, help="rotate the log file at this size")
+    parser.add_argument("--write-delay-ms", type=float, default=0.0, help="extra time per file write (slow disk)")
+    parser.add_argument("--format", choices=("json", "text"), default="json")
+    parser.add_argument("--console", action="store_true", help="also write every line to stderr")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="find_cars sample rate")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.write_delay_ms:
+        slow_disk(args.write_delay_ms / 1000)
+
+    print(f"{args.records} records from {args.tasks} tasks, rotating every {args.max_bytes} bytes, "
+          f"{args.write_delay_ms} ms extra per write")
+    print(f"  {'mode':8} {'records/s':>10} {'call p99':>9} {'call max':>9} {'in logging':>11} "
+          f"{'lag p99':>8} {'lag max':>8} {'drain':>8} {'written':>8} {'dropped':>8}")
+    for mode in ("direct", "queued"):
+        with tempfile.TemporaryDirectory(prefix="bench-logging-") as directory:
+            r = asyncio.run(run(mode, args, directory))
+        print(f"  {mode:8} {r['records_per_second']:10.0f} {r['call_p99_ms']:7.3f}ms {r['call_max_ms']:7.2f}ms "
+              f"{r['logging_ms']:9.0f}ms {r['lag_p99_ms']:6.2f}ms {r['lag_max_ms']:6.2f}ms "
+              f"{r['drain_ms']:6.0f}ms {r['written']:8} {r['dropped']:8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import time
+import uuid
+import argparse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from models import Base, Car
+from serialization import ENCODERS, columns, row_dicts
+
+
+# Bytes/sec of one page of cars, from query to encoded body:
+#
+#   orm     select(Car) -> to_dict() -> jsonable_encoder -> json.dumps
+#   rows    select(*columns) -> row_dicts -> each available encoder
+#
+#     python bench_serialization.py --rows 1000 --seconds 2
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Car), [
+            {"id": str(uuid.uuid4()), "brand": f"Brand {i % 20}", "model": f"Model {i}",
+             "transmission": "AUTOMATIC" if i % 2 else "MANUAL", "price": 30000 + i, "release_year": 2000 + i % 25}
+            for i in range(rows)
+        ])
+
+
+def orm_page(session, size: int) -> bytes:
+    cars = session.execute(select(Car).limit(size)).scalars().all()
+    body = {"data": [c.to_dict() for c in cars], "page": 1, "size": size}
+    session.expunge_all()
+    return ENCODERS["json"](jsonable_encoder(body))
+
+
+def rows_page(session, size: int, dumps) -> bytes:
+    rows = session.execute(select(*columns(Car)).limit(size)).all()
+    return dumps({"data": row_dicts(rows), "page": 1, "size": size})
+
+
+def measure(fn, seconds: float) -> tuple:
+    """(pages/sec, bytes/sec) of `fn` over about `seconds`."""
+    fn()  # warm the statement cache
+    pages, size = 0, 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        size += len(fn())
+        pages += 1
+    elapsed = time.perf_counter() - started
+    return pages / elapsed, size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page serialization")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time per variant")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+
+    variants = {"orm + jsonable_encoder + json": lambda: orm_page(session, args.rows)}
+    for name, dumps in ENCODERS.items():
+        variants[f"rows + {name}"] = lambda dumps=dumps: rows_page(session, args.rows, dumps)
+
+    with Session(engine) as session:
+        baseline = None
+        print(f"{args.rows}-row page")
+        for name, fn in variants.items():
+            pages, rate = measure(fn, args.seconds)
+            baseline = baseline or rate
+            print(f"  {name:32} {pages:8.1f} pages/s {rate / 1e6:8.2f} MB/s  x{rate / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import csv
+import json
+import uuid
+from typing import Optional
+from itertools import islice
+from sqlalchemy import insert
+from models import Car
+
+DEFAULT_BATCH_SIZE = 1000
+
+CAR_FIELDS = ('brand', 'model', 'transmission', 'price', 'release_year')
+INT_FIELDS = ('price', 'release_year')
+
+
+def car_row(data: dict) -> dict:
+    """Normalize one input record into a `car` row, assigning an id if missing."""
+    row = {field: data.get(field) for field in CAR_FIELDS}
+    for field in INT_FIELDS:
+        if row[field] not in (None, ''):
+            row[field] = int(row[field])
+    row["id"] = data.get("id") or str(uuid.uuid4())
+    return row
+
+
+def batches(rows, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Group an iterable of rows into lists of at most `batch_size`."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+async def bulk_insert_cars(conn, rows, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Insert `rows` (dicts) with Core executemany, `batch_size` rows per call.
+
+    `conn` may be an AsyncConnection or an AsyncSession. Nothing is committed
+    here: the caller commits once, so the whole load is a single transaction
+    (one fsync) however many batches it takes.
+    """
+    stmt = insert(Car.__table__)
+    inserted = 0
+    for batch in batches((car_row(r) for r in rows), batch_size):
+        await conn.execute(stmt, batch)
+        inserted += len(batch)
+    return inserted
+
+
+def read_ndjson(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def read_records(path: str, fmt: Optional[str] = None):
+    """Stream records from an NDJSON or CSV file (format taken from the extension by default)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    return read_csv(path) if fmt == "csv" else read_ndjson(path)
@@ -0,0 +1,92 @@
+from typing import Optional
+from sqlalchemy import Integer, and_, bindparam, select
+from query_builder import CarQuery, CarQuerySpec
+from search import MATCH_MODES, filter_kind, fts_id_filter, fts_phrase, nocase, prefix_upper_bound
+from pagination import flip, order_by_clauses, seek_predicate, with_tiebreaker
+
+
+# The catalog's CarQuery: case-insensitive text filters matched through
+# search.py (exact, prefix, FTS or LIKE, see filter_kind) and keyset pages
+# through pagination.py. Everything else, including the statement cache, is
+# the shared query_builder.py.
+
+
+class CatalogQuery(CarQuery):
+    """CarQuery with match modes, full-text search and seek pages."""
+
+    MATCH_MODES = MATCH_MODES
+
+    def text_filter(self, value: str, match: str) -> tuple:
+        kind = filter_kind(value, match)
+        # exact and prefix compare with NOCASE, which only folds ASCII letters
+        return kind, value.lower() if kind in ('fts', 'like') else nocase(value)
+
+    def seek(self, spec: CarQuerySpec, size: int, values: Optional[list] = None, backward: bool = False) -> tuple:
+        """(statement, params) for a keyset page of `size + 1` rows.
+
+        `values` is the sort-key tuple (primary key last) of the row to seek
+        past; when walking backwards the order is reversed and the caller
+        flips the rows back. The sort keys are selected even when `spec.fields`
+        leaves them out, as the cursors are built from them.
+        """
+        sort_keys = self.seek_keys(spec)
+        order_keys = flip(sort_keys) if backward else sort_keys
+
+        def build():
+            fields = spec.fields + tuple(f for f, _ in sort_keys if f not in spec.fields) if spec.fields else ()
+            stmt = select(*self.select_list(fields)).where(*self._where(spec))
+            if values is not None:
+                # NULL cursor values change the predicate, so they are part of the cache key
+                seek_values = [None if v is None else bindparam(f"seek_{i}") for i, v in enumerate(values)]
+                stmt = stmt.where(seek_predicate(self.model, order_keys, seek_values))
+            stmt = stmt.order_by(*order_by_clauses(self.model, order_keys))
+            return stmt.limit(bindparam("limit", type_=Integer))
+
+        nulls = None if values is None else tuple(v is None for v in values)
+        stmt = self._cached(('seek', spec.shape, nulls, backward), build)
+        params = {**self.params(spec), "limit": size + 1}
+        for i, value in enumerate(values or ()):
+            if value is not None:
+                params[f"seek_{i}"] = value
+        return stmt, params
+
+    def seek_keys(self, spec: CarQuerySpec) -> list:
+        """Sort keys for keyset paging: the requested sort plus the primary key."""
+        return with_tiebreaker(list(spec.sort))
+
+    # internals
+
+    def _text_params(self, text: tuple) -> dict:
+        params = {}
+        fts_terms = []
+        for field, kind, value in text:
+            if kind == 'exact':
+                params[field] = value
+            elif kind == 'prefix':
+                params[f"{field}_lo"] = value
+                params[f"{field}_hi"] = prefix_upper_bound(value)
+            elif kind == 'fts':
+                fts_terms.append(fts_phrase(field, value))
+            else:
+                params[field] = f"%{value}%"
+        if fts_terms:
+            params["fts_query"] = ' AND '.join(fts_terms)
+        return params
+
+    def _text_filters(self, text: tuple) -> list:
+        filters = []
+        has_fts = False
+        for field, kind, _ in text:
+            col = getattr(self.model, field)
+            if kind == 'exact':
+                filters.append(col.collate('nocase') == bindparam(field))
+            elif kind == 'prefix':
+                col = col.collate('nocase')
+                filters.append(and_(col >= bindparam(f"{field}_lo"), col < bindparam(f"{field}_hi")))
+            elif kind == 'fts':
+                has_fts = True
+            else:
+                filters.append(col.ilike(bindparam(field)))
+        if has_fts:
+            filters.append(fts_id_filter(self.model))
+        return filters
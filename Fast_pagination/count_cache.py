@@ -0,0 +1,63 @@
+import time
+import threading
+from typing import Optional
+from collections import OrderedDict
+
+
+# Accepted values for the `count` query parameter:
+#   exact    - accurate total, served from the cache while no write happened
+#   estimate - any cached total (even one a write has since invalidated),
+#              falling back to a cheap approximation or an exact count
+#   none     - skip counting; the handler fetches size + 1 rows instead
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+def is_unfiltered(key: tuple) -> bool:
+    """True for the key of a query without any filters (see CarQuerySpec.count_key)."""
+    return key == ((), None)
+
+
+class CountCache:
+    """Cache of total-row counts keyed by a normalized filter set.
+
+    Writes call `invalidate()`, which bumps a generation counter instead of
+    clearing entries: exact lookups only accept entries counted in the current
+    generation, while estimate lookups may reuse an older value until its TTL
+    expires.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def get(self, key: tuple, allow_stale: bool = False) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            generation, stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            if generation != self.generation and not allow_stale:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: int, generation: int):
+        """Store a count taken while `generation` was current."""
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+count_cache = CountCache()
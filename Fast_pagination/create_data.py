@@ -1,47 +1,72 @@
+import time
 import asyncio
-import uuid
 import random
-from database import async_session, engine
-from models import Base, Car
+import argparse
+from database import engine
+from models import Base
+from search import ensure_search_index, suspend_search_triggers, resume_search_triggers
+from bulk import DEFAULT_BATCH_SIZE, bulk_insert_cars, read_records
 
 
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_search_index)
 
 
-async def generate(n: int = 1000):
-    async with async_session() as session:
-        objs = []
-        for i in range(1, n + 1):
-            if i % 3 == 1:
-                brand = 'Honda'
-            elif i % 3 == 2:
-                brand = 'Ford'
-            else:
-                brand = 'BMW'
-
-            model = f"{brand} {i}"
-            transmission = 'AUTOMATIC' if (i % 2 != 0) else 'MANUAL'
-            price = random.randint(30000, 80000)
-            release_year = 2020 + (i % 3)
-            car = Car(
-                id=str(uuid.uuid4()),
-                brand=brand,
-                model=model,
-                transmission=transmission,
-                price=price,
-                release_year=release_year,
-            )
-            objs.append(car)
-
-        session.add_all(objs)
-        await session.commit()
+def sample_cars(n: int = 1000):
+    for i in range(1, n + 1):
+        if i % 3 == 1:
+            brand = 'Honda'
+        elif i % 3 == 2:
+            brand = 'Ford'
+        else:
+            brand = 'BMW'
+
+        yield {
+            "brand": brand,
+            "model": f"{brand} {i}",
+            "transmission": 'AUTOMATIC' if (i % 2 != 0) else 'MANUAL',
+            "price": random.randint(30000, 80000),
+            "release_year": 2020 + (i % 3),
+        }
+
+
+async def load(rows, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    # One transaction for the whole load; rows are inserted batch by batch and
+    # the full-text index is rebuilt once at the end instead of per row
+    async with engine.begin() as conn:
+        fts = await conn.run_sync(suspend_search_triggers)
+        inserted = await bulk_insert_cars(conn, rows, batch_size)
+        if fts:
+            await conn.run_sync(resume_search_triggers)
+        return inserted
+
+
+async def generate(n: int = 1000, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    return await load(sample_cars(n), batch_size)
+
+
+async def main(args):
+    await create_tables()
+    if args.input:
+        print(f"Loading rows from {args.input}.")
+        rows = read_records(args.input, args.format)
+    else:
+        print(f"Creating tables and inserting {args.rows} sample rows.")
+        rows = sample_cars(args.rows)
+
+    started = time.perf_counter()
+    inserted = await load(rows, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"DB Insertion Completed: {inserted} rows in {elapsed:.2f}s.")
+    await engine.dispose()
 
 
 if __name__ == '__main__':
-    n = 5000
-    print(f"Creating tables and inserting {n} sample rows.")
-    asyncio.run(create_tables())
-    asyncio.run(generate(n))
-    print("DB Insertion Completed.")
+    parser = argparse.ArgumentParser(description="Create the car tables and load rows into them.")
+    parser.add_argument("-n", "--rows", type=int, default=5000, help="number of sample rows to generate")
+    parser.add_argument("-i", "--input", help="NDJSON or CSV file to load instead of sample rows")
+    parser.add_argument("--format", choices=("ndjson", "csv"), help="input format (default: from the file extension)")
+    parser.add_argument("-b", "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per executemany batch")
+    asyncio.run(main(parser.parse_args()))
@@ -1,17 +1,43 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
+from db_pool import create_async_engine
+from sqlite_tuning import apply_pragmas, pragma_settings
+from routing import SessionRouter
 
 #Sqlite DB
-DATABASE_URL = "sqlite+aiosqlite:///./carcatalog.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./carcatalog.db")
+
+# Optional comma separated read replicas; reads use the primary when empty
+READ_DATABASE_URLS = [url.strip() for url in os.getenv("READ_DATABASE_URLS", "").split(",") if url.strip()]
+
+# Seconds a client keeps reading from the primary after it wrote
+STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", "5"))
+
+sqlite_pragmas = pragma_settings()
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True,
-)
+
+def make_engine(url: str, name: str):
+    # pool sizing, pre-ping and pool metrics come from db_pool.py (DB_POOL_* settings)
+    engine = create_async_engine(
+        url,
+        name,
+        echo=False,
+        future=True,
+    )
+    if url.startswith("sqlite"):
+        # WAL, mmap, cache_size, ... on every pooled connection (see sqlite_tuning.py)
+        apply_pragmas(engine, sqlite_pragmas)
+    return engine
+
+
+engine = make_engine(DATABASE_URL, "primary")
+read_engines = [make_engine(url, f"replica-{i}") for i, url in enumerate(READ_DATABASE_URLS, 1)]
 
 async_session = sessionmaker(
     bind=engine,
     expire_on_commit=False,
     class_=AsyncSession,
 )
+
+session_router = SessionRouter(engine, read_engines, sticky_seconds=STICKY_SECONDS)
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+from typing import Optional
+from collections import OrderedDict
+from sqlalchemy import bindparam, select
+from serialization import row_dicts
+
+
+# Primary-key lookups for one or many cars.
+#
+# Serialized rows are kept in a bounded LRU keyed by id, so hot ids never
+# reach the database. The remaining ids are fetched with one expanding IN
+# query per chunk; chunks are sized to stay under SQLite's limit on bound
+# variables. Cars are only ever inserted, never updated or deleted, so a
+# cached row cannot go stale; misses are not cached, as the id may be
+# created later.
+
+DEFAULT_MAX_CHUNK = 1000
+
+
+def sqlite_variable_limit(default: int = 999) -> int:
+    """SQLITE_LIMIT_VARIABLE_NUMBER of the linked SQLite library (999 on old builds)."""
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        finally:
+            conn.close()
+    except AttributeError:
+        # Connection.getlimit is Python 3.11+
+        return default
+
+
+class CarLookup:
+    """Order-preserving multi-get of serialized cars with an identity cache."""
+
+    def __init__(self, model, max_entries: int = 10000, chunk_size: Optional[int] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size or min(sqlite_variable_limit(), DEFAULT_MAX_CHUNK)
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        # one statement for every chunk length; the IN list is expanded at execution
+        self._stmt = select(*model.__table__.columns).where(model.id.in_(bindparam("ids", expanding=True)))
+
+    async def fetch(self, session, ids: list) -> tuple:
+        """Return (rows, missing_ids) for `ids`, both in input order without duplicates."""
+        ids = list(dict.fromkeys(ids))
+        found = self._cached(ids)
+
+        wanted = [car_id for car_id in ids if car_id not in found]
+        for start in range(0, len(wanted), self.chunk_size):
+            chunk = wanted[start:start + self.chunk_size]
+            result = await session.execute(self._stmt, {"ids": chunk})
+            rows = {row["id"]: row for row in row_dicts(result)}
+            self._store(rows)
+            found.update(rows)
+
+        rows = [found[car_id] for car_id in ids if car_id in found]
+        missing = [car_id for car_id in ids if car_id not in found]
+        return rows, missing
+
+    def _cached(self, ids: list) -> dict:
+        with self._lock:
+            found = {}
+            for car_id in ids:
+                row = self._rows.get(car_id)
+                if row is not None:
+                    self._rows.move_to_end(car_id)
+                    found[car_id] = row
+            return found
+
+    def _store(self, rows: dict):
+        with self._lock:
+            for car_id, row in rows.items():
+                self._rows[car_id] = row
+                self._rows.move_to_end(car_id)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
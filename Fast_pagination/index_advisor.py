@@ -0,0 +1,205 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from query_builder import CarQuery, CarQuerySpec
+
+
+# Index advice from the query shapes the catalog actually serves.
+#
+# find_cars/find_cars_multisort record the shape of every page statement
+# they run (filters, price operator, sort, fields, paging) together with
+# one spec seen for it. analyze() runs EXPLAIN QUERY PLAN for each shape and
+# flags full table scans and temp B-tree sorts. For those shapes it suggests
+# a composite index: equality filters first, then the sort keys, or the
+# range column when it cannot serve the sort as well. A fields= selection
+# is appended to make the index covering. Nothing is created unless
+# INDEX_ADVISOR_CREATE=1.
+
+# Opt-in: allow create_indexes() to run the suggested DDL
+CREATE_ENABLED = os.getenv("INDEX_ADVISOR_CREATE", "") == "1"
+
+RANGE_KINDS = ('prefix',)
+EQUALITY_KINDS = ('exact',)
+
+
+class ShapeStats:
+    __slots__ = ("spec", "keyset", "hits")
+
+    def __init__(self, spec: CarQuerySpec, keyset: bool):
+        self.spec = spec
+        self.keyset = keyset
+        self.hits = 0
+
+
+class IndexAdvisor:
+    """Records query shapes and turns their query plans into index suggestions."""
+
+    def __init__(self, query: CarQuery, max_shapes: int = 256):
+        self.query = query
+        self.table = query.model.__tablename__
+        self.max_shapes = max_shapes
+        self._shapes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, spec: CarQuerySpec, keyset: bool = False):
+        key = (spec.shape, keyset)
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                stats = self._shapes[key] = ShapeStats(spec, keyset)
+            stats.hits += 1
+
+    def shapes(self) -> list:
+        with self._lock:
+            return sorted(self._shapes.values(), key=lambda s: -s.hits)
+
+    # analysis (sync connection; use `await conn.run_sync(advisor.analyze)`)
+
+    def analyze(self, conn) -> list:
+        """One report per recorded shape, most frequent first."""
+        indexes = existing_indexes(conn, self.table)
+        reports = []
+        for stats in self.shapes():
+            plan = self.explain(conn, stats)
+            full_scan = any(_scans_table(detail, self.table) for detail in plan)
+            temp_sort = any("USE TEMP B-TREE" in detail for detail in plan)
+            suggestion = None
+            if full_scan or temp_sort:
+                suggestion = self.suggest(stats.spec, stats.keyset, indexes)
+            reports.append({
+                "shape": describe(stats.spec, stats.keyset),
+                "hits": stats.hits,
+                "plan": plan,
+                "full_scan": full_scan,
+                "temp_sort": temp_sort,
+                "suggestion": suggestion,
+            })
+        merge_prefixes([r["suggestion"] for r in reports if r["suggestion"]])
+        return reports
+
+    def explain(self, conn, stats: ShapeStats) -> list:
+        spec = stats.spec
+        if stats.keyset:
+            # placeholder (non-NULL) seek values: the plan does not depend on them
+            values = [0] * len(self.query.seek_keys(spec))
+            stmt, params = self.query.seek(spec, 10, values)
+        else:
+            stmt, params = self.query.page(spec, 0, 10)
+        compiled = stmt.compile(dialect=conn.dialect)
+        bound = compiled.construct_params(params)
+        positional = tuple(bound[name] for name in compiled.positiontup)
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, positional).all()
+        return [row[-1] for row in rows]
+
+    def suggest(self, spec: CarQuerySpec, keyset: bool, indexes: dict) -> Optional[dict]:
+        """Composite (or covering) index for a shape, unless an existing index already leads with it."""
+        columns = suggested_columns(spec, keyset)
+        if not columns:
+            return None
+        names = [name for name, _ in columns]
+        for existing in indexes.values():
+            if existing[:len(names)] == names:
+                return None
+
+        covering = False
+        if spec.fields:
+            extra = [field for field in spec.fields if field not in names]
+            columns += [(field, 'asc') for field in extra]
+            covering = True
+
+        mixed = len({direction for _, direction in columns}) > 1
+        # exact and prefix filters compare with NOCASE (see catalog_query.py)
+        nocase = {field for field, kind, _ in spec.text if kind in EQUALITY_KINDS + RANGE_KINDS}
+        name = "ix_{}_{}{}".format(self.table, "_".join(field for field, _ in columns), "_cov" if covering else "")
+        column_sql = ", ".join(
+            field + (" COLLATE NOCASE" if field in nocase else "") + (" DESC" if mixed and direction == 'desc' else "")
+            for field, direction in columns
+        )
+        return {
+            "name": name,
+            "columns": [field for field, _ in columns],
+            "covering": covering,
+            "ddl": f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({column_sql})",
+        }
+
+    def create_indexes(self, conn, reports: list) -> list:
+        """Run the DDL of every suggestion in `reports`; only with INDEX_ADVISOR_CREATE=1."""
+        if not CREATE_ENABLED:
+            raise PermissionError("Index creation is disabled; set INDEX_ADVISOR_CREATE=1")
+        created = []
+        for report in reports:
+            suggestion = report["suggestion"]
+            if suggestion and suggestion["name"] not in created:
+                conn.exec_driver_sql(suggestion["ddl"])
+                created.append(suggestion["name"])
+        if created:
+            # let the planner pick up statistics for the new indexes
+            conn.exec_driver_sql("PRAGMA optimize")
+        return created
+
+
+def suggested_columns(spec: CarQuerySpec, keyset: bool) -> list:
+    """[(column, direction), ...]: equality filters, then the sort or the range column."""
+    columns = []
+
+    def add(field, direction='asc'):
+        if field not in [f for f, _ in columns]:
+            columns.append((field, direction))
+
+    for field, kind, _ in spec.text:
+        if kind in EQUALITY_KINDS:
+            add(field)
+
+    ranges = [field for field, kind, _ in spec.text if kind in RANGE_KINDS]
+    if spec.price_operator is not None:
+        ranges.append('price')
+
+    sort = list(spec.sort)
+    if keyset and sort and all(field != 'id' for field, _ in sort):
+        # cursor pages order by the sort keys plus id
+        sort.append(('id', 'asc'))
+
+    if sort and (not ranges or sort[0][0] == ranges[0]):
+        for field, direction in sort:
+            add(field, direction)
+    elif ranges:
+        add(ranges[0])
+    return columns
+
+
+def merge_prefixes(suggestions: list):
+    """Point suggestions whose columns lead another suggestion at that longer index."""
+    for suggestion in suggestions:
+        columns = suggestion["columns"]
+        for other in suggestions:
+            if len(other["columns"]) > len(columns) and other["columns"][:len(columns)] == columns:
+                suggestion.update(other)
+                columns = other["columns"]
+
+
+def existing_indexes(conn, table: str) -> dict:
+    """{index name: [column, ...]} for `table`."""
+    indexes = {}
+    for row in conn.exec_driver_sql(f"PRAGMA index_list({table})").all():
+        name = row[1]
+        info = conn.exec_driver_sql(f"PRAGMA index_info({name})").all()
+        indexes[name] = [column for _, _, column in sorted(info)]
+    return indexes
+
+
+def describe(spec: CarQuerySpec, keyset: bool) -> dict:
+    return {
+        "filters": [f"{field}:{kind}" for field, kind, _ in spec.text],
+        "price_operator": spec.price_operator,
+        "sort": [f"{field} {direction}" for field, direction in spec.sort],
+        "fields": list(spec.fields),
+        "paging": "cursor" if keyset else "offset",
+    }
+
+
+def _scans_table(detail: str, table: str) -> bool:
+    # "SCAN car" is a full table scan; "SCAN car USING [COVERING] INDEX ..." walks an index in order
+    return detail == f"SCAN {table}" or detail.startswith(f"SCAN {table} ") and "INDEX" not in detail
@@ -0,0 +1,115 @@
+import json
+import base64
+from typing import Optional
+from sqlalchemy import and_, false, or_, tuple_
+
+
+# Keyset (seek) pagination helpers.
+#
+# A cursor is an opaque, url-safe token holding the sort-key tuple of the
+# row it was taken from (with the primary key appended as a tiebreaker),
+# the sort specification it was produced for and the paging direction.
+# The next request seeks past that tuple instead of using OFFSET, so the
+# cost of a page no longer depends on how deep into the result it is.
+
+
+class CursorError(ValueError):
+    """Raised when a cursor cannot be decoded or does not match the request."""
+
+
+def with_tiebreaker(sort_keys: list, pk: str = 'id') -> list:
+    """Return sort keys with the primary key appended so the order is total."""
+    if any(field == pk for field, _ in sort_keys):
+        return list(sort_keys)
+    return list(sort_keys) + [(pk, 'asc')]
+
+
+def encode_cursor(row, sort_keys: list, backward: bool = False) -> str:
+    payload = {
+        "v": [getattr(row, field) for field, _ in sort_keys],
+        "s": [[field, direction] for field, direction in sort_keys],
+        "b": backward,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: list) -> tuple:
+    """Decode a cursor into (values, backward) for the given sort keys."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        spec = [tuple(s) for s in payload["s"]]
+        backward = bool(payload.get("b", False))
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError("Malformed cursor") from e
+
+    if spec != [tuple(k) for k in sort_keys] or len(values) != len(sort_keys):
+        raise CursorError("Cursor does not match the requested sort order")
+    return values, backward
+
+
+def flip(sort_keys: list) -> list:
+    return [(field, 'desc' if direction == 'asc' else 'asc') for field, direction in sort_keys]
+
+
+def order_by_clauses(model, sort_keys: list) -> list:
+    clauses = []
+    for field, direction in sort_keys:
+        col = getattr(model, field)
+        clauses.append(col.asc() if direction == 'asc' else col.desc())
+    return clauses
+
+
+def seek_predicate(model, sort_keys: list, values: list):
+    """Build the WHERE clause selecting rows strictly after `values` in sort order.
+
+    SQLite sorts NULL before every value ascending and after every value
+    descending, and a NULL never satisfies `=`, `<` or `>`, so each key
+    is compared NULL-aware: `values[i] is None` stands for a NULL in the
+    cursor row (the other values are usually bind parameters). Keys are
+    expanded into ``a > ? OR (a = ? AND b > ?) OR ...``; when every key
+    ascends and no cursor value is NULL this is the single row-value
+    comparison ``(a, b) > (?, ?)`` instead.
+    """
+    cols = [getattr(model, field) for field, _ in sort_keys]
+    if all(direction == 'asc' for _, direction in sort_keys) and all(v is not None for v in values):
+        # a NULL in the row sorts before the cursor's value, and the comparison is not true for it
+        return tuple_(*cols) > tuple_(*values)
+
+    table = model.__table__
+    branches = []
+    for idx, (col, (field, direction)) in enumerate(zip(cols, sort_keys)):
+        value = values[idx]
+        nullable = table.columns[field].nullable
+        if value is None:
+            # ascending, every value follows NULL; descending, nothing does
+            step = col.isnot(None) if direction == 'asc' else None
+        elif direction == 'asc':
+            step = col > value
+        else:
+            step = or_(col < value, col.is_(None)) if nullable else col < value
+        if step is not None:
+            equal = [cols[i].is_(None) if values[i] is None else cols[i] == values[i] for i in range(idx)]
+            branches.append(and_(*equal, step))
+    return or_(*branches) if branches else false()
+
+
+def cursor_links(rows: list, sort_keys: list, size: int, cursor: Optional[str], backward: bool) -> tuple:
+    """Trim the over-fetched row and return (rows, next_cursor, prev_cursor)."""
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backward:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    if backward:
+        next_cursor = encode_cursor(rows[-1], sort_keys)
+        prev_cursor = encode_cursor(rows[0], sort_keys, backward=True) if has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1], sort_keys) if has_more else None
+        prev_cursor = encode_cursor(rows[0], sort_keys, backward=True) if cursor else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import NamedTuple, Optional
+from collections import OrderedDict
+
+
+# Cache of serialized catalog pages.
+#
+# Entries are keyed on the normalized query (the CarQuerySpec plus the paging
+# parameters), so equivalent requests share an entry whatever the order or
+# spelling of their query string. Each entry carries a strong ETag computed
+# from its body; a request whose If-None-Match matches is answered with 304
+# before the database is touched. Writes call `invalidate()`, which bumps a
+# generation counter: entries stored under an older generation are ignored.
+#
+# The storage itself is a backend with get/set/clear for entries and
+# incr/counter for the generation, so the in-process LRU can be swapped for
+# a shared store (Redis: SET with EX, INCR and GET). The generation lives in
+# the backend, so a write in one worker invalidates the entries every worker
+# reads. Keys handed to a backend are strings.
+
+GENERATION_KEY = "response_cache:generation"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    generation: int
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry; counters are never evicted."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+
+def cache_key(*parts) -> str:
+    raw = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value names `etag` (or is `*`)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    """Generation-checked response cache over a pluggable backend.
+
+    A `ttl` of 0 disables caching; ETags are still produced.
+    """
+
+    def __init__(self, backend=None, ttl: float = 30.0):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+
+    @property
+    def generation(self) -> int:
+        return self.backend.counter(GENERATION_KEY)
+
+    def invalidate(self):
+        self.backend.incr(GENERATION_KEY)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if self.ttl <= 0:
+            return None
+        entry = self.backend.get(key)
+        if entry is None or entry.generation != self.generation:
+            return None
+        return entry
+
+    def put(self, key: str, body: bytes, generation: int, store: bool = True) -> CachedResponse:
+        """Store a body computed while `generation` was current (`store=False`: only build the entry)."""
+        entry = CachedResponse(body, make_etag(body), generation)
+        if store and self.ttl > 0:
+            self.backend.set(key, entry, self.ttl)
+        return entry
+
+
+response_cache = ResponseCache(
+    MemoryBackend(int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "30")),
+)
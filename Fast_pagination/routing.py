@@ -0,0 +1,73 @@
+import time
+import itertools
+import threading
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+
+# Primary / read-replica session routing.
+#
+# Writes (and anything that is not a safe HTTP method) go to the primary.
+# Reads are spread round-robin over the read engines, unless the client wrote
+# recently: replicas may lag, so for `sticky_seconds` after a write the
+# client's reads stay on the primary and it sees its own writes. The time of
+# the last write travels with the client in a cookie, so stickiness does not
+# depend on which worker process serves the next request.
+#
+# The response and count caches are shared by every read, and replica reads
+# fill them with whatever the replica had. Sticky reads are marked (see
+# is_sticky_session) and bypass those caches, so a page read from a lagging
+# replica is never served to the client that just wrote.
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+STICKY_COOKIE = "db_last_write"
+
+
+class SessionRouter:
+    """Hands out sessions bound to the primary or to one of the read engines."""
+
+    def __init__(self, primary, replicas=(), sticky_seconds: float = 5.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self._primary_session = self._sessionmaker(primary)
+        self._sticky_session = self._sessionmaker(primary, info={"sticky": True})
+        self._replica_sessions = itertools.cycle([self._sessionmaker(e) for e in self.replicas]) if self.replicas else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sessionmaker(engine, **kw):
+        return sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession, **kw)
+
+    def is_sticky(self, last_write: Optional[float], now: Optional[float] = None) -> bool:
+        if last_write is None:
+            return False
+        now = time.time() if now is None else now
+        return 0 <= now - last_write < self.sticky_seconds
+
+    def session(self, write: bool, last_write: Optional[float] = None) -> AsyncSession:
+        """A new session for a write, or for a read by a client that last wrote at `last_write`."""
+        if write or self._replica_sessions is None:
+            return self._primary_session()
+        if self.is_sticky(last_write):
+            return self._sticky_session()
+        with self._lock:
+            factory = next(self._replica_sessions)
+        return factory()
+
+    async def dispose(self):
+        for engine in [self.primary, *self.replicas]:
+            await engine.dispose()
+
+
+def is_sticky_session(session) -> bool:
+    """True for a read kept on the primary, next to replicas, because the client wrote recently."""
+    return session.info.get("sticky", False)
+
+
+def parse_last_write(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,154 @@
+from typing import Optional
+from sqlalchemy import String, column, text
+
+
+# Text search for the catalog filters.
+#
+# `Car.brand.ilike('%BMW%')` cannot use the b-tree indexes on car, so every
+# request used to scan the whole table. Substring searches now go through an
+# FTS5 table using the trigram tokenizer, kept in sync with `car` by triggers,
+# while exact and prefix matches are answered by NOCASE b-tree indexes.
+#
+# car_fts holds its own copy of the text columns and is keyed on car.id.
+# `car` has a string primary key, so its rowid is implicit and VACUUM may
+# renumber it; an external-content table keyed on that rowid would silently
+# point at the wrong rows afterwards. Matching by id costs a scan of car_fts
+# on update and delete, which the catalog never does in bulk.
+#
+# Every match mode ignores (ASCII) case, like SQLite's NOCASE collation.
+
+MATCH_MODES = ('contains', 'prefix', 'exact')
+
+# Trigram MATCH needs at least three characters; shorter terms fall back to LIKE
+MIN_FTS_TERM = 3
+
+TEXT_COLUMNS = ('brand', 'model', 'transmission')
+
+FTS_TABLE_DDL = (
+    "CREATE VIRTUAL TABLE car_fts USING fts5("
+    "id UNINDEXED, brand, model, transmission, tokenize='trigram')"
+)
+
+FTS_TRIGGERS = ('car_fts_ai', 'car_fts_ad', 'car_fts_au')
+
+FTS_TRIGGER_DDL = [
+    "CREATE TRIGGER car_fts_ai AFTER INSERT ON car BEGIN "
+    "INSERT INTO car_fts(id, brand, model, transmission) "
+    "VALUES (new.id, new.brand, new.model, new.transmission); END",
+    "CREATE TRIGGER car_fts_ad AFTER DELETE ON car BEGIN "
+    "DELETE FROM car_fts WHERE id = old.id; END",
+    "CREATE TRIGGER car_fts_au AFTER UPDATE ON car BEGIN "
+    "UPDATE car_fts SET id = new.id, brand = new.brand, model = new.model, transmission = new.transmission "
+    "WHERE id = old.id; END",
+]
+
+# exact and prefix filters compare with NOCASE, which these indexes serve
+NOCASE_INDEX_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_car_{column}_nocase ON car ({column} COLLATE NOCASE)"
+    for column in TEXT_COLUMNS
+]
+
+# Set by ensure_search_index(); when False every substring filter uses LIKE
+fts_enabled = False
+
+
+def ensure_search_index(conn) -> bool:
+    """Create the NOCASE indexes, and the FTS table and triggers if missing (sync connection).
+
+    The FTS table is filled from the rows already in `car` when it is
+    created, including when an older layout (external content keyed on
+    car's rowid) is replaced. Returns whether full-text search is
+    available on this SQLite build.
+    """
+    global fts_enabled
+    for ddl in NOCASE_INDEX_DDL:
+        conn.execute(text(ddl))
+    existing = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'car_fts'")
+    ).scalar()
+    if existing is not None and "id UNINDEXED" not in existing:
+        for trigger in FTS_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE car_fts"))
+        existing = None
+    if existing is None:
+        try:
+            conn.execute(text(FTS_TABLE_DDL))
+        except Exception:
+            # SQLite built without FTS5 or the trigram tokenizer (< 3.34)
+            fts_enabled = False
+            return False
+        resume_search_triggers(conn)
+    fts_enabled = True
+    return True
+
+
+def suspend_search_triggers(conn) -> bool:
+    """Drop the FTS sync triggers ahead of a bulk load (sync connection).
+
+    Maintaining the trigram index row by row costs several times more than
+    the insert itself, while a single rebuild afterwards is cheap. Returns
+    whether the index exists, i.e. whether resume_search_triggers() must be
+    called once the rows are in. Run both in the load's transaction so a
+    failed load leaves the triggers in place.
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'car_fts'")
+    ).first()
+    if not exists:
+        return False
+    for trigger in FTS_TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    return True
+
+
+def resume_search_triggers(conn):
+    """Recreate the FTS sync triggers and refill the index from `car`."""
+    for ddl in FTS_TRIGGER_DDL:
+        conn.execute(text(ddl))
+    conn.execute(text("DELETE FROM car_fts"))
+    conn.execute(text(
+        "INSERT INTO car_fts(id, brand, model, transmission) SELECT id, brand, model, transmission FROM car"
+    ))
+
+
+def is_wildcard(value: Optional[str]) -> bool:
+    """True when a filter matches everything and its predicate can be dropped."""
+    return value is None or value.strip('%') == ''
+
+
+def filter_kind(value: Optional[str], match: str = 'contains') -> Optional[str]:
+    """How a text filter is applied: 'exact', 'prefix', 'fts', 'like' or None.
+
+    - absent, empty or '%' filters produce no predicate at all
+    - `exact` is an equality lookup on the column's NOCASE index
+    - `prefix` is a NOCASE index range scan (value <= column < next value)
+    - `contains` uses the FTS trigram index, or ILIKE ('like') for short
+      terms and terms carrying their own LIKE wildcards
+    """
+    if is_wildcard(value):
+        return None
+    if match in ('exact', 'prefix'):
+        return match
+    if fts_enabled and len(value) >= MIN_FTS_TERM and not any(c in value for c in '%_'):
+        return 'fts'
+    return 'like'
+
+
+def fts_phrase(column: str, value: str) -> str:
+    return '%s : "%s"' % (column, value.replace('"', '""'))
+
+
+def nocase(value: str) -> str:
+    """`value` folded the way SQLite's NOCASE collation compares it (ASCII letters only)."""
+    return ''.join(c.lower() if c.isascii() else c for c in value)
+
+
+def prefix_upper_bound(value: str) -> str:
+    return value[:-1] + chr(ord(value[-1]) + 1)
+
+
+def fts_id_filter(model):
+    """`model.id IN (FTS match)` clause bound to the `fts_query` parameter."""
+    subq = text("SELECT id FROM car_fts WHERE car_fts MATCH :fts_query").columns(column('id', String))
+    return model.id.in_(subq)
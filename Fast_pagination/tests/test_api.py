@@ -0,0 +1,279 @@
+import os
+import sqlite3
+import tempfile
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# a throwaway database, so the tests never touch carcatalog.db
+DB_DIR = tempfile.mkdtemp(prefix="fast-pagination-tests-")
+DB_PATH = os.path.join(DB_DIR, "cars.db")
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + DB_PATH
+os.environ["LOG_FILE"] = ""
+
+from app import app
+from count_cache import count_cache
+from database import engine
+from models import Base
+from pagination import CursorError, decode_cursor, encode_cursor
+from response_cache import MemoryBackend, ResponseCache, response_cache
+from routing import SessionRouter
+from search import FTS_TRIGGER_DDL, ensure_search_index
+
+
+client = TestClient(app)
+
+BRANDS = ["BMW", "Audi", "Ford", "Toyota", "Honda"]
+CARS = [
+    {
+        "brand": BRANDS[i % len(BRANDS)],
+        "model": f"Model {i}",
+        "transmission": "Manual" if i % 2 else "Automatic",
+        "price": 10000 + (i % 7) * 1000,
+        "release_year": 2000 + i % 20,
+    }
+    for i in range(23)
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def seeded_db():
+    # Entering the client runs the lifespan handler, which creates the tables
+    with client:
+        response = client.post('/api/cars/bulk', json={"cars": CARS})
+        assert response.status_code == 200
+        yield
+
+
+def test_cursor_walk_forward_then_backward():
+    params = {"paging": "cursor", "size": 5, "count": "none", "sort_by": "price"}
+    forward, cursor = [], None
+    while True:
+        page = client.get('/api/cars', params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        forward.append(page)
+        cursor = page["next_cursor"]
+        assert page["has_next"] is (cursor is not None)
+        if cursor is None:
+            break
+    ids = [car["id"] for page in forward for car in page["data"]]
+    assert len(ids) == len(set(ids)) == len(CARS)
+    prices = [car["price"] for page in forward for car in page["data"]]
+    assert prices == sorted(prices)
+
+    backward, page = [], forward[-1]
+    while page["prev_cursor"]:
+        page = client.get('/api/cars', params={**params, "cursor": page["prev_cursor"]}).json()
+        backward.append(page)
+        # we came from a later page
+        assert page["has_next"] is True
+    assert [p["data"] for p in reversed(backward)] == [p["data"] for p in forward[:-1]]
+    assert backward[-1]["prev_cursor"] is None
+
+
+def delete_cars(ids):
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        conn.executemany("DELETE FROM car WHERE id = ?", [(car_id,) for car_id in ids])
+    finally:
+        conn.close()
+    count_cache.invalidate()
+    response_cache.invalidate()
+
+
+def car_ids(**params):
+    response = client.get('/api/cars', params={"size": 100, **params})
+    assert response.status_code == 200
+    return sorted(car["id"] for car in response.json()["data"])
+
+
+def test_match_modes_ignore_case():
+    bmw = car_ids(brand="BMW", match="exact")
+    assert len(bmw) == 5
+    assert car_ids(brand="bmw", match="exact") == bmw
+    assert car_ids(brand="bm", match="prefix") == bmw
+    assert car_ids(brand="Bm", match="prefix") == bmw
+    assert car_ids(brand="bMw") == bmw
+    assert car_ids(brand="MW") == bmw
+
+
+def test_search_index_survives_rowid_renumbering():
+    created = client.post('/api/cars/bulk', json={"cars": [
+        {**CARS[0], "brand": "Renumbered", "model": model} for model in ("Alpha", "Beta", "Gamma")
+    ]}).json()["ids"]
+
+    # what VACUUM may do to a table without an INTEGER PRIMARY KEY: new
+    # rowids for the same rows, without any trigger firing
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        conn.execute("DROP TRIGGER car_fts_au")
+        conn.execute("UPDATE car SET rowid = -rowid WHERE brand = 'Renumbered'")
+        conn.execute(FTS_TRIGGER_DDL[2])
+        assert car_ids(brand="Renumbered", model="Gamma") == [created[2]]
+        assert car_ids(model="Beta") == [created[1]]
+    finally:
+        conn.close()
+        delete_cars(created)
+
+
+def walk(path, params, cursor=None, backward=False):
+    """Every page of a cursor walk from `cursor`, following next (or prev) cursors."""
+    pages = []
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = pages[-1]["prev_cursor" if backward else "next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("path, sort", [
+    ('/api/cars', {"sort_by": "price"}),
+    ('/api/cars', {"sort_by": "price", "sort_direction": "desc"}),
+    ('/api/multisort', {"sort_by": "release_year,price", "sort_direction": "desc,asc"}),
+    ('/api/multisort', {"sort_by": "price,release_year", "sort_direction": "asc,desc"}),
+])
+def test_cursor_walk_across_nulls(path, sort):
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    rows = [(f"null-{i}", "Nullish", f"N{i}", "Manual", None if i % 3 else 5000 + i % 2, None if i % 2 else 2001)
+            for i in range(11)]
+    conn.executemany("INSERT INTO car VALUES (?, ?, ?, ?, ?, ?)", rows)
+    try:
+        params = {"brand": "Nullish", "match": "exact", "paging": "cursor", "size": 2, "count": "none", **sort}
+        forward = walk(path, params)
+        ids = [car["id"] for page in forward for car in page["data"]]
+        assert sorted(ids) == sorted(row[0] for row in rows)
+
+        backward = walk(path, params, forward[-1]["prev_cursor"], backward=True)
+        assert [car["id"] for page in reversed(backward) for car in page["data"]] == ids[:-len(forward[-1]["data"])]
+    finally:
+        conn.execute("DELETE FROM car WHERE brand = 'Nullish'")
+        conn.close()
+
+
+def test_find_cars_takes_one_sort_field():
+    response = client.get('/api/cars', params={"sort_by": "brand,price"})
+    assert response.status_code == 400
+    response = client.get('/api/multisort', params={"sort_by": "brand,price", "sort_direction": "asc,desc"})
+    assert response.status_code == 200
+
+
+def test_cursor_round_trip_and_rejected_cursors():
+    sort_keys = [("price", "desc"), ("id", "asc")]
+    row = type("Row", (), {"price": 12000, "id": "abc"})
+    assert decode_cursor(encode_cursor(row, sort_keys), sort_keys) == ([12000, "abc"], False)
+    assert decode_cursor(encode_cursor(row, sort_keys, backward=True), sort_keys) == ([12000, "abc"], True)
+    with pytest.raises(CursorError):
+        decode_cursor(encode_cursor(row, sort_keys), [("price", "asc"), ("id", "asc")])
+
+    cursor = client.get('/api/cars', params={"paging": "cursor", "sort_by": "price", "size": 5}).json()["next_cursor"]
+    assert client.get('/api/cars', params={"cursor": cursor, "sort_by": "brand"}).status_code == 400
+    assert client.get('/api/cars', params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_etag_revalidation_until_the_next_write():
+    params = {"brand": "Ford", "sort_by": "model"}
+    first = client.get('/api/cars', params=params)
+    etag = first.headers["etag"]
+    assert client.get('/api/cars', params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    created = client.post('/api/cars/bulk', json={"cars": [{**CARS[0], "brand": "Ford", "model": "Model 99"}]}).json()["ids"]
+    try:
+        response = client.get('/api/cars', params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["total_element"] == first.json()["total_element"] + 1
+    finally:
+        delete_cars(created)
+
+
+def test_invalidation_reaches_workers_sharing_a_backend():
+    shared = MemoryBackend()
+    writer, reader = ResponseCache(shared), ResponseCache(shared)
+    entry = reader.put("page", b"[]", reader.generation)
+    assert writer.get("page") == entry
+
+    writer.invalidate()
+    assert reader.get("page") is None
+    assert reader.generation == writer.generation == 1
+
+
+def test_count_modes():
+    exact = client.get('/api/cars', params={"size": 10}).json()
+    assert exact["total_element"] == len(CARS) and exact["total_page"] == 3
+    estimate = client.get('/api/cars', params={"size": 10, "count": "estimate"}).json()
+    assert estimate["total_element"] >= len(CARS)
+
+    last = client.get('/api/cars', params={"size": 10, "page": 3, "count": "none"}).json()
+    assert last["total_element"] is None and last["has_next"] is False and len(last["data"]) == 3
+    assert client.get('/api/cars', params={"size": 10, "count": "none"}).json()["has_next"] is True
+    assert client.get('/api/cars', params={"count": "sometimes"}).status_code == 400
+
+
+def test_id_lookup_keeps_the_requested_order():
+    ids = [car["id"] for car in client.get('/api/cars', params={"size": 3, "sort_by": "model"}).json()["data"]]
+    wanted = [ids[2], "no-such-car", ids[0]]
+
+    by_query = client.get('/api/cars', params={"ids": ",".join(wanted), "fields": "id,price"}).json()
+    assert [car["id"] for car in by_query["data"]] == [ids[2], ids[0]]
+    assert set(by_query["data"][0]) == {"id", "price"}
+    assert by_query["missing_ids"] == ["no-such-car"]
+
+    by_body = client.post('/api/cars/search/by-ids', json={"ids": wanted}).json()
+    assert [car["id"] for car in by_body["data"]] == [ids[2], ids[0]]
+    assert by_body["count"] == 2
+
+    assert client.get(f'/api/cars/{ids[1]}').json()["data"]["id"] == ids[1]
+    assert client.get('/api/cars/no-such-car').status_code == 404
+
+
+def test_bulk_insert_in_batches():
+    cars = [{**CARS[0], "brand": "Bulk", "model": f"B{i}"} for i in range(7)]
+    response = client.post('/api/cars/bulk', params={"batch_size": 3}, json={"cars": cars}).json()
+    try:
+        assert response["count"] == 7 and len(set(response["ids"])) == 7
+        assert car_ids(brand="Bulk", match="exact") == sorted(response["ids"])
+    finally:
+        delete_cars(response["ids"])
+    assert client.post('/api/cars/bulk', json={"cars": []}).status_code == 400
+
+
+def test_index_advice_for_a_sorted_equality_filter():
+    params = {"transmission": "Manual", "match": "exact", "sort_by": "release_year", "fields": "id,price"}
+    assert client.get('/api/cars', params=params).status_code == 200
+
+    reports = client.get('/api/admin/index-advice').json()["shapes"]
+    report = next(r for r in reports if r["shape"]["filters"] == ["transmission:exact"]
+                  and r["shape"]["sort"] == ["release_year asc"] and r["shape"]["paging"] == "offset")
+    assert report["temp_sort"] is True
+    suggestion = report["suggestion"]
+    assert suggestion["columns"] == ["transmission", "release_year", "id", "price"]
+    assert suggestion["covering"] is True
+    assert "transmission COLLATE NOCASE" in suggestion["ddl"]
+
+    # opt-in only
+    assert client.post('/api/admin/index-advice').status_code == 403
+
+
+def test_sticky_reads_see_their_writes_past_the_caches(monkeypatch):
+    # a replica that has not caught up with any write
+    replica_path = os.path.join(DB_DIR, "replica.db")
+    with sqlalchemy.create_engine("sqlite:///" + replica_path).begin() as conn:
+        Base.metadata.create_all(conn)
+        ensure_search_index(conn)
+    replica = create_async_engine("sqlite+aiosqlite:///" + replica_path)
+    monkeypatch.setattr("app.session_router", SessionRouter(engine, [replica], sticky_seconds=60))
+
+    writer, other = TestClient(app), TestClient(app)
+    params = {"brand": "Sticky", "count": "exact"}
+    created = writer.post('/api/cars', json={**CARS[0], "brand": "Sticky"})
+    assert created.status_code == 200
+
+    # a non-sticky read from the replica fills the caches after the write
+    stale = other.get('/api/cars', params=params).json()
+    assert stale["data"] == [] and stale["total_element"] == 0
+
+    fresh = writer.get('/api/cars', params=params).json()
+    assert [car["id"] for car in fresh["data"]] == [created.json()["data"]["id"]]
+    assert fresh["total_element"] == 1
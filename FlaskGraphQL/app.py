@@ -1,15 +1,37 @@
 from cProfile import run
-from flask import Flask, render_template, redirect, request, url_for, jsonify
+from flask import Flask, Response, render_template, redirect, request, url_for, jsonify, stream_with_context
 from werkzeug.middleware.proxy_fix import ProxyFix
-from flask_sqlalchemy import SQLAlchemy
+import json
 import uuid
-from ariadne import QueryType, load_schema_from_path, make_executable_schema, graphql_sync, MutationType
+import threading
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, inspect, select, text
+from sqlalchemy.orm import joinedload, selectinload
+from ariadne import ObjectType, QueryType, load_schema_from_path, make_executable_schema, graphql_sync, MutationType
+from export import EXPORT_FORMATS, stream_table
+from models import Car, Engine, Feature, db, seed_data
+from graphql import GraphQLError, OperationDefinitionNode, specified_rules
+from loaders import BatchLoader, selected_fields
+from persisted import DocumentCache, PersistedQueries, PersistedQueryNotFound
+from cost import CostAnalyzer, QueryCostError, TableStats
+from bulk import car_rows, car_table, check_size, chunks, delete_results, engine_ids, feature_table
+from metrics import init_flask
+import db_pool
+from connection import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, car_filters, car_order, decode_cursor, encode_cursor, order_clauses, seek_filter
 
 
 app = Flask(__name__)
 
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///cars.db"
-db = SQLAlchemy(app)
+# Pool sizing, pre-ping and pool metrics from the DB_POOL_* settings (see db_pool.py)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = db_pool.engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+db.init_app(app)
+
+# /metrics and Server-Timing (see metrics.py)
+init_flask(app)
+# 503 with Retry-After when no pooled connection frees up in time (a pool
+# timeout in a resolver leaves graphql_sync through db_pool.graphql_error_formatter)
+db_pool.init_flask(app, {"errors": [{"message": db_pool.POOL_TIMEOUT_MESSAGE}]})
 
 app.config['SECRET_KEY'] = 'mysecretkey'
 app.config['SESSION_COOKIE_SAMESITE'] = 'None'
@@ -17,6 +39,26 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SECURE'] = True
 app.config['PREFERRED_URL_SCHEME'] = 'https'
 
+# How GraphQL resolves Car.engine / Car.features:
+#   loader - batched per-request loaders, one IN query per relationship
+#   eager  - joinedload/selectinload on the root query, only for requested fields
+app.config['GRAPHQL_LOADING'] = 'loader'
+
+# Documents registered ahead of time with `python persisted.py QUERY_FILE...`
+app.config['PERSISTED_QUERIES_FILE'] = 'persisted_queries.json'
+# Cache-Control max-age for successful GET /graphql responses (0 = not cacheable)
+app.config['GRAPHQL_GET_MAX_AGE'] = 30
+
+# Static query cost limits (cost = estimated objects resolved, see cost.py).
+# Queries over GRAPHQL_MAX_COST or GRAPHQL_MAX_DEPTH are rejected; those over
+# GRAPHQL_THROTTLE_COST share GRAPHQL_EXPENSIVE_SLOTS concurrent executions
+# and get 429 if no slot frees up within GRAPHQL_THROTTLE_TIMEOUT seconds.
+app.config['GRAPHQL_MAX_COST'] = 50000
+app.config['GRAPHQL_MAX_DEPTH'] = 8
+app.config['GRAPHQL_THROTTLE_COST'] = 5000
+app.config['GRAPHQL_EXPENSIVE_SLOTS'] = 2
+app.config['GRAPHQL_THROTTLE_TIMEOUT'] = 5
+
 
 @app.route("/")
 def index():
@@ -29,165 +71,31 @@ def redirect_to_index():
     return redirect(url_for('index'))
 
 
-class Car(db.Model):
-    __tablename__ = 'cars'
-
-    car_id = db.Column(db.String(36), primary_key=True)
-    brand = db.Column(db.String(50), nullable=False)
-    model = db.Column(db.String(50), nullable=False)
-    transmission = db.Column(db.String(20), nullable=False)
-    price = db.Column(db.Integer)
-    release_year = db.Column(db.Integer)
-    description = db.Column(db.String(50))
-    engine_id = db.Column(db.String(36), db.ForeignKey('engines.engine_id'))
-    engine = db.relationship('Engine')
-    features = db.relationship('Feature', backref='car')
- 
-    def __init__(self, car_id, brand, model, transmission, price, release_year, description, engine_id):
-        self.car_id = car_id
-        self.brand = brand
-        self.model = model
-        self.transmission = transmission
-        self.price = price
-        self.release_year = release_year
-        self.description = description
-        self.engine_id = engine_id
-
-    def to_dict(self):
-        return {
-            'car_id': self.car_id,
-            'brand': self.brand, 
-            'model': self.model,
-            'transmission': self.transmission,
-            'price': self.price,
-            'release_year': self.release_year,
-            'description': self.description,
-            'engine_id': self.engine_id,
-            'features': [f.to_dict() for f in self.features]
-        }
-
-
-class Engine(db.Model):
-    __tablename__ = 'engines'
-    
-    engine_id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
-    capacity_cc = db.Column(db.Integer)
-    horsepower = db.Column(db.Integer)
-    torque = db.Column(db.Integer)
-
-    def __init__(self, engine_id, name, capacity_cc, horsepower, torque):
-        self.engine_id = engine_id
-        self.name = name
-        self.capacity_cc = capacity_cc
-        self.horsepower = horsepower
-        self.torque = torque
-        
-    def to_dict(self):
-        return {
-            'engine_id': self.engine_id, 
-            'name': self.name,
-            'capacity_cc': self.capacity_cc,
-            'horsepower': self.horsepower,
-            'torque': self.torque
-        }
-
-
-class Feature(db.Model):
-    __tablename__ = 'features'
-
-    feature_id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
-    installation_price = db.Column(db.Integer)
-    car_id = db.Column(db.String(36), db.ForeignKey('cars.car_id'))
-
-    def __init__(self, feature_id, name, installation_price):
-        self.feature_id = feature_id
-        self.name = name
-        self.installation_price = installation_price
-
-    def to_dict(self):
-        return {
-            'feature_id': self.feature_id, 
-            'name': self.name,
-            'installation_price': self.installation_price,
-            'car_id': self.car_id
-        }
-
-
 with app.app_context():
     db.drop_all()
     db.create_all()
-
-    car_ids = [
-        'bc467c74-9e09-4468-99c3-876a55a550d2',
-        '02f7d4af-d328-4f5a-a4e1-6b91e5894212',
-        '7888dc2c-d29f-40f8-b87b-db742f3b8c24',
-        '2fa568ad-ec8c-4f4d-941d-ee76149a0eb1',
-        '10d2c29b-8070-4f71-aba9-b409c132d803',
-        'b2bb6c51-cb35-4252-9ad4-7d58d9c68671',
-        '2ce64548-1a60-4848-a1db-3081dc93116a',
-        'c5363cd0-ba44-4013-84d9-451ecc1e57f4',
-        '4fbf9eb1-3b46-4162-ae0e-875c5ae5b86a',
-        'a80f0718-c2fe-4422-9c41-d31f5fcb1212'
-        ]
-
-    engine_ids = [
-        '29c59a2a-a289-4ffc-8b4d-57b6d612a6f8',
-        'e879773c-b2b8-418f-9b03-63d992ebbe27',
-        '7c68089d-0c6b-4119-94c8-5f46cf5ecce1',
-        '3092b838-4518-4d88-9cc9-65749f20f1ea'
-        ]
-
-    engine_1 = Engine( engine_ids[0], 'Dummy Engine 1', 1500, 450, 456 )
-    engine_2 = Engine( engine_ids[1], 'Dummy Engine 2', 1600, 500, 507 )
-    engine_3 = Engine( engine_ids[2], 'Dummy Engine 3', 1700, 600, 558 )
-    engine_4 = Engine( engine_ids[3], 'Dummy Engine 4', 1800, 650, 609 )
-
-    db.session.add_all( [engine_1, engine_2, engine_3, engine_4] )
-    db.session.commit()
-
-    for i in range(0, 10):
-        if i < 3:
-            brand = 'Honda'
-        elif i < 6:
-            brand = 'Ford'
-        else:
-            brand = 'BMW'
- 
-        model = brand + ' ' + str(i)
- 
-        if i % 2 != 0:
-            transmission = 'AUTOMATIC'
-        else:
-            transmission = 'MANUAL'
- 
-        price = 50000 + i
-        release_year = 2021 + (i % 3)
- 
-        engine_id = engine_ids[i % len(engine_ids)]
- 
-        car = Car( car_ids[i], brand, model, transmission, price, release_year, 'description ' + str(i), engine_id )
-        
-        feature_a = Feature( str(uuid.uuid4()), 'Feature for ' + model + ' A', 100 + i)
-        feature_b = Feature( str(uuid.uuid4()), 'Feature for ' + model + ' B', 100 + i)
-        
-        feature_a.car = car
-        feature_b.car = car
-        
-        db.session.add(car)
-        db.session.add_all( [feature_a, feature_b] ) 
-        
-        db.session.commit()
-
+    seed_data(db.session)
 ################# FLASK API #######################################
 @app.route('/api/cars', methods=['GET'])
 def find_cars():
-    cars = Car.query.all()
+    cars = Car.query.options(selectinload(Car.features)).all()
  
     response = [car.to_dict() for car in cars]
  
     return jsonify(response), 200
+
+
+@app.route('/api/cars/export', methods=['GET'])
+def export_cars():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(error = 'Invalid export format: ' + fmt), 400
+
+    return Response(
+        stream_with_context(stream_table(db.session, Car.__table__, fmt)),
+        mimetype = EXPORT_FORMATS[fmt],
+        headers = {'Content-Disposition': 'attachment; filename="cars.' + fmt + '"'}
+    )
     
 
 @app.route('/api/car/<car_id>', methods=['GET'])
@@ -209,37 +117,220 @@ def find_engine(engine_id):
 
 query = QueryType()
 mutation = MutationType()
+car_type = ObjectType("Car")
+car_connection_type = ObjectType("CarConnection")
 
-graphql_schema_def = load_schema_from_path("cars.graphql")
-schema = make_executable_schema(
-    graphql_schema_def, query, mutation
-)
+
+def load_engines(engine_ids):
+    engines = Engine.query.filter(Engine.engine_id.in_(engine_ids)).all()
+    return {engine.engine_id: engine for engine in engines}
+
+
+def load_features(car_ids):
+    features = defaultdict(list)
+    for feature in Feature.query.filter(Feature.car_id.in_(car_ids)).all():
+        features[feature.car_id].append(feature)
+    return features
+
+
+def make_loaders():
+    return {
+        "engine": BatchLoader(load_engines),
+        "features": BatchLoader(load_features, default=list),
+    }
+
+
+def car_query(info, *path):
+    """Car query for a root resolver, eager loading only the requested relationships.
+
+    `path` locates the Car selection below the current field (see selected_fields).
+    """
+    cars = Car.query
+    if app.config['GRAPHQL_LOADING'] == 'eager':
+        fields = selected_fields(info, *path)
+        if 'engine' in fields:
+            cars = cars.options(joinedload(Car.engine))
+        if 'features' in fields:
+            cars = cars.options(selectinload(Car.features))
+    return cars
+
+
+def prime_loaders(info, cars, *path):
+    """Queue the relationship keys of `cars` so each loader runs one query."""
+    if app.config['GRAPHQL_LOADING'] != 'loader':
+        return
+    fields = selected_fields(info, *path)
+    loaders = info.context["loaders"]
+    if 'engine' in fields:
+        loaders["engine"].prime(car.engine_id for car in cars)
+    if 'features' in fields:
+        loaders["features"].prime(car.car_id for car in cars)
 
 
 @query.field("find_cars")
 def resolve_find_cars(_, info):
-    return Car.query.all()
+    cars = car_query(info).all()
+    prime_loaders(info, cars)
+    return cars
+
+@query.field("carsConnection")
+def resolve_cars_connection(_, info, first=DEFAULT_PAGE_SIZE, after=None, **args):
+    if not 1 <= first <= MAX_PAGE_SIZE:
+        raise ValueError('first must be between 1 and ' + str(MAX_PAGE_SIZE))
+
+    order = car_order(args.get('orderBy'))
+    filters = car_filters(Car, args.get('filter'))
+
+    cars = car_query(info, 'edges', 'node').filter(*filters)
+    if after:
+        cars = cars.filter(seek_filter(Car, order, decode_cursor(after, order)))
+
+    # one extra row tells whether another page follows
+    rows = cars.order_by(*order_clauses(Car, order)).limit(first + 1).all()
+    has_next = len(rows) > first
+    rows = rows[:first]
+    prime_loaders(info, rows, 'edges', 'node')
+
+    edges = [{"cursor": encode_cursor(car, order), "node": car} for car in rows]
+    return {
+        "edges": edges,
+        "pageInfo": {
+            "hasNextPage": has_next,
+            "hasPreviousPage": after is not None,
+            "startCursor": edges[0]["cursor"] if edges else None,
+            "endCursor": edges[-1]["cursor"] if edges else None,
+        },
+        "filters": filters,
+    }
+
+@car_connection_type.field("totalCount")
+def resolve_cars_total_count(connection, info):
+    # only runs when totalCount is selected
+    return db.session.query(func.count(Car.car_id)).filter(*connection["filters"]).scalar()
 
 @query.field("find_car_by_id")
 def resolve_find_car_by_id(_, info, car_id):
-    return Car.query.filter(Car.car_id.__eq__(car_id)).first()
+    return car_query(info).filter(Car.car_id.__eq__(car_id)).first()
 
 @query.field("find_engine_by_id")
 def resolve_find_engine_by_id(_, info, engine_id):
-    return Engine.query.filter(Engine.engine_id.__eq__(engine_id)).first()
-
-@app.route("/graphql", methods=["POST"])
+    return info.context["loaders"]["engine"].load(engine_id)
+
+@car_type.field("engine")
+def resolve_car_engine(car, info):
+    if 'engine' not in inspect(car).unloaded:
+        return car.engine
+    if car.engine_id is None:
+        return None
+    return info.context["loaders"]["engine"].load(car.engine_id)
+
+@car_type.field("features")
+def resolve_car_features(car, info):
+    if 'features' not in inspect(car).unloaded:
+        return car.features
+    return info.context["loaders"]["features"].load(car.car_id)
+
+persisted_queries = PersistedQueries()
+persisted_queries.load(app.config['PERSISTED_QUERIES_FILE'])
+document_cache = DocumentCache()
+
+
+def collect_table_stats():
+    # max(rowid) is an O(log n) stand-in for count(*)
+    cars, features = db.session.execute(text(
+        "SELECT (SELECT max(rowid) FROM cars), (SELECT max(rowid) FROM features)"
+    )).one()
+    cars, features = cars or 0, features or 0
+    return {"cars": cars, "features_per_car": features / cars if cars else 0}
+
+
+expensive_queries = threading.BoundedSemaphore(app.config['GRAPHQL_EXPENSIVE_SLOTS'])
+
+
+def graphql_request_data():
+    """The GraphQL request body, from the JSON body or (for GET) the query string."""
+    if request.method == 'GET':
+        data = {"query": request.args.get('query'), "operationName": request.args.get('operationName')}
+        for name in ('variables', 'extensions'):
+            if request.args.get(name):
+                data[name] = json.loads(request.args[name])
+        return data
+    return request.get_json()
+
+@app.route("/graphql", methods=["GET", "POST"])
 def graphql_server():
-    data = request.get_json()
-    success, result = graphql_sync(
-        schema,
-        data,
-        context_value=request,
-        debug=app.debug
-    )
+    try:
+        data = graphql_request_data()
+    except ValueError:
+        return jsonify(errors = [{"message": "variables and extensions must be JSON"}]), 400
+
+    document = None
+    if isinstance(data, dict):
+        try:
+            query, key = persisted_queries.resolve(data)
+        except PersistedQueryNotFound as error:
+            # the client retries with the full query text
+            return jsonify(errors = [error.formatted]), 200
+        except GraphQLError as error:
+            return jsonify(errors = [error.formatted]), 400
+        data = {**data, "query": query}
+        # parsed once per hash; cached documents also skip re-validation
+        if key is not None:
+            document = document_cache.document(key, query)
+
+    if request.method == 'GET' and document is not None and any(
+        isinstance(definition, OperationDefinitionNode) and definition.operation.value != 'query'
+        for definition in document.definitions
+    ):
+        return jsonify(errors = [{"message": "Mutations must be sent with POST"}]), 405
+
+    cost = None
+    if document is not None:
+        # validated first: the cost walk assumes a valid document (no fragment cycles).
+        # Same rules as graphql_sync, so it reuses the cached result.
+        errors = document_cache.validate(schema, document, rules=specified_rules)
+        if errors:
+            return jsonify(errors = [error.formatted for error in errors]), 400
+        try:
+            cost = cost_analyzer.check(
+                document, data.get("operationName"), data.get("variables"),
+                app.config['GRAPHQL_MAX_COST'], app.config['GRAPHQL_MAX_DEPTH'],
+            )
+        except QueryCostError as error:
+            return jsonify(errors = [error.formatted], extensions = {"cost": error.extensions["cost"]}), 400
+        except GraphQLError:
+            # invalid arguments; graphql_sync reports them
+            pass
+
+    throttled = cost is not None and cost["requested"] > app.config['GRAPHQL_THROTTLE_COST']
+    if throttled and not expensive_queries.acquire(timeout=app.config['GRAPHQL_THROTTLE_TIMEOUT']):
+        response = jsonify(errors = [{"message": "Too many expensive queries, retry later"}], extensions = {"cost": cost})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+
+    try:
+        success, result = graphql_sync(
+            schema,
+            data,
+            context_value={"request": request, "loaders": make_loaders()},
+            query_document=document,
+            query_validator=document_cache.validate,
+            # GET is for reads only, so it can be cached
+            require_query=request.method == 'GET',
+            error_formatter=db_pool.graphql_error_formatter,
+            debug=app.debug
+        )
+    finally:
+        if throttled:
+            expensive_queries.release()
     status_code = 200 if success else 400
 
-    return jsonify(result), status_code
+    if cost is not None:
+        result.setdefault("extensions", {})["cost"] = cost
+    response = jsonify(result)
+    if request.method == 'GET' and success and app.config['GRAPHQL_GET_MAX_AGE']:
+        response.headers['Cache-Control'] = 'public, max-age=' + str(app.config['GRAPHQL_GET_MAX_AGE'])
+    return response, status_code
 
 @mutation.field("create_engine")
 def resolve_create_engine(_, info, name, capacity_cc=0, horsepower=0, torque=0):
@@ -285,5 +376,54 @@ def resolve_delete_car_by_id(_, info, car_id):
         "car_id": car_id
     }
 
+@mutation.field("create_cars")
+def resolve_create_cars(_, info, cars):
+    check_size(cars)
+    known_engine_ids = set()
+    for chunk in chunks(engine_ids(cars)):
+        known_engine_ids.update(db.session.scalars(select(Engine.engine_id).where(Engine.engine_id.in_(chunk))))
+
+    results, cars_rows, feature_rows = car_rows(cars, known_engine_ids)
+    if cars_rows:
+        db.session.execute(insert(car_table), cars_rows)
+    if feature_rows:
+        db.session.execute(insert(feature_table), feature_rows)
+    db.session.commit()
+    return results
+
+@mutation.field("delete_cars")
+def resolve_delete_cars(_, info, car_ids):
+    check_size(car_ids)
+    deleted = set()
+    for chunk in chunks(dict.fromkeys(car_ids)):
+        db.session.execute(delete(feature_table).where(feature_table.c.car_id.in_(chunk)))
+        deleted.update(db.session.scalars(
+            delete(car_table).where(car_table.c.car_id.in_(chunk)).returning(car_table.c.car_id)
+        ))
+    db.session.commit()
+    return delete_results(car_ids, deleted)
+
+# Bind after every resolver is registered; fields added later are ignored
+graphql_schema_def = load_schema_from_path("cars.graphql")
+schema = make_executable_schema(
+    graphql_schema_def, query, mutation, car_type, car_connection_type
+)
+
+cost_analyzer = CostAnalyzer(
+    schema,
+    TableStats(collect_table_stats),
+    list_sizes={
+        ('Query', 'find_cars'): lambda args, parent, stats: stats["cars"],
+        ('Car', 'features'): lambda args, parent, stats: stats["features_per_car"],
+        ('CarConnection', 'edges'): lambda args, parent, stats: min(parent.get('first', DEFAULT_PAGE_SIZE), stats["cars"]),
+        ('Mutation', 'create_cars'): lambda args, parent, stats: len(args['cars']),
+        ('Mutation', 'delete_cars'): lambda args, parent, stats: len(args['car_ids']),
+    },
+    field_weights={
+        # a count over the filtered cars
+        ('CarConnection', 'totalCount'): lambda args, parent, stats: stats["cars"] / 100,
+    },
+)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,408 @@
+import os
+import json
+import uuid
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import uvicorn
+from sqlalchemy import delete, func, insert, inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, joinedload, selectinload
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from ariadne import MutationType, ObjectType, QueryType, graphql, load_schema_from_path, make_executable_schema
+from graphql import GraphQLError, OperationDefinitionNode, specified_rules
+from models import Car, Engine, Feature, db, seed_data
+from loaders import AsyncBatchLoader, selected_fields
+from persisted import DocumentCache, PersistedQueries, PersistedQueryNotFound
+from cost import CostAnalyzer, QueryCostError, TableStats
+from bulk import car_rows, car_table, check_size, chunks, delete_results, engine_ids, feature_table
+from metrics import MetricsMiddleware, record_serialization
+from db_pool import POOL_TIMEOUT_MESSAGE, PoolTimeout, asgi_pool_timeout_handler, create_async_engine, graphql_error_formatter
+from connection import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, car_filters, car_order, decode_cursor, encode_cursor, order_clauses, seek_filter
+
+
+# ASGI variant of the GraphQL service (app.py is the Flask/WSGI one).
+#
+# Same schema, models and database file, executed with Ariadne's async
+# `graphql` on an AsyncSession. Every root field opens its own session, so
+# sibling root fields of one document (find_car_by_id and
+# find_engine_by_id, say) run concurrently, and a request waiting on SQLite
+# holds no worker thread. Relationships go through AsyncBatchLoader.
+#
+#     uvicorn asgi:app --port 8081
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Flask-SQLAlchemy keeps the relative `sqlite:///cars.db` of app.py in instance/
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///" + os.path.join(BASE_DIR, "instance", "cars.db"))
+
+# Same settings as app.config in app.py
+GRAPHQL_LOADING = os.getenv("GRAPHQL_LOADING", "loader")
+PERSISTED_QUERIES_FILE = os.path.join(BASE_DIR, "persisted_queries.json")
+GRAPHQL_GET_MAX_AGE = 30
+GRAPHQL_MAX_COST = 50000
+GRAPHQL_MAX_DEPTH = 8
+GRAPHQL_THROTTLE_COST = 5000
+GRAPHQL_EXPENSIVE_SLOTS = 2
+GRAPHQL_THROTTLE_TIMEOUT = 5
+TABLE_STATS_TTL = 60
+
+# DB_POOL_* settings and pool metrics, as in app.py (see db_pool.py)
+engine = create_async_engine(DATABASE_URL)
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+query = QueryType()
+mutation = MutationType()
+car_type = ObjectType("Car")
+car_connection_type = ObjectType("CarConnection")
+
+
+async def load_engines(engine_ids):
+    async with async_session() as session:
+        result = await session.execute(select(Engine).where(Engine.engine_id.in_(engine_ids)))
+        return {engine.engine_id: engine for engine in result.scalars()}
+
+
+async def load_features(car_ids):
+    features = defaultdict(list)
+    async with async_session() as session:
+        result = await session.execute(select(Feature).where(Feature.car_id.in_(car_ids)))
+        for feature in result.scalars():
+            features[feature.car_id].append(feature)
+    return features
+
+
+def make_loaders():
+    return {
+        "engine": AsyncBatchLoader(load_engines),
+        "features": AsyncBatchLoader(load_features, default=list),
+    }
+
+
+def car_select(info, *path):
+    """select(Car), eager loading only the requested relationships in eager mode."""
+    stmt = select(Car)
+    if GRAPHQL_LOADING == 'eager':
+        fields = selected_fields(info, *path)
+        if 'engine' in fields:
+            stmt = stmt.options(joinedload(Car.engine))
+        if 'features' in fields:
+            stmt = stmt.options(selectinload(Car.features))
+    return stmt
+
+
+async def fetch_cars(stmt) -> list:
+    async with async_session() as session:
+        result = await session.execute(stmt)
+        return result.scalars().unique().all()
+
+
+@query.field("find_cars")
+async def resolve_find_cars(_, info):
+    return await fetch_cars(car_select(info))
+
+@query.field("find_car_by_id")
+async def resolve_find_car_by_id(_, info, car_id):
+    cars = await fetch_cars(car_select(info).where(Car.car_id == car_id))
+    return cars[0] if cars else None
+
+@query.field("find_engine_by_id")
+async def resolve_find_engine_by_id(_, info, engine_id):
+    return await info.context["loaders"]["engine"].load(engine_id)
+
+@query.field("carsConnection")
+async def resolve_cars_connection(_, info, first=DEFAULT_PAGE_SIZE, after=None, **args):
+    if not 1 <= first <= MAX_PAGE_SIZE:
+        raise ValueError('first must be between 1 and ' + str(MAX_PAGE_SIZE))
+
+    order = car_order(args.get('orderBy'))
+    filters = car_filters(Car, args.get('filter'))
+
+    stmt = car_select(info, 'edges', 'node').where(*filters)
+    if after:
+        stmt = stmt.where(seek_filter(Car, order, decode_cursor(after, order)))
+
+    # one extra row tells whether another page follows
+    rows = await fetch_cars(stmt.order_by(*order_clauses(Car, order)).limit(first + 1))
+    has_next = len(rows) > first
+    rows = rows[:first]
+
+    edges = [{"cursor": encode_cursor(car, order), "node": car} for car in rows]
+    return {
+        "edges": edges,
+        "pageInfo": {
+            "hasNextPage": has_next,
+            "hasPreviousPage": after is not None,
+            "startCursor": edges[0]["cursor"] if edges else None,
+            "endCursor": edges[-1]["cursor"] if edges else None,
+        },
+        "filters": filters,
+    }
+
+@car_connection_type.field("totalCount")
+async def resolve_cars_total_count(connection, info):
+    async with async_session() as session:
+        result = await session.execute(select(func.count(Car.car_id)).where(*connection["filters"]))
+        return result.scalar_one()
+
+@car_type.field("engine")
+def resolve_car_engine(car, info):
+    if 'engine' not in inspect(car).unloaded:
+        return car.engine
+    if car.engine_id is None:
+        return None
+    return info.context["loaders"]["engine"].load(car.engine_id)
+
+@car_type.field("features")
+def resolve_car_features(car, info):
+    if 'features' not in inspect(car).unloaded:
+        return car.features
+    return info.context["loaders"]["features"].load(car.car_id)
+
+@mutation.field("create_engine")
+async def resolve_create_engine(_, info, name, capacity_cc=0, horsepower=0, torque=0):
+    new_engine_id = str(uuid.uuid4())
+    async with async_session() as session:
+        session.add(Engine( new_engine_id, name, capacity_cc, horsepower, torque))
+        await session.commit()
+
+    return {
+        "success": True,
+        "engine_id": new_engine_id
+    }
+
+@mutation.field("create_car")
+async def resolve_create_car(_, info, brand, model, transmission, price=None, release_year=None, description=None, engine_id=None, features=()):
+    new_car_id = str(uuid.uuid4())
+    async with async_session() as session:
+        new_car = Car( new_car_id, brand, model, transmission, price, release_year, description, engine_id )
+        session.add(new_car)
+        for f in features or ():
+            new_car_feature = Feature( str(uuid.uuid4()), f["name"], f["installation_price"])
+            new_car_feature.car_id = new_car_id
+            session.add(new_car_feature)
+        await session.commit()
+
+    return {
+        "success": True,
+        "car_id": new_car_id
+    }
+
+@mutation.field("delete_car_by_id")
+async def resolve_delete_car_by_id(_, info, car_id):
+    async with async_session() as session:
+        await session.execute(delete(Feature).where(Feature.car_id == car_id))
+        await session.execute(delete(Car).where(Car.car_id == car_id))
+        await session.commit()
+
+    return {
+        "success": True,
+        "car_id": car_id
+    }
+
+@mutation.field("create_cars")
+async def resolve_create_cars(_, info, cars):
+    check_size(cars)
+    async with async_session() as session:
+        known_engine_ids = set()
+        for chunk in chunks(engine_ids(cars)):
+            known_engine_ids.update(await session.scalars(select(Engine.engine_id).where(Engine.engine_id.in_(chunk))))
+
+        results, cars_rows, feature_rows = car_rows(cars, known_engine_ids)
+        if cars_rows:
+            await session.execute(insert(car_table), cars_rows)
+        if feature_rows:
+            await session.execute(insert(feature_table), feature_rows)
+        await session.commit()
+    return results
+
+@mutation.field("delete_cars")
+async def resolve_delete_cars(_, info, car_ids):
+    check_size(car_ids)
+    deleted = set()
+    async with async_session() as session:
+        for chunk in chunks(dict.fromkeys(car_ids)):
+            await session.execute(delete(feature_table).where(feature_table.c.car_id.in_(chunk)))
+            deleted.update(await session.scalars(
+                delete(car_table).where(car_table.c.car_id.in_(chunk)).returning(car_table.c.car_id)
+            ))
+        await session.commit()
+    return delete_results(car_ids, deleted)
+
+
+schema = make_executable_schema(
+    load_schema_from_path(os.path.join(BASE_DIR, "cars.graphql")), query, mutation, car_type, car_connection_type
+)
+
+persisted_queries = PersistedQueries()
+persisted_queries.load(PERSISTED_QUERIES_FILE)
+document_cache = DocumentCache()
+
+# Refreshed from the event loop (see refresh_table_stats); the analyzer reads the snapshot
+table_stats = {"cars": 0, "features_per_car": 0}
+table_stats_at = 0.0
+cost_analyzer = CostAnalyzer(
+    schema,
+    TableStats(lambda: table_stats, ttl=0),
+    list_sizes={
+        ('Query', 'find_cars'): lambda args, parent, stats: stats["cars"],
+        ('Car', 'features'): lambda args, parent, stats: stats["features_per_car"],
+        ('CarConnection', 'edges'): lambda args, parent, stats: min(parent.get('first', DEFAULT_PAGE_SIZE), stats["cars"]),
+        ('Mutation', 'create_cars'): lambda args, parent, stats: len(args['cars']),
+        ('Mutation', 'delete_cars'): lambda args, parent, stats: len(args['car_ids']),
+    },
+    field_weights={
+        # a count over the filtered cars
+        ('CarConnection', 'totalCount'): lambda args, parent, stats: stats["cars"] / 100,
+    },
+)
+expensive_queries = asyncio.Semaphore(GRAPHQL_EXPENSIVE_SLOTS)
+
+
+async def refresh_table_stats():
+    global table_stats, table_stats_at
+    if time.monotonic() - table_stats_at < TABLE_STATS_TTL:
+        return
+    async with engine.connect() as conn:
+        # max(rowid) is an O(log n) stand-in for count(*)
+        cars, features = (await conn.execute(text(
+            "SELECT (SELECT max(rowid) FROM cars), (SELECT max(rowid) FROM features)"
+        ))).one()
+    cars, features = cars or 0, features or 0
+    table_stats = {"cars": cars, "features_per_car": features / cars if cars else 0}
+    table_stats_at = time.monotonic()
+
+
+class GraphQLJSONResponse(JSONResponse):
+    """JSONResponse that reports its encoding time to metrics.py."""
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        record_serialization(time.perf_counter() - started, content)
+        return body
+
+
+async def graphql_request_data(request):
+    """The GraphQL request body, from the JSON body or (for GET) the query string."""
+    if request.method == 'GET':
+        data = {"query": request.query_params.get('query'), "operationName": request.query_params.get('operationName')}
+        for name in ('variables', 'extensions'):
+            if request.query_params.get(name):
+                data[name] = json.loads(request.query_params[name])
+        return data
+    return await request.json()
+
+
+async def graphql_server(request):
+    try:
+        data = await graphql_request_data(request)
+    except ValueError:
+        # GET carries JSON in the variables/extensions parameters, POST in the body
+        message = "variables and extensions must be JSON" if request.method == 'GET' else "Request body must be valid JSON"
+        return GraphQLJSONResponse({"errors": [{"message": message}]}, 400)
+
+    document = None
+    if isinstance(data, dict):
+        try:
+            query_text, key = persisted_queries.resolve(data)
+        except PersistedQueryNotFound as error:
+            # the client retries with the full query text
+            return GraphQLJSONResponse({"errors": [error.formatted]}, 200)
+        except GraphQLError as error:
+            return GraphQLJSONResponse({"errors": [error.formatted]}, 400)
+        data = {**data, "query": query_text}
+        # parsed once per hash; cached documents also skip re-validation
+        if key is not None:
+            document = document_cache.document(key, query_text)
+
+    if request.method == 'GET' and document is not None and any(
+        isinstance(definition, OperationDefinitionNode) and definition.operation.value != 'query'
+        for definition in document.definitions
+    ):
+        return GraphQLJSONResponse({"errors": [{"message": "Mutations must be sent with POST"}]}, 405)
+
+    cost = None
+    if document is not None:
+        # validated first: the cost walk assumes a valid document (no fragment cycles).
+        # Same rules as graphql(), so it reuses the cached result.
+        errors = document_cache.validate(schema, document, rules=specified_rules)
+        if errors:
+            return GraphQLJSONResponse({"errors": [error.formatted for error in errors]}, 400)
+        await refresh_table_stats()
+        try:
+            cost = cost_analyzer.check(
+                document, data.get("operationName"), data.get("variables"), GRAPHQL_MAX_COST, GRAPHQL_MAX_DEPTH,
+            )
+        except QueryCostError as error:
+            return GraphQLJSONResponse({"errors": [error.formatted], "extensions": {"cost": error.extensions["cost"]}}, 400)
+        except GraphQLError:
+            # invalid arguments; graphql reports them
+            pass
+
+    throttled = cost is not None and cost["requested"] > GRAPHQL_THROTTLE_COST
+    if throttled:
+        try:
+            await asyncio.wait_for(expensive_queries.acquire(), GRAPHQL_THROTTLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return GraphQLJSONResponse(
+                {"errors": [{"message": "Too many expensive queries, retry later"}], "extensions": {"cost": cost}},
+                429, headers={"Retry-After": "1"},
+            )
+
+    try:
+        success, result = await graphql(
+            schema,
+            data,
+            context_value={"request": request, "loaders": make_loaders()},
+            query_document=document,
+            query_validator=document_cache.validate,
+            # GET is for reads only, so it can be cached
+            require_query=request.method == 'GET',
+            error_formatter=graphql_error_formatter,
+        )
+    finally:
+        if throttled:
+            expensive_queries.release()
+    status_code = 200 if success else 400
+
+    if cost is not None:
+        result.setdefault("extensions", {})["cost"] = cost
+    headers = {}
+    if request.method == 'GET' and success and GRAPHQL_GET_MAX_AGE:
+        headers['Cache-Control'] = 'public, max-age=' + str(GRAPHQL_GET_MAX_AGE)
+    return GraphQLJSONResponse(result, status_code, headers=headers)
+
+
+def _create_and_seed(connection):
+    db.metadata.create_all(connection)
+    session = Session(bind=connection)
+    if session.scalar(select(func.count(Car.car_id))) == 0:
+        seed_data(session)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(os.path.join(BASE_DIR, "instance"), exist_ok=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_and_seed)
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[Route("/graphql", graphql_server, methods=["GET", "POST"])],
+    # /metrics and Server-Timing, as in the Flask app (see metrics.py)
+    middleware=[Middleware(MetricsMiddleware)],
+    # 503 with Retry-After when no pooled connection frees up in time
+    exception_handlers={PoolTimeout: asgi_pool_timeout_handler({"errors": [{"message": POOL_TIMEOUT_MESSAGE}]})},
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='0.0.0.0', port=8081)
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+import httpx
+
+
+# WSGI (app.py under `flask run`) vs ASGI (asgi.py under uvicorn) under
+# concurrent load. The default document has sibling root fields, which the
+# ASGI app resolves concurrently and the WSGI app one after the other.
+#
+#     python benchmark.py --requests 2000 --concurrency 50
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SIBLINGS_QUERY = """
+query Siblings($car_id: String!, $engine_id: String!) {
+    car: find_car_by_id(car_id: $car_id) { brand model engine { name } features { name } }
+    engine: find_engine_by_id(engine_id: $engine_id) { name horsepower }
+    page: carsConnection(first: 5) { edges { node { brand price } } }
+}
+"""
+
+SERVERS = {
+    "wsgi": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "{port}"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:app", "--port", "{port}", "--log-level", "warning"],
+}
+
+
+def start_server(name: str, port: int) -> subprocess.Popen:
+    command = [part.format(port=port) for part in SERVERS[name]]
+    process = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/graphql"
+    for _ in range(100):
+        try:
+            httpx.post(url, json={"query": "{ __typename }"}, timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{name} server did not start on port {port}")
+
+
+async def run_load(url: str, body: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.post(url, json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await client.post(url, json=body)  # warm-up
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "req/s": round(len(latencies) / elapsed, 1),
+        "p50 ms": round(statistics.median(latencies) * 1000, 2),
+        "p99 ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def sample_variables(url: str) -> dict:
+    data = httpx.post(url, json={"query": "{ find_cars { car_id engine { engine_id } } }"}).json()["data"]
+    car = data["find_cars"][0]
+    return {"car_id": car["car_id"], "engine_id": car["engine"]["engine_id"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WSGI and ASGI GraphQL apps")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8090, help="WSGI port; ASGI uses the next one")
+    args = parser.parse_args()
+
+    results = {}
+    # app.py recreates the database on import, so it goes first
+    for offset, name in enumerate(("wsgi", "asgi")):
+        port = args.port + offset
+        process = start_server(name, port)
+        try:
+            url = f"http://127.0.0.1:{port}/graphql"
+            body = {"query": SIBLINGS_QUERY, "variables": sample_variables(url)}
+            results[name] = asyncio.run(run_load(url, body, args.requests, args.concurrency))
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    for name, result in results.items():
+        print(f"  {name}: " + ", ".join(f"{k} {v}" for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import uuid
+from itertools import islice
+from models import Car, Feature
+
+
+# Row building for the list-input mutations (create_cars / delete_cars).
+#
+# The resolvers validate the whole list up front, insert every accepted car
+# and feature with one Core executemany per table and delete with
+# `DELETE ... WHERE car_id IN`, all in one transaction: one commit (one
+# fsync) per call instead of one per car. Each input item gets its own
+# result, in input order; a car_id repeated in delete_cars is deleted once
+# and its repeats are reported as duplicates.
+
+MAX_BULK_ITEMS = 1000
+
+# ids per IN list, below SQLite's historical 999 bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+car_table = Car.__table__
+feature_table = Feature.__table__
+
+
+def check_size(items: list):
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError('At most ' + str(MAX_BULK_ITEMS) + ' items per call')
+
+
+def chunks(items, size: int = IN_CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def engine_ids(cars: list) -> list:
+    """The distinct engine ids referenced by CarInput items."""
+    return list(dict.fromkeys(car["engine_id"] for car in cars if car.get("engine_id")))
+
+
+def car_rows(cars: list, known_engine_ids: set) -> tuple:
+    """(results, car rows, feature rows) for CarInput items.
+
+    Items referencing an unknown engine are reported and skipped.
+    """
+    results, cars_rows, feature_rows = [], [], []
+    for car in cars:
+        engine_id = car.get("engine_id")
+        if engine_id and engine_id not in known_engine_ids:
+            results.append({"success": False, "car_id": None, "error": "Unknown engine_id " + engine_id})
+            continue
+
+        car_id = str(uuid.uuid4())
+        cars_rows.append({
+            "car_id": car_id,
+            "brand": car["brand"],
+            "model": car["model"],
+            "transmission": car["transmission"],
+            "price": car.get("price"),
+            "release_year": car.get("release_year"),
+            "description": car.get("description"),
+            "engine_id": engine_id,
+        })
+        for feature in car.get("features") or ():
+            feature_rows.append({
+                "feature_id": str(uuid.uuid4()),
+                "name": feature["name"],
+                "installation_price": feature["installation_price"],
+                "car_id": car_id,
+            })
+        results.append({"success": True, "car_id": car_id, "error": None})
+    return results, cars_rows, feature_rows
+
+
+def delete_results(car_ids: list, deleted: set) -> list:
+    """One result per requested id; only the first of repeated ids reports the delete."""
+    results, seen = [], set()
+    for car_id in car_ids:
+        if car_id in seen:
+            results.append({"success": False, "car_id": car_id, "error": "Duplicate car_id"})
+        elif car_id in deleted:
+            results.append({"success": True, "car_id": car_id, "error": None})
+        else:
+            results.append({"success": False, "car_id": car_id, "error": "Car not found"})
+        seen.add(car_id)
+    return results
@@ -0,0 +1,94 @@
+import json
+import base64
+from sqlalchemy import and_, or_
+
+
+# Relay-style cursor pagination for carsConnection.
+#
+# Cars are ordered by one column plus the primary key as a tiebreaker, and
+# a cursor holds that (value, car_id) pair together with the order it was
+# produced for. The next page seeks past the pair with a range predicate the
+# (column, car_id) index can answer, so a page costs the same however deep
+# it is. SQLite sorts NULL before every value, which the predicates follow
+# for nullable columns.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+ORDER_FIELDS = {
+    'CAR_ID': 'car_id',
+    'BRAND': 'brand',
+    'MODEL': 'model',
+    'PRICE': 'price',
+    'RELEASE_YEAR': 'release_year',
+}
+
+
+class CursorError(ValueError):
+    """Raised when an `after` cursor is malformed or was made for another order."""
+
+
+def car_order(order_by) -> tuple:
+    """(column name, 'ASC' | 'DESC') for an orderBy argument (default: car_id ascending)."""
+    order_by = order_by or {}
+    field = ORDER_FIELDS[order_by.get('field') or 'CAR_ID']
+    direction = order_by.get('direction') or 'ASC'
+    return field, direction
+
+
+def car_filters(model, car_filter) -> list:
+    """WHERE clauses for a CarFilter argument."""
+    car_filter = car_filter or {}
+    filters = []
+    for field in ('brand', 'model', 'transmission', 'release_year'):
+        if car_filter.get(field) is not None:
+            filters.append(getattr(model, field) == car_filter[field])
+    if car_filter.get('price_min') is not None:
+        filters.append(model.price >= car_filter['price_min'])
+    if car_filter.get('price_max') is not None:
+        filters.append(model.price <= car_filter['price_max'])
+    return filters
+
+
+def encode_cursor(car, order: tuple) -> str:
+    field, direction = order
+    payload = {"v": [getattr(car, field), car.car_id], "o": [field, direction]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: tuple) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, cursor_order = payload["v"], tuple(payload["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError("Malformed cursor") from e
+    if cursor_order != tuple(order) or len(values) != 2:
+        raise CursorError("Cursor does not match orderBy")
+    return values
+
+
+def order_clauses(model, order: tuple) -> list:
+    field, direction = order
+    columns = [getattr(model, field), model.car_id]
+    return [c.asc() for c in columns] if direction == 'ASC' else [c.desc() for c in columns]
+
+
+def seek_filter(model, order: tuple, values: list):
+    """Rows strictly after the (value, car_id) pair `values` in `order`."""
+    field, direction = order
+    col, pk = getattr(model, field), model.car_id
+    value, car_id = values
+    nullable = col.nullable and field != 'car_id'
+
+    if direction == 'ASC':
+        if value is None:
+            # still inside the NULL block, or past it
+            return or_(and_(col.is_(None), pk > car_id), col.isnot(None))
+        return and_(col >= value, or_(col > value, pk > car_id))
+
+    if value is None:
+        return and_(col.is_(None), pk < car_id)
+    after = and_(col <= value, or_(col < value, pk < car_id))
+    return or_(after, col.is_(None)) if nullable else after
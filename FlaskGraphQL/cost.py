@@ -0,0 +1,159 @@
+import math
+import time
+import threading
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode, OperationDefinitionNode,
+    get_named_type, get_nullable_type, is_composite_type, is_list_type,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+
+# Static cost analysis for GraphQL documents, run before execution.
+#
+# The cost of a query is an estimate of the objects it makes the server
+# resolve: every object-typed field costs one per parent object, and list
+# fields multiply everything below them by their expected length. List
+# lengths come from per-field rules fed with live table statistics (rows
+# per table, features per car) and the field arguments (e.g. `first`);
+# scalar fields are free unless given a weight. Depth counts nested object
+# selections.
+
+DEFAULT_LIST_SIZE = 10
+
+
+class QueryCostError(GraphQLError):
+    """Raised for documents over the cost budget or the depth limit."""
+
+    def __init__(self, message: str, cost: dict):
+        super().__init__(message, extensions={"code": "QUERY_TOO_EXPENSIVE", "cost": cost})
+
+
+class TableStats:
+    """Table statistics from `collect()`, refreshed at most every `ttl` seconds."""
+
+    def __init__(self, collect, ttl: float = 60.0):
+        self.collect = collect
+        self.ttl = ttl
+        self._stats = None
+        self._collected_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        with self._lock:
+            if self._stats is None or time.monotonic() - self._collected_at > self.ttl:
+                self._stats = self.collect()
+                self._collected_at = time.monotonic()
+            return self._stats
+
+
+class CostAnalyzer:
+    """Estimates (cost, depth) of an operation against a schema."""
+
+    def __init__(self, schema, stats: TableStats, list_sizes: dict = None, field_weights: dict = None,
+                 default_list_size: int = DEFAULT_LIST_SIZE):
+        self.schema = schema
+        self.stats = stats
+        # {(type name, field name): fn(args, parent_args, stats) -> expected length}
+        self.list_sizes = list_sizes or {}
+        # {(type name, field name): fn(args, parent_args, stats) -> cost} for scalar fields
+        self.field_weights = field_weights or {}
+        self.default_list_size = default_list_size
+
+    def analyze(self, document, operation_name=None, variables=None) -> tuple:
+        operation = _operation(document, operation_name)
+        if operation is None:
+            return 0, 0
+        root = self.schema.get_root_type(operation.operation)
+        fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        # coerced the way the executor does it (a dict, or VariableValues on graphql-core 3.3)
+        coerced = get_variable_values(self.schema, operation.variable_definitions or (), variables or {})
+        if isinstance(coerced, list):
+            raise coerced[0]
+        cost, depth = self._selection_cost(
+            root, [operation.selection_set], 1, 0, {}, fragments, coerced, self.stats.get(),
+        )
+        return math.ceil(cost), depth
+
+    def check(self, document, operation_name, variables, max_cost: int, max_depth: int) -> dict:
+        """Cost report for the operation; raises QueryCostError over either limit."""
+        cost, depth = self.analyze(document, operation_name, variables)
+        report = {"requested": cost, "budget": max_cost, "depth": depth, "max_depth": max_depth}
+        if depth > max_depth:
+            raise QueryCostError(f"Query depth {depth} exceeds the limit of {max_depth}", report)
+        if cost > max_cost:
+            raise QueryCostError(f"Query cost {cost} exceeds the budget of {max_cost}", report)
+        return report
+
+    def _selection_cost(self, parent_type, selection_sets, multiplier, depth, parent_args, fragments, variables, stats):
+        total, max_depth = 0, depth
+        for field_type, nodes in self._fields(parent_type, selection_sets, fragments).values():
+            field = nodes[0]
+            name = field.name.value
+            field_def = field_type.fields.get(name) if hasattr(field_type, 'fields') else None
+            if field_def is None:
+                # introspection and unknown fields (left to validation)
+                continue
+            args = get_argument_values(field_def, field, variables)
+            key = (field_type.name, name)
+
+            if not is_composite_type(get_named_type(field_def.type)):
+                weight = self.field_weights.get(key)
+                if weight is not None:
+                    total += multiplier * weight(args, parent_args, stats)
+                continue
+
+            size = 1
+            if is_list_type(get_nullable_type(field_def.type)):
+                rule = self.list_sizes.get(key)
+                size = rule(args, parent_args, stats) if rule else self.default_list_size
+            count = multiplier * size
+            sub_cost, sub_depth = self._selection_cost(
+                get_named_type(field_def.type), [node.selection_set for node in nodes], count, depth + 1, args,
+                fragments, variables, stats,
+            )
+            total += count + sub_cost
+            max_depth = max(max_depth, sub_depth)
+        return total, max_depth
+
+    def _fields(self, parent_type, selection_sets, fragments) -> dict:
+        """{response key: (type, [FieldNode])} of merged selection sets, with fragments expanded.
+
+        Like the executor, each fragment is expanded once however many times
+        it is spread, and fields with the same response key are costed once.
+        """
+        fields, visited = {}, set()
+
+        def collect(selection_type, selection_set):
+            if selection_set is None:
+                return
+            for selection in selection_set.selections:
+                if isinstance(selection, FieldNode):
+                    response_key = (selection.alias or selection.name).value
+                    fields.setdefault(response_key, (selection_type, []))[1].append(selection)
+                elif isinstance(selection, InlineFragmentNode):
+                    collect(self._condition_type(selection_type, selection), selection.selection_set)
+                elif isinstance(selection, FragmentSpreadNode) and selection.name.value not in visited:
+                    visited.add(selection.name.value)
+                    fragment = fragments.get(selection.name.value)
+                    if fragment is not None:
+                        collect(self._condition_type(selection_type, fragment), fragment.selection_set)
+
+        for selection_set in selection_sets:
+            collect(parent_type, selection_set)
+        return fields
+
+    def _condition_type(self, parent_type, fragment):
+        if fragment.type_condition is None:
+            return parent_type
+        return self.schema.get_type(fragment.type_condition.name.value) or parent_type
+
+
+def _operation(document, operation_name):
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if operation_name:
+        return next((op for op in operations if op.name and op.name.value == operation_name), None)
+    return operations[0] if len(operations) == 1 else None
@@ -0,0 +1,47 @@
+import io
+import csv
+import json
+from sqlalchemy import select
+
+# Rows fetched from the cursor per batch; memory use is bounded by one batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def ndjson_chunks(columns, partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_table(session, table, fmt, batch_size = EXPORT_BATCH_SIZE):
+    """Yield every row of `table` encoded as `fmt`, one batch at a time.
+
+    Rows are read as plain tuples through a streaming cursor, so neither ORM
+    objects nor the full result are ever held in memory.
+    """
+    columns = [c.name for c in table.columns]
+    stmt = select(*table.columns).execution_options(stream_results = True, yield_per = batch_size)
+    encode = ndjson_chunks if fmt == 'ndjson' else csv_chunks
+
+    result = session.execute(stmt)
+    try:
+        yield from encode(columns, result.partitions())
+    finally:
+        result.close()
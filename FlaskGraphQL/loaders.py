@@ -0,0 +1,124 @@
+import asyncio
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+# Per-request batching for relationship resolvers.
+#
+# graphql_sync resolves list items one after the other, so a loader cannot
+# wait for the other items to ask for their keys. Instead the resolver that
+# returns the list primes the loader with every key its items will need;
+# the first load() then fetches all queued keys with a single IN query and
+# later loads are answered from the loader's cache. Loaders live in the
+# request context and are thrown away with it.
+
+
+class BatchLoader:
+    """Coalesces keys and fetches them with one `batch_fn(keys) -> {key: value}` call."""
+
+    def __init__(self, batch_fn, default=None):
+        self.batch_fn = batch_fn
+        # factory for keys the batch did not return (e.g. `list` for one-to-many)
+        self.default = default
+        self.batches = 0
+        self._cache = {}
+        self._queue = {}
+
+    def prime(self, keys):
+        """Queue `keys` so the next load fetches them together."""
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._queue[key] = None
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue[key] = None
+            self._dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys) -> list:
+        keys = list(keys)
+        self.prime(keys)
+        return [self.load(key) for key in keys]
+
+    def _dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        results = self.batch_fn(keys)
+        self.batches += 1
+        for key in keys:
+            value = results.get(key)
+            if value is None and self.default is not None:
+                value = self.default()
+            self._cache[key] = value
+
+
+class AsyncBatchLoader:
+    """Async counterpart of BatchLoader for the ASGI app.
+
+    The async executor calls the resolvers of every list item before any of
+    them is awaited, so keys requested in the same event-loop turn are
+    collected and fetched together by one `await batch_fn(keys)` call; no
+    priming is needed.
+    """
+
+    def __init__(self, batch_fn, default=None):
+        self.batch_fn = batch_fn
+        self.default = default
+        self.batches = 0
+        self._cache = {}
+        self._queue = []
+
+    def load(self, key) -> asyncio.Future:
+        future = self._cache.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._cache[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        asyncio.ensure_future(self._run(keys))
+
+    async def _run(self, keys):
+        try:
+            results = await self.batch_fn(keys)
+        except Exception as error:
+            for key in keys:
+                self._cache[key].set_exception(error)
+            return
+        self.batches += 1
+        for key in keys:
+            value = results.get(key)
+            if value is None and self.default is not None:
+                value = self.default()
+            self._cache[key].set_result(value)
+
+
+def _field_nodes(info, selection_set):
+    """FieldNodes of a selection set, with fragments expanded."""
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _field_nodes(info, selection.selection_set)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments.get(selection.name.value)
+            if fragment is not None:
+                yield from _field_nodes(info, fragment.selection_set)
+
+
+def selected_fields(info, *path) -> set:
+    """Names of the fields selected under the current field, fragments included.
+
+    `path` descends into nested selections first, e.g.
+    `selected_fields(info, 'edges', 'node')` for the nodes of a connection.
+    """
+    nodes = list(info.field_nodes)
+    for name in path:
+        nodes = [child for node in nodes for child in _field_nodes(info, node.selection_set) if child.name.value == name]
+    return {child.name.value for node in nodes for child in _field_nodes(info, node.selection_set)}
@@ -0,0 +1,164 @@
+import uuid
+from flask_sqlalchemy import SQLAlchemy
+
+
+# Shared by the Flask app (app.py) and the ASGI variant (asgi.py); the
+# Flask app binds it with db.init_app, asgi.py only uses the mapped classes.
+db = SQLAlchemy()
+
+
+class Car(db.Model):
+    __tablename__ = 'cars'
+
+    car_id = db.Column(db.String(36), primary_key=True)
+    brand = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(50), nullable=False)
+    transmission = db.Column(db.String(20), nullable=False)
+    price = db.Column(db.Integer)
+    release_year = db.Column(db.Integer)
+    description = db.Column(db.String(50))
+    engine_id = db.Column(db.String(36), db.ForeignKey('engines.engine_id'))
+    engine = db.relationship('Engine')
+    features = db.relationship('Feature', backref='car')
+
+    # (column, car_id) indexes back the carsConnection filters and seeks
+    __table_args__ = (
+        db.Index('ix_cars_brand_car_id', 'brand', 'car_id'),
+        db.Index('ix_cars_model_car_id', 'model', 'car_id'),
+        db.Index('ix_cars_price_car_id', 'price', 'car_id'),
+        db.Index('ix_cars_release_year_car_id', 'release_year', 'car_id'),
+    )
+ 
+    def __init__(self, car_id, brand, model, transmission, price, release_year, description, engine_id):
+        self.car_id = car_id
+        self.brand = brand
+        self.model = model
+        self.transmission = transmission
+        self.price = price
+        self.release_year = release_year
+        self.description = description
+        self.engine_id = engine_id
+
+    def to_dict(self):
+        return {
+            'car_id': self.car_id,
+            'brand': self.brand, 
+            'model': self.model,
+            'transmission': self.transmission,
+            'price': self.price,
+            'release_year': self.release_year,
+            'description': self.description,
+            'engine_id': self.engine_id,
+            'features': [f.to_dict() for f in self.features]
+        }
+
+
+class Engine(db.Model):
+    __tablename__ = 'engines'
+    
+    engine_id = db.Column(db.String(36), primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    capacity_cc = db.Column(db.Integer)
+    horsepower = db.Column(db.Integer)
+    torque = db.Column(db.Integer)
+
+    def __init__(self, engine_id, name, capacity_cc, horsepower, torque):
+        self.engine_id = engine_id
+        self.name = name
+        self.capacity_cc = capacity_cc
+        self.horsepower = horsepower
+        self.torque = torque
+        
+    def to_dict(self):
+        return {
+            'engine_id': self.engine_id, 
+            'name': self.name,
+            'capacity_cc': self.capacity_cc,
+            'horsepower': self.horsepower,
+            'torque': self.torque
+        }
+
+
+class Feature(db.Model):
+    __tablename__ = 'features'
+
+    feature_id = db.Column(db.String(36), primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    installation_price = db.Column(db.Integer)
+    car_id = db.Column(db.String(36), db.ForeignKey('cars.car_id'), index=True)
+
+    def __init__(self, feature_id, name, installation_price):
+        self.feature_id = feature_id
+        self.name = name
+        self.installation_price = installation_price
+
+    def to_dict(self):
+        return {
+            'feature_id': self.feature_id, 
+            'name': self.name,
+            'installation_price': self.installation_price,
+            'car_id': self.car_id
+        }
+
+
+def seed_data(session):
+    """Insert the sample engines, cars and features."""
+    car_ids = [
+        'bc467c74-9e09-4468-99c3-876a55a550d2',
+        '02f7d4af-d328-4f5a-a4e1-6b91e5894212',
+        '7888dc2c-d29f-40f8-b87b-db742f3b8c24',
+        '2fa568ad-ec8c-4f4d-941d-ee76149a0eb1',
+        '10d2c29b-8070-4f71-aba9-b409c132d803',
+        'b2bb6c51-cb35-4252-9ad4-7d58d9c68671',
+        '2ce64548-1a60-4848-a1db-3081dc93116a',
+        'c5363cd0-ba44-4013-84d9-451ecc1e57f4',
+        '4fbf9eb1-3b46-4162-ae0e-875c5ae5b86a',
+        'a80f0718-c2fe-4422-9c41-d31f5fcb1212'
+        ]
+
+    engine_ids = [
+        '29c59a2a-a289-4ffc-8b4d-57b6d612a6f8',
+        'e879773c-b2b8-418f-9b03-63d992ebbe27',
+        '7c68089d-0c6b-4119-94c8-5f46cf5ecce1',
+        '3092b838-4518-4d88-9cc9-65749f20f1ea'
+        ]
+
+    engine_1 = Engine( engine_ids[0], 'Dummy Engine 1', 1500, 450, 456 )
+    engine_2 = Engine( engine_ids[1], 'Dummy Engine 2', 1600, 500, 507 )
+    engine_3 = Engine( engine_ids[2], 'Dummy Engine 3', 1700, 600, 558 )
+    engine_4 = Engine( engine_ids[3], 'Dummy Engine 4', 1800, 650, 609 )
+
+    session.add_all( [engine_1, engine_2, engine_3, engine_4] )
+
+    for i in range(0, 10):
+        if i < 3:
+            brand = 'Honda'
+        elif i < 6:
+            brand = 'Ford'
+        else:
+            brand = 'BMW'
+ 
+        model = brand + ' ' + str(i)
+ 
+        if i % 2 != 0:
+            transmission = 'AUTOMATIC'
+        else:
+            transmission = 'MANUAL'
+ 
+        price = 50000 + i
+        release_year = 2021 + (i % 3)
+ 
+        engine_id = engine_ids[i % len(engine_ids)]
+ 
+        car = Car( car_ids[i], brand, model, transmission, price, release_year, 'description ' + str(i), engine_id )
+        
+        feature_a = Feature( str(uuid.uuid4()), 'Feature for ' + model + ' A', 100 + i)
+        feature_b = Feature( str(uuid.uuid4()), 'Feature for ' + model + ' B', 100 + i)
+        
+        feature_a.car = car
+        feature_b.car = car
+        
+        session.add(car)
+        session.add_all( [feature_a, feature_b] ) 
+
+    session.commit()
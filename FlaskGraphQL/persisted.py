@@ -0,0 +1,170 @@
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from graphql import GraphQLError, parse, validate
+
+
+# Automatic persisted queries and a parsed-document cache.
+#
+# Clients may send `extensions.persistedQuery.sha256Hash` instead of the
+# query text (Apollo's APQ protocol). Unknown hashes are answered with
+# PersistedQueryNotFound; the client then retries with the text, which is
+# registered under its hash. Documents loaded from the registry file are
+# kept for good; auto-registered ones live in a bounded LRU.
+#
+# Whatever the source, the text is parsed once per hash. Documents that
+# passed validation are remembered, so later requests skip both parse and
+# validate and go straight to execution.
+#
+# Register documents ahead of time with:
+#
+#     python persisted.py queries/*.graphql
+
+
+REGISTRY_FILE = "persisted_queries.json"
+
+
+class PersistedQueryNotFound(GraphQLError):
+    def __init__(self):
+        super().__init__("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueries:
+    """Hash-to-document registry: permanent entries plus an LRU of APQ registrations."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._registered = {}
+        self._automatic = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, query: str, permanent: bool = False) -> str:
+        key = query_hash(query)
+        with self._lock:
+            if permanent:
+                self._registered[key] = query
+            elif key not in self._registered:
+                self._automatic[key] = query
+                self._automatic.move_to_end(key)
+                while len(self._automatic) > self.max_entries:
+                    self._automatic.popitem(last=False)
+        return key
+
+    def get(self, key: str):
+        with self._lock:
+            query = self._registered.get(key)
+            if query is None:
+                query = self._automatic.get(key)
+                if query is not None:
+                    self._automatic.move_to_end(key)
+            return query
+
+    def load(self, path: str = REGISTRY_FILE) -> int:
+        """Add the documents of a registry file written by `save_registry`."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                documents = json.load(f)
+        except FileNotFoundError:
+            return 0
+        for query in documents.values():
+            self.register(query, permanent=True)
+        return len(documents)
+
+    def resolve(self, data: dict) -> tuple:
+        """(query, hash) for a request body, registering or looking up persisted queries."""
+        persisted = ((data.get("extensions") or {}).get("persistedQuery") or {})
+        key = persisted.get("sha256Hash")
+        query = data.get("query")
+
+        if key is None:
+            return query, query_hash(query) if isinstance(query, str) else None
+        if not query:
+            query = self.get(key)
+            if query is None:
+                raise PersistedQueryNotFound()
+            return query, key
+        if query_hash(query) != key:
+            raise GraphQLError("provided sha does not match query", extensions={"code": "PERSISTED_QUERY_HASH_MISMATCH"})
+        self.register(query)
+        return query, key
+
+
+class DocumentCache:
+    """LRU of parsed documents by query hash, remembering which passed validation."""
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._documents = OrderedDict()
+        self._valid = {}
+        self._lock = threading.Lock()
+
+    def document(self, key: str, query: str):
+        """The parsed document for `query`, or None if it does not parse."""
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                return document
+        try:
+            document = parse(query)
+        except GraphQLError:
+            # let the executor report the syntax error
+            return None
+        with self._lock:
+            self._documents[key] = document
+            while len(self._documents) > self.max_entries:
+                _, evicted = self._documents.popitem(last=False)
+                self._valid.pop(id(evicted), None)
+        return document
+
+    def validate(self, schema, document, rules=None, **kwargs) -> list:
+        """Query validator for graphql_sync that validates each cached document once."""
+        rules_key = tuple(rules) if rules else None
+        with self._lock:
+            entry = self._valid.get(id(document))
+            if entry is not None and entry[0] is document and entry[1] == rules_key:
+                return []
+        errors = validate(schema, document, rules=rules, **kwargs)
+        if not errors:
+            with self._lock:
+                self._valid[id(document)] = (document, rules_key)
+        return errors
+
+
+def save_registry(paths, registry_file: str = REGISTRY_FILE, schema_file: str = "cars.graphql") -> dict:
+    """Validate the documents in `paths` against the schema and add them to the registry file."""
+    from ariadne import load_schema_from_path, make_executable_schema
+
+    schema = make_executable_schema(load_schema_from_path(schema_file))
+    try:
+        with open(registry_file, encoding="utf-8") as f:
+            documents = json.load(f)
+    except FileNotFoundError:
+        documents = {}
+
+    added = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            query = f.read()
+        errors = validate(schema, parse(query))
+        if errors:
+            raise ValueError(path + ": " + "; ".join(e.message for e in errors))
+        documents[query_hash(query)] = query
+        added[path] = query_hash(query)
+
+    with open(registry_file, "w", encoding="utf-8") as f:
+        json.dump(documents, f, indent=2, sort_keys=True)
+    return added
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("usage: python persisted.py QUERY_FILE...")
+    for path, key in save_registry(sys.argv[1:]).items():
+        print(key, path)
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import tempfile
+import pytest
+from sqlalchemy import event
+from starlette.testclient import TestClient
+
+# asgi.py gets a throwaway database; app.py keeps its instance/cars.db
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(prefix="flask-graphql-tests-"), "cars.db")
+
+import asgi
+from app import app, db
+from persisted import query_hash
+
+
+client = app.test_client()
+
+
+def graphql(query, **data):
+    return client.post('/graphql', json={"query": query, **data})
+
+
+def test_cyclic_fragment_is_rejected_by_validation():
+    response = graphql('query { ...A } fragment A on Query { ...A }')
+    assert response.status_code == 400
+    assert 'Cannot spread fragment' in response.get_json()['errors'][0]['message']
+
+
+def test_fragment_fan_out_is_costed_in_linear_time():
+    # F0 reaches F30 through 2^30 spread paths; each fragment is costed once
+    levels = 30
+    fragments = [
+        f'fragment F{i} on Query {{ ...G{i} ...H{i} }} '
+        f'fragment G{i} on Query {{ ...F{i + 1} }} '
+        f'fragment H{i} on Query {{ ...F{i + 1} ...F{i + 1} }}'
+        for i in range(levels)
+    ]
+    fragments.append(f'fragment F{levels} on Query {{ find_engine_by_id(engine_id: "none") {{ name }} }}')
+    started = time.perf_counter()
+    response = graphql('query { ...F0 } ' + ' '.join(fragments))
+    assert time.perf_counter() - started < 5
+    assert response.status_code == 200
+    assert response.get_json()['extensions']['cost'] == {"requested": 1, "budget": 50000, "depth": 1, "max_depth": 8}
+
+
+class QueryLog:
+    """The SQL statements run on an engine while the block runs."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self.log)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.log)
+
+    def log(self, conn, cursor, statement, *args):
+        # the cost analyzer's table statistics are not part of the query
+        if "max(rowid)" not in statement:
+            self.statements.append(statement)
+
+
+def test_relationships_are_loaded_in_one_query_each():
+    with app.app_context(), QueryLog(db.engine) as queries:
+        response = graphql('{ find_cars { car_id engine { name } features { name } } }')
+    cars = response.get_json()['data']['find_cars']
+    assert len(cars) == 10
+    assert any(car['engine'] for car in cars) and any(car['features'] for car in cars)
+    # cars, then engines and features for all of them
+    assert len(queries.statements) == 3
+
+
+def connection_page(after=None):
+    query = """query ($after: String) {
+        carsConnection(first: 4, after: $after, orderBy: {field: PRICE, direction: DESC}) {
+            edges { cursor node { car_id price } }
+            pageInfo { hasNextPage hasPreviousPage endCursor }
+            totalCount
+        }
+    }"""
+    response = graphql(query, variables={"after": after})
+    assert response.status_code == 200
+    return response.get_json()['data']['carsConnection']
+
+
+def test_connection_pages_through_every_car():
+    pages = [connection_page()]
+    while pages[-1]['pageInfo']['hasNextPage']:
+        pages.append(connection_page(pages[-1]['pageInfo']['endCursor']))
+
+    nodes = [edge['node'] for page in pages for edge in page['edges']]
+    assert len(pages) == 3 and pages[0]['totalCount'] == 10
+    assert len({node['car_id'] for node in nodes}) == 10
+    assert [node['price'] for node in nodes] == sorted((node['price'] for node in nodes), reverse=True)
+    assert [page['pageInfo']['hasPreviousPage'] for page in pages] == [False, True, True]
+
+
+def test_persisted_query_is_registered_after_not_found():
+    query = '{ find_car_by_id(car_id: "bc467c74-9e09-4468-99c3-876a55a550d2") { brand } }'
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+    missing = graphql(None, extensions=extensions)
+    assert missing.status_code == 200
+    assert missing.get_json()['errors'][0]['message'] == 'PersistedQueryNotFound'
+
+    registered = graphql(query, extensions=extensions)
+    assert registered.get_json()['data'] == {"find_car_by_id": {"brand": "Honda"}}
+    by_hash = client.get('/graphql', query_string={"extensions": json.dumps(extensions)})
+    assert by_hash.get_json()['data'] == {"find_car_by_id": {"brand": "Honda"}}
+    assert by_hash.headers['Cache-Control'] == 'public, max-age=30'
+
+
+def test_query_over_budget_is_rejected(monkeypatch):
+    monkeypatch.setitem(app.config, 'GRAPHQL_MAX_COST', 5)
+    response = graphql('{ find_cars { car_id } }')
+    assert response.status_code == 400
+    body = response.get_json()
+    assert 'data' not in body
+    assert body['extensions']['cost']['requested'] > body['extensions']['cost']['budget'] == 5
+
+
+CREATE_CARS = """mutation ($cars: [CarInput!]!) { create_cars(cars: $cars) { success car_id error } }"""
+DELETE_CARS = """mutation ($ids: [String!]!) { delete_cars(car_ids: $ids) { success car_id error } }"""
+
+
+def test_bulk_create_and_delete():
+    cars = [
+        {"brand": "Bulk", "model": "B1", "transmission": "MANUAL", "features": [{"name": "Roof", "installation_price": 10}]},
+        {"brand": "Bulk", "model": "B2", "transmission": "MANUAL", "engine_id": "no-such-engine"},
+        {"brand": "Bulk", "model": "B3", "transmission": "MANUAL", "engine_id": "29c59a2a-a289-4ffc-8b4d-57b6d612a6f8"},
+    ]
+    created = graphql(CREATE_CARS, variables={"cars": cars}).get_json()['data']['create_cars']
+    assert [result['success'] for result in created] == [True, False, True]
+    assert created[1]['error'] == 'Unknown engine_id no-such-engine'
+    ids = [created[0]['car_id'], created[2]['car_id']]
+
+    deleted = graphql(DELETE_CARS, variables={"ids": ids + ["no-such-car"]}).get_json()['data']['delete_cars']
+    assert deleted == [
+        {"success": True, "car_id": ids[0], "error": None},
+        {"success": True, "car_id": ids[1], "error": None},
+        {"success": False, "car_id": "no-such-car", "error": "Car not found"},
+    ]
+    assert len(graphql('{ find_cars { car_id } }').get_json()['data']['find_cars']) == 10
+
+
+def test_repeated_ids_are_deleted_once():
+    cars = [{"brand": "Bulk", "model": "D1", "transmission": "MANUAL"}]
+    car_id = graphql(CREATE_CARS, variables={"cars": cars}).get_json()['data']['create_cars'][0]['car_id']
+
+    deleted = graphql(DELETE_CARS, variables={"ids": [car_id, "no-such-car", car_id]}).get_json()['data']['delete_cars']
+    assert deleted == [
+        {"success": True, "car_id": car_id, "error": None},
+        {"success": False, "car_id": "no-such-car", "error": "Car not found"},
+        {"success": False, "car_id": car_id, "error": "Duplicate car_id"},
+    ]
+
+
+@pytest.fixture()
+def asgi_client():
+    # entering the client runs the lifespan handler, which creates and seeds the database
+    with TestClient(asgi.app) as asgi_client:
+        yield asgi_client
+
+
+def test_asgi_resolves_root_fields_and_mutations(asgi_client):
+    query = """{
+        find_car_by_id(car_id: "bc467c74-9e09-4468-99c3-876a55a550d2") { brand engine { engine_id } }
+        find_engine_by_id(engine_id: "29c59a2a-a289-4ffc-8b4d-57b6d612a6f8") { name }
+    }"""
+    response = asgi_client.post('/graphql', json={"query": query})
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert data['find_car_by_id']['brand'] == 'Honda'
+    assert data['find_engine_by_id'] == {"name": "Dummy Engine 1"}
+    assert 'cost' in response.json()['extensions']
+
+    cars = [{"brand": "Bulk", "model": "A1", "transmission": "MANUAL"}]
+    created = asgi_client.post('/graphql', json={"query": CREATE_CARS, "variables": {"cars": cars}}).json()
+    car_id = created['data']['create_cars'][0]['car_id']
+    deleted = asgi_client.post('/graphql', json={"query": DELETE_CARS, "variables": {"ids": [car_id]}}).json()
+    assert deleted['data']['delete_cars'] == [{"success": True, "car_id": car_id, "error": None}]
+
+    twice = asgi_client.post('/graphql', json={"query": DELETE_CARS, "variables": {"ids": ["x", "x"]}}).json()
+    assert [result['error'] for result in twice['data']['delete_cars']] == ["Car not found", "Duplicate car_id"]
+
+    invalid = asgi_client.post('/graphql', content=b'{"query": ', headers={"Content-Type": "application/json"})
+    assert invalid.status_code == 400
+    assert invalid.json()['errors'] == [{"message": "Request body must be valid JSON"}]
+    invalid = asgi_client.get('/graphql', params={"query": "{ find_cars { car_id } }", "variables": "{"})
+    assert invalid.json()['errors'] == [{"message": "variables and extensions must be JSON"}]
+
+    mutation = asgi_client.get('/graphql', params={"query": DELETE_CARS, "variables": json.dumps({"ids": []})})
+    assert mutation.status_code == 405
+
+
+def test_requests_that_raise_are_counted_as_500(monkeypatch):
+    def broken(car_id):
+        raise RuntimeError("broken view")
+
+    monkeypatch.setitem(app.view_functions, 'find_car', broken)
+    series = 'http_request_duration_seconds_count{method="GET",route="/api/car/<car_id>",status="500"}'
+
+    def count():
+        lines = [line for line in client.get('/metrics').text.splitlines() if line.startswith(series)]
+        return int(lines[0].split()[-1]) if lines else 0
+
+    before = count()
+    assert client.get('/api/car/x').status_code == 500
+    # propagated exceptions skip after_request altogether
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', True)
+    with pytest.raises(RuntimeError):
+        client.get('/api/car/x')
+    assert count() == before + 2
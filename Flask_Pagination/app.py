@@ -1,13 +1,20 @@
-from flask import Flask, render_template, redirect, request, url_for, jsonify
+from flask import Flask, render_template, redirect, request, url_for, jsonify, abort
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
+import math
 import uuid
 import random
-from sqlalchemy import and_, text
+from sqlalchemy import insert
+from count_cache import COUNT_MODES, count_cache
+from query_builder import CarQuery, InvalidQuery
+from metrics import init_flask
+import db_pool
 
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///carcatlog.db"
+# Pool sizing, pre-ping and pool metrics from the DB_POOL_* settings (see db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db = SQLAlchemy(app)
 
 app.config['SECRET_KEY'] = 'mysecretkey'
@@ -18,6 +25,11 @@ app.config['SESSION_COOKIE_SECURE'] = True
 
 app.config['PREFERRED_URL_SCHEME'] = 'https'
 
+# /metrics and Server-Timing (see metrics.py)
+init_flask(app)
+# 503 with Retry-After when no pooled connection frees up in time
+db_pool.init_flask(app)
+
 class Car(db.Model):
     id = db.Column(db.String(50), primary_key=True)
     brand = db.Column(db.String(50))
@@ -47,7 +59,8 @@ with app.app_context():
     db.drop_all()
     db.create_all()
 
-
+    # Seed in one executemany and one commit instead of a commit per row
+    rows = []
     for i in range(1, 101):
         if i <= 33:
             brand = 'Honda'
@@ -66,9 +79,13 @@ with app.app_context():
         price = random.randint(30000, 80000)
         release_year = 2020 + (i % 3)
      
-        car = Car( str(uuid.uuid4()), brand, model, transmission, price, release_year )
-        db.session.add(car)
-        db.session.commit()
+        rows.append({ 'id': str(uuid.uuid4()), 'brand': brand, 'model': model,
+            'transmission': transmission, 'price': price, 'release_year': release_year })
+
+    db.session.execute(insert(Car), rows)
+    db.session.commit()
+
+    count_cache.invalidate()
 
 #########################################################################################
 @app.route("/")
@@ -82,115 +99,103 @@ def redirect_to_index():
     return redirect(url_for('index'))
 
 
-@app.route('/api/cars', methods=['GET'])
-def find_cars():
-    page = request.args.get('page', 1, type = int)
-    size = request.args.get('size', 10, type = int)
-    brand = request.args.get('brand', '%')
-    model = request.args.get('model', '%')
-    transmission = request.args.get('transmission', '%')
+car_query = CarQuery(Car, entities=True)
+
+
+def paginate_cars(spec, page, size, count):
+    if count not in COUNT_MODES:
+        return jsonify(error = 'Invalid count mode: ' + count), 400
+    if page < 1 or size < 1:
+        abort(404)
+
+    offset = (page - 1) * size
+
+    if count == 'none':
+        # Fetch one extra row to tell whether a next page exists
+        stmt, params = car_query.page(spec, offset, size + 1)
+        cars = db.session.execute(stmt, params).scalars().all()
+        if not cars and page != 1:
+            abort(404)
+
+        return jsonify(
+        data = [car.to_json() for car in cars[:size]],
+        page = page,
+        size = size,
+        total_element = None,
+        total_page = None,
+        has_next = len(cars) > size
+        ), 200
+
+    # Reuse a cached total for this filter set instead of running COUNT(*) again
+    total = count_cache.get(spec.count_key, allow_stale = (count == 'estimate'))
+    if total is None:
+        generation = count_cache.generation
+        stmt, params = car_query.count(spec)
+        total = db.session.execute(stmt, params).scalar_one()
+        count_cache.put(spec.count_key, total, generation)
+
+    stmt, params = car_query.page(spec, offset, size)
+    cars = db.session.execute(stmt, params).scalars().all()
+    if not cars and page != 1:
+        abort(404)
  
-    price_operator = request.args.get('price_operator')
-    price_value = request.args.get('price', 0, type = int)
-    price_max_value = request.args.get('price_max', price_value + 1, type = int)
-
-    sort_by = request.args.get('sort_by')
-    sort_direction = request.args.get('sort_direction', 'asc')
-
-    query = Car.query
- 
-    query = query.filter( \
-            and_( \
-                Car.brand.ilike('%' + brand + '%'), \
-                Car.model.ilike('%' + model + '%'), \
-                Car.transmission.ilike('%' + transmission + '%') \
-            ) \
-        ) \
-
-    if price_operator == 'lte':
-        query = query.filter(Car.price <= price_value)
-    elif price_operator == 'gte':
-        query = query.filter(Car.price >= price_value)
-    elif price_operator == 'between':
-        query = query.filter(Car.price >= price_value, Car.price <= price_max_value)
- 
-    if sort_by and sort_direction == 'asc':
-        query = query.order_by( getattr(Car, sort_by).asc() );
-    elif sort_by and sort_direction == 'desc':
-        query = query.order_by( getattr(Car, sort_by).desc() );
-    cars = query.paginate(page = page, per_page = size)
- 
-    cars_response = [car.to_json() for car in cars.items]
+    cars_response = [car.to_json() for car in cars]
  
     return jsonify(
     data = cars_response,
     page = page,
     size = size,
-    total_element = cars.total,
-    total_page = cars.pages
+    total_element = total,
+    total_page = math.ceil(total / size)
     ), 200
 
 
+def car_spec_from_args():
+    price_value = request.args.get('price', 0, type = int)
+
+    return car_query.spec(
+        brand = request.args.get('brand', '%'),
+        model = request.args.get('model', '%'),
+        transmission = request.args.get('transmission', '%'),
+        price_operator = request.args.get('price_operator'),
+        price = price_value,
+        price_max = request.args.get('price_max', price_value + 1, type = int),
+        sort_by = request.args.get('sort_by'),
+        sort_direction = request.args.get('sort_direction', 'asc')
+    )
 
-@app.route('/api/multisort', methods=['GET'])
-def find_cars_multisort():
+
+@app.route('/api/cars', methods=['GET'])
+def find_cars():
     page = request.args.get('page', 1, type = int)
     size = request.args.get('size', 10, type = int)
-    brand = request.args.get('brand', '%')
-    model = request.args.get('model', '%')
-    transmission = request.args.get    ('transmission', '%')
- 
-    price_operator = request.args.get('price_operator')
-    price_value = request.args.get('price', 0, type = int)
-    price_max_value = request.args.get('price_max', price_value + 1, type = int)
+    count = request.args.get('count', 'exact')
 
     sort_by = request.args.get('sort_by')
-    sort_direction = request.args.get('sort_direction', 'asc')
+    if sort_by and ',' in sort_by:
+        return jsonify(error = 'Invalid sort field: ' + sort_by), 400
 
-    query = Car.query
- 
-    query = query.filter( \
-            and_( \
-                Car.brand.ilike('%' + brand + '%'), \
-                Car.model.ilike('%' + model + '%'), \
-                Car.transmission.ilike('%' + transmission + '%') \
-            ) \
-        ) \
-
-    if price_operator == 'lte':
-        query = query.filter(Car.price <= price_value)
-    elif price_operator == 'gte':
-        query = query.filter(Car.price >= price_value)
-    elif price_operator == 'between':
-        query = query.filter(Car.price >= price_value, Car.price <= price_max_value)
- 
+    try:
+        spec = car_spec_from_args()
+    except InvalidQuery as e:
+        return jsonify(error = str(e)), 400
 
-    list_sort_by = sort_by.split(',')
-    list_sort_direction = sort_direction.split(',')
+    return paginate_cars(spec, page, size, count)
 
-    diff = len(list_sort_by) - len(list_sort_direction)
- 
-    for x in range(diff):
-        list_sort_direction.append('asc')
 
-    sort_columns = []
-    
-    for idx, sb in enumerate(list_sort_by):
-        sort_columns.append(sb + ' ' + list_sort_direction[idx])
- 
-    query = query.order_by( text(','.join(sort_columns)) )
 
-    cars = query.paginate(page = page, per_page = size)
- 
-    cars_response = [car.to_json() for car in cars.items]
- 
-    return jsonify(
-    data = cars_response,
-    page = page,
-    size = size,
-    total_element = cars.total,
-    total_page = cars.pages
-    ), 200
+@app.route('/api/multisort', methods=['GET'])
+def find_cars_multisort():
+    page = request.args.get('page', 1, type = int)
+    size = request.args.get('size', 10, type = int)
+    count = request.args.get('count', 'exact')
+
+    try:
+        spec = car_spec_from_args()
+    except InvalidQuery as e:
+        return jsonify(error = str(e)), 400
+
+    return paginate_cars(spec, page, size, count)
 
 
 
@@ -0,0 +1,225 @@
+import threading
+from typing import NamedTuple, Optional
+from collections import OrderedDict
+from sqlalchemy import Integer, bindparam, func, select
+
+
+# Shared filter-and-sort builder for the catalog endpoints.
+#
+# Request parameters are normalized into a hashable CarQuerySpec. The parts
+# that change the SQL text (which filters are active, how each one matches,
+# the price operator, the sort order and the selected columns) form the
+# spec's `shape`; the values only ever travel as bound parameters.
+# Statements are built once per shape and reused, so a request only pays for
+# binding its values, and SQLAlchemy finds the compiled form in its compiled
+# cache.
+#
+# Like metrics.py and db_pool.py, this file is the same in every service.
+# Services that match text differently or page by key (Fast_pagination's
+# catalog_query.py) subclass CarQuery instead of editing it.
+
+TEXT_FIELDS = ('brand', 'model', 'transmission')
+PRICE_OPERATORS = ('lte', 'gte', 'between')
+SORT_DIRECTIONS = ('asc', 'desc')
+
+
+class InvalidQuery(ValueError):
+    """Raised for sort fields, selected fields or match modes the builder cannot honour."""
+
+
+class CarQuerySpec(NamedTuple):
+    # ((field, kind, value), ...) for active text filters only
+    text: tuple = ()
+    price_operator: Optional[str] = None
+    price: int = 0
+    price_max: Optional[int] = None
+    # ((field, direction), ...)
+    sort: tuple = ()
+    # columns to return, in order; () for all of them
+    fields: tuple = ()
+
+    @property
+    def count_key(self) -> tuple:
+        """The filter part of the spec, normalized for the count cache."""
+        if self.price_operator == 'between':
+            price_filter = (self.price_operator, self.price, self.price + 1 if self.price_max is None else self.price_max)
+        elif self.price_operator is not None:
+            price_filter = (self.price_operator, self.price)
+        else:
+            price_filter = None
+        return self.text, price_filter
+
+    @property
+    def shape(self) -> tuple:
+        return (
+            tuple((field, kind) for field, kind, _ in self.text),
+            self.price_operator,
+            self.sort,
+            self.fields,
+        )
+
+    @property
+    def filter_shape(self) -> tuple:
+        """The part of `shape` the count statement depends on."""
+        return self.shape[:2]
+
+
+def parse_sort(sort_by: Optional[str], sort_direction: str = 'asc') -> tuple:
+    """Parse comma separated sort fields/directions, padding directions with 'asc'.
+
+    Directions are case-insensitive; anything but asc/desc raises InvalidQuery.
+    """
+    if not sort_by:
+        return ()
+    fields = [s.strip() for s in sort_by.split(',') if s.strip()]
+    directions = [s.strip() for s in sort_direction.split(',') if s.strip()]
+    for direction in directions:
+        if direction.lower() not in SORT_DIRECTIONS:
+            raise InvalidQuery(f"Invalid sort direction: {direction}")
+    directions = [direction.lower() for direction in directions]
+    directions += ['asc'] * (len(fields) - len(directions))
+    return tuple(zip(fields, directions))
+
+
+def parse_fields(fields: Optional[str]) -> tuple:
+    """Parse a comma separated `fields=` list, dropping blanks and duplicates."""
+    if not fields:
+        return ()
+    return tuple(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+
+
+def is_wildcard(value: Optional[str]) -> bool:
+    """True when a filter matches everything and its predicate can be dropped."""
+    return value is None or value.strip('%') == ''
+
+
+class CarQuery:
+    """Builds (and caches) count and offset-page statements for a model.
+
+    Pages select plain columns, so rows come back as tuples; `entities=True`
+    selects ORM instances instead (and ignores `spec.fields`).
+    """
+
+    # accepted values of spec(match=...)
+    MATCH_MODES = ('contains',)
+
+    def __init__(self, model, cache_size: int = 256, entities: bool = False):
+        self.model = model
+        self.columns = frozenset(model.__table__.columns.keys())
+        self.select_columns = list(model.__table__.columns)
+        self.entities = entities
+        self.cache_size = cache_size
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def spec(self, brand: str = '%', model: str = '%', transmission: str = '%',
+             price_operator: Optional[str] = None, price: int = 0, price_max: Optional[int] = None,
+             sort_by: Optional[str] = None, sort_direction: str = 'asc',
+             match: str = 'contains', fields: Optional[str] = None) -> CarQuerySpec:
+        if match not in self.MATCH_MODES:
+            raise InvalidQuery(f"Invalid match mode: {match}")
+
+        text = []
+        for field, value in zip(TEXT_FIELDS, (brand, model, transmission)):
+            # '%' (the default) matches every row, so those filters are not applied at all
+            if not is_wildcard(value):
+                text.append((field, *self.text_filter(value, match)))
+
+        if price_operator not in PRICE_OPERATORS:
+            price_operator, price, price_max = None, 0, None
+
+        sort = parse_sort(sort_by, sort_direction)
+        for field, _ in sort:
+            if field not in self.columns:
+                raise InvalidQuery(f"Invalid sort field: {field}")
+
+        return CarQuerySpec(tuple(text), price_operator, price, price_max, sort, self.fields(fields))
+
+    def text_filter(self, value: str, match: str) -> tuple:
+        """(kind, value) of a text filter; case-insensitive values are stored lowercased."""
+        return 'like', value.lower()
+
+    def fields(self, fields: Optional[str]) -> tuple:
+        """Validated `fields=` list; () selects every column."""
+        fields = parse_fields(fields)
+        for field in fields:
+            if field not in self.columns:
+                raise InvalidQuery(f"Invalid field: {field}")
+        return fields
+
+    def select_list(self, fields: tuple = ()) -> list:
+        """Columns to select for a validated `fields` tuple."""
+        if self.entities:
+            return [self.model]
+        if not fields:
+            return self.select_columns
+        return [self.model.__table__.columns[field] for field in fields]
+
+    def params(self, spec: CarQuerySpec) -> dict:
+        """Bound values for the filters of `spec`."""
+        params = self._text_params(spec.text)
+        if spec.price_operator is not None:
+            params["price"] = spec.price
+        if spec.price_operator == 'between':
+            params["price_max"] = spec.price + 1 if spec.price_max is None else spec.price_max
+        return params
+
+    # statements
+
+    def count(self, spec: CarQuerySpec) -> tuple:
+        """(statement, params) counting the rows matching `spec`."""
+        stmt = self._cached(('count', spec.filter_shape), lambda: (
+            select(func.count()).select_from(self.model).where(*self._where(spec))
+        ))
+        return stmt, self.params(spec)
+
+    def page(self, spec: CarQuerySpec, offset: int, limit: int) -> tuple:
+        """(statement, params) for `limit` rows from `offset`, in the order of `spec.sort`."""
+        def build():
+            stmt = select(*self.select_list(spec.fields)).where(*self._where(spec))
+            stmt = stmt.order_by(*self.order_by(spec.sort))
+            return stmt.limit(bindparam("limit", type_=Integer)).offset(bindparam("offset", type_=Integer))
+
+        stmt = self._cached(('page', spec.shape), build)
+        return stmt, {**self.params(spec), "limit": limit, "offset": offset}
+
+    def order_by(self, sort: tuple) -> list:
+        clauses = []
+        for field, direction in sort:
+            col = getattr(self.model, field)
+            clauses.append(col.asc() if direction == 'asc' else col.desc())
+        return clauses
+
+    # internals
+
+    def _text_params(self, text: tuple) -> dict:
+        return {field: f"%{value}%" for field, _, value in text}
+
+    def _text_filters(self, text: tuple) -> list:
+        return [getattr(self.model, field).ilike(bindparam(field)) for field, _, _ in text]
+
+    def _where(self, spec: CarQuerySpec) -> list:
+        filters = self._text_filters(spec.text)
+
+        price = self.model.price
+        if spec.price_operator == 'lte':
+            filters.append(price <= bindparam("price"))
+        elif spec.price_operator == 'gte':
+            filters.append(price >= bindparam("price"))
+        elif spec.price_operator == 'between':
+            filters.append(price >= bindparam("price"))
+            filters.append(price <= bindparam("price_max"))
+        return filters
+
+    def _cached(self, key: tuple, build):
+        with self._lock:
+            stmt = self._statements.get(key)
+            if stmt is not None:
+                self._statements.move_to_end(key)
+                return stmt
+        stmt = build()
+        with self._lock:
+            self._statements[key] = stmt
+            while len(self._statements) > self.cache_size:
+                self._statements.popitem(last=False)
+        return stmt
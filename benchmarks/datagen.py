@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import bisect
+import random
+import argparse
+from itertools import accumulate
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, only for --format parquet
+    pyarrow = None
+
+
+# Seeded, streaming synthetic catalog data.
+#
+# The app seeders cycle three brands with `i % 3` and draw prices uniformly,
+# which hides the skew seen in production: a few hot brands, long-tail
+# models and prices that depend on the brand. Here brands and each brand's
+# models are drawn from Zipf distributions. Every brand has its own
+# log-normal price curve, with a fixed factor per model, and newer release
+# years are more common. The FlaskGraphQL layout adds engines shared by
+# many cars and a varying number of features per car.
+#
+# Rows are generated one at a time from `seed`, so the same spec always
+# produces the same rows and 50M rows never sit in memory. Output goes to
+# SQLite through the bulk loader in seed.py, or to NDJSON or Parquet files
+# (Fast_pagination's `create_data.py --input` loads the NDJSON).
+#
+#     python benchmarks/datagen.py --rows 1000000 --format sqlite --output /tmp/cars.db
+#     python benchmarks/datagen.py --rows 50000000 --format parquet --output /tmp/cars --layout graphql
+
+DISTRIBUTIONS = ('zipf', 'uniform')
+LAYOUTS = ('car', 'graphql')
+FORMATS = ('sqlite', 'ndjson', 'parquet')
+
+BRAND_NAMES = (
+    'Honda', 'Ford', 'BMW', 'Toyota', 'Volkswagen', 'Mercedes-Benz', 'Hyundai', 'Nissan', 'Kia', 'Audi',
+    'Chevrolet', 'Peugeot', 'Renault', 'Skoda', 'Mazda', 'Subaru', 'Volvo', 'Tesla', 'Lexus', 'Fiat',
+    'Jeep', 'Mitsubishi', 'Suzuki', 'Citroen', 'Opel', 'Seat', 'Dacia', 'Porsche', 'Land Rover', 'Mini',
+    'Jaguar', 'Alfa Romeo', 'Infiniti', 'Cadillac', 'Genesis', 'Lancia', 'Saab', 'Maserati', 'Bentley', 'Ferrari',
+)
+TRANSMISSIONS = ('AUTOMATIC', 'MANUAL')
+
+# The apps' own seeding pattern, kept for comparisons with older results
+UNIFORM_BRANDS = ('Honda', 'Ford', 'BMW')
+UNIFORM_PRICE_RANGE = (30000, 80000)
+UNIFORM_YEARS = (2020, 2021, 2022)
+
+MIN_PRICE, MAX_PRICE = 5000, 2000000
+
+
+class DataSpec:
+    """Everything that determines a generated dataset; equal specs give equal rows."""
+
+    def __init__(self, rows: int, seed: int = 0, distribution: str = 'zipf', brands: int = 40,
+                 models_per_brand: int = 200, brand_skew: float = 1.1, model_skew: float = 1.2,
+                 years: tuple = (2005, 2024), automatic_share: float = 0.7, price_sigma: float = 0.25,
+                 cars_per_engine: int = 50, features_per_car: float = 2.0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Invalid distribution: {distribution}")
+        if rows < 0 or brands < 1 or models_per_brand < 1 or years[0] > years[1]:
+            raise ValueError("rows, brands, models_per_brand and years must describe a non-empty catalog")
+        self.rows = rows
+        self.seed = seed
+        self.distribution = distribution
+        self.brands = brands
+        self.models_per_brand = models_per_brand
+        self.brand_skew = brand_skew
+        self.model_skew = model_skew
+        self.years = tuple(years)
+        self.automatic_share = automatic_share
+        self.price_sigma = price_sigma
+        self.cars_per_engine = cars_per_engine
+        self.features_per_car = features_per_car
+
+    def to_dict(self) -> dict:
+        if self.distribution == 'uniform':
+            return {"rows": self.rows, "seed": self.seed, "distribution": self.distribution}
+        return dict(vars(self), years=list(self.years))
+
+    def brand_names(self) -> list:
+        if self.distribution == 'uniform':
+            return list(UNIFORM_BRANDS)
+        extra = [f"Brand {i}" for i in range(len(BRAND_NAMES) + 1, self.brands + 1)]
+        return list(BRAND_NAMES[:self.brands]) + extra
+
+    def engine_count(self) -> int:
+        return max(1, math.ceil(self.rows / self.cars_per_engine))
+
+
+class Zipf:
+    """Ranks 0..n-1 with P(k) proportional to 1 / (k + 1) ** s."""
+
+    def __init__(self, n: int, s: float):
+        self.cumulative = list(accumulate(1 / k ** s for k in range(1, n + 1)))
+
+    def sample(self, rng: random.Random) -> int:
+        index = bisect.bisect_right(self.cumulative, rng.random() * self.cumulative[-1])
+        return min(index, len(self.cumulative) - 1)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+# car rows
+
+def cars(spec: DataSpec):
+    """Yield `spec.rows` car dicts: id, brand, model, transmission, price, release_year."""
+    if spec.distribution == 'uniform':
+        yield from _uniform_cars(spec)
+        return
+
+    rng = random.Random(spec.seed)
+    # per-brand and per-model parameters come from their own stream so they
+    # do not depend on the number of rows
+    params = random.Random(f"{spec.seed}:catalog")
+    brands = spec.brand_names()
+    brand_rank = Zipf(len(brands), spec.brand_skew)
+    model_rank = Zipf(spec.models_per_brand, spec.model_skew)
+    # brand median price between 15k and 150k, each model within ~+-40% of it
+    medians = [math.exp(params.uniform(math.log(15000), math.log(150000))) for _ in brands]
+    model_factors = [[params.lognormvariate(0, 0.2) for _ in range(spec.models_per_brand)] for _ in brands]
+    first_year, last_year = spec.years
+    years = list(range(first_year, last_year + 1))
+    year_weights = list(accumulate(range(1, len(years) + 1)))  # newer years more common
+
+    for _ in range(spec.rows):
+        b = brand_rank.sample(rng)
+        m = model_rank.sample(rng)
+        price = medians[b] * model_factors[b][m] * rng.lognormvariate(0, spec.price_sigma)
+        yield {
+            "id": _uuid(rng),
+            "brand": brands[b],
+            "model": f"{brands[b]} M{m + 1}",
+            "transmission": TRANSMISSIONS[0] if rng.random() < spec.automatic_share else TRANSMISSIONS[1],
+            "price": min(MAX_PRICE, max(MIN_PRICE, int(round(price, -2)))),
+            "release_year": rng.choices(years, cum_weights=year_weights)[0],
+        }
+
+
+def _uniform_cars(spec: DataSpec):
+    rng = random.Random(spec.seed)
+    for i in range(1, spec.rows + 1):
+        brand = UNIFORM_BRANDS[i % len(UNIFORM_BRANDS)]
+        yield {
+            "id": _uuid(rng),
+            "brand": brand,
+            "model": f"{brand} {i}",
+            "transmission": TRANSMISSIONS[i % len(TRANSMISSIONS)],
+            "price": rng.randint(*UNIFORM_PRICE_RANGE),
+            "release_year": UNIFORM_YEARS[i % len(UNIFORM_YEARS)],
+        }
+
+
+# FlaskGraphQL layout: engines, cars, features
+
+def engines(spec: DataSpec):
+    rng = random.Random(f"{spec.seed}:engines")
+    for i in range(spec.engine_count()):
+        capacity = rng.choice(range(1000, 6100, 100))
+        yield {
+            "engine_id": _uuid(rng),
+            "name": f"Engine {i + 1}",
+            "capacity_cc": capacity,
+            "horsepower": int(capacity * rng.uniform(0.06, 0.2)),
+            "torque": int(capacity * rng.uniform(0.08, 0.25)),
+        }
+
+
+def graph_cars(spec: DataSpec, engine_ids: list):
+    """Yield (car, [features]) with the FlaskGraphQL column names; engines are Zipf-shared."""
+    rng = random.Random(f"{spec.seed}:features")
+    engine_rank = Zipf(len(engine_ids), 1.0)
+    max_features = max(0, round(2 * spec.features_per_car))
+    for i, car in enumerate(cars(spec)):
+        car_id = car.pop("id")
+        row = {"car_id": car_id, **car, "description": f"description {i}",
+               "engine_id": engine_ids[engine_rank.sample(rng)]}
+        features = [{
+            "feature_id": _uuid(rng),
+            "name": f"Feature for {car['model']} {n + 1}",
+            "installation_price": rng.randrange(100, 5000, 50),
+            "car_id": car_id,
+        } for n in range(rng.randint(0, max_features))]
+        yield row, features
+
+
+# files
+
+class NDJSONWriter:
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Buffers records into row groups of `batch_size`; needs pyarrow."""
+
+    def __init__(self, path: str, batch_size: int = 100000):
+        if pyarrow is None:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.batch_size = batch_size
+        self.batch = []
+        self.writer = None
+        self.count = 0
+
+    def write(self, record: dict):
+        self.batch.append(record)
+        if len(self.batch) == self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        table = pyarrow.Table.from_pylist(self.batch)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.count += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        if self.batch:
+            self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {'ndjson': NDJSONWriter, 'parquet': ParquetWriter}
+
+
+def write_files(output: str, spec: DataSpec, layout: str, fmt: str) -> dict:
+    """Write `output` (car layout), or engines/cars/features files in the `output` directory (graphql layout)."""
+    writer = WRITERS[fmt]
+    if layout == 'car':
+        outputs = {"cars": writer(output)}
+    else:
+        os.makedirs(output, exist_ok=True)
+        outputs = {name: writer(os.path.join(output, f"{name}.{fmt}")) for name in ("engines", "cars", "features")}
+    try:
+        if layout == 'car':
+            for car in cars(spec):
+                outputs["cars"].write(car)
+        else:
+            engine_ids = []
+            for engine in engines(spec):
+                outputs["engines"].write(engine)
+                engine_ids.append(engine["engine_id"])
+            for car, features in graph_cars(spec, engine_ids):
+                outputs["cars"].write(car)
+                for feature in features:
+                    outputs["features"].write(feature)
+    finally:
+        for out in outputs.values():
+            out.close()
+    return {name: out.count for name, out in outputs.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic car catalog")
+    parser.add_argument("-n", "--rows", type=int, required=True, help="number of cars")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default='zipf')
+    parser.add_argument("--brands", type=int, default=40)
+    parser.add_argument("--models-per-brand", type=int, default=200)
+    parser.add_argument("--brand-skew", type=float, default=1.1, help="Zipf exponent for brands")
+    parser.add_argument("--model-skew", type=float, default=1.2, help="Zipf exponent for models within a brand")
+    parser.add_argument("--years", default="2005-2024", help="first-last release year")
+    parser.add_argument("--layout", choices=LAYOUTS, default='car', help="car table, or FlaskGraphQL engines/cars/features")
+    parser.add_argument("--format", choices=FORMATS, default='sqlite')
+    parser.add_argument("-o", "--output", required=True, help="SQLite file, data file, or directory (graphql files)")
+    parser.add_argument("--table", default="car", help="car table name for --format sqlite --layout car")
+    args = parser.parse_args(argv)
+
+    first, _, last = args.years.partition("-")
+    spec = DataSpec(
+        args.rows, args.seed, args.distribution, brands=args.brands, models_per_brand=args.models_per_brand,
+        brand_skew=args.brand_skew, model_skew=args.model_skew, years=(int(first), int(last or first)),
+    )
+
+    started = time.perf_counter()
+    if args.format == 'sqlite':
+        from seed import create_tables, seed_cars, seed_graphql
+        create_tables(args.output, args.layout, args.table)
+        if args.layout == 'car':
+            dataset = seed_cars(args.output, spec, args.table)
+        else:
+            dataset = seed_graphql(args.output, spec)
+        counts = {"cars": dataset.rows}
+    else:
+        counts = write_files(args.output, spec, args.layout, args.format)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" written to {args.output} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
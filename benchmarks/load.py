@@ -0,0 +1,101 @@
+import re
+import math
+import time
+import random
+import asyncio
+
+
+# Closed-loop load: `concurrency` clients work through a request plan drawn
+# from the service's mix, each sending its next request as soon as the
+# previous one returns. Latency is measured around the client call. The DB
+# time and query count come from the Server-Timing header that every service
+# adds (see metrics.py in each service).
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Sample:
+    __slots__ = ("scenario", "seconds", "status", "queries", "db_ms")
+
+    def __init__(self, scenario: str, seconds: float, status: int, queries=None, db_ms=None):
+        self.scenario = scenario
+        self.seconds = seconds
+        self.status = status
+        self.queries = queries
+        self.db_ms = db_ms
+
+
+def request_plan(service, dataset, requests: int, seed: int) -> list:
+    """[(scenario, method, path, json body), ...]; the same for the same seed and dataset."""
+    rng = random.Random(seed)
+    mix = service.mix()
+    names, weights = list(mix), list(mix.values())
+    plan = []
+    for name in rng.choices(names, weights, k=requests):
+        plan.append((name,) + service.scenarios[name](rng, dataset))
+    return plan
+
+
+def server_timing(header) -> tuple:
+    """(queries, db milliseconds) from a Server-Timing header, or (None, None)."""
+    match = SERVER_TIMING_DB.search(header or "")
+    if match is None:
+        return None, None
+    return int(match.group(2)), float(match.group(1))
+
+
+async def drive(send, plan: list, concurrency: int) -> tuple:
+    """Run `plan` through `send(method, path, json=body)` -> response; returns (samples, elapsed seconds)."""
+    samples = []
+    pending = iter(plan)
+
+    async def client():
+        for scenario, method, path, body in pending:
+            started = time.perf_counter()
+            response = await send(method, path, json=body)
+            seconds = time.perf_counter() - started
+            samples.append(Sample(scenario, seconds, response.status_code, *server_timing(response.headers.get("server-timing"))))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+    db_ms = [sample.db_ms for sample in samples if sample.db_ms is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample.status >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "db_queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "db_ms_per_request": round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+    }
+
+
+def report(samples: list, elapsed: float) -> dict:
+    """Overall summary plus one per scenario (scenario throughput is its share of the run)."""
+    by_scenario = {}
+    for sample in samples:
+        by_scenario.setdefault(sample.scenario, []).append(sample)
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize(samples, elapsed),
+        "scenarios": {name: summarize(group, elapsed) for name, group in sorted(by_scenario.items())},
+    }
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from datagen import DISTRIBUTIONS, DataSpec
+from load import drive, report, request_plan
+from services import ROOT, SERVICES
+
+
+# Load-test harness for the catalog services.
+#
+# Each service runs in its own worker process (the apps share module names
+# such as `app`, `models` and `metrics`). The worker starts the service,
+# replaces its data with a deterministic dataset and drives the service's
+# request mix. It reports throughput, p50/p95/p99 latency and DB queries per
+# request, overall and per scenario. Results go to a JSON file. `compare`
+# checks two result files for regressions.
+#
+#     python benchmarks/run.py run --rows 100000 --requests 5000 --concurrency 32
+#     python benchmarks/run.py run --mode server --services fast_pagination,flask_pagination
+#     python benchmarks/run.py compare benchmarks/results/before.json benchmarks/results/after.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+MODES = ("inprocess", "server")
+MIN_ROWS, MAX_ROWS = 10_000, 1_000_000
+
+
+# worker (one service, in its own process)
+
+async def _inprocess_asgi(service, options, workdir):
+    app = service.load_app()
+    # httpx.ASGITransport does not send lifespan events; run startup/shutdown here
+    async with app.router.lifespan_context(app):
+        dataset, seed_seconds = _seed(service, options, workdir)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await _run_plan(client.request, service, dataset, options), dataset, seed_seconds
+
+
+async def _inprocess_wsgi(service, options, workdir):
+    app = service.load_app()
+    dataset, seed_seconds = _seed(service, options, workdir)
+    # WSGI apps are called synchronously; one thread per concurrent client
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(options["concurrency"]) as executor, \
+            httpx.Client(transport=httpx.WSGITransport(app=app), base_url="http://bench") as client:
+        def send(method, path, json=None):
+            return loop.run_in_executor(executor, partial(client.request, method, path, json=json))
+        return await _run_plan(send, service, dataset, options), dataset, seed_seconds
+
+
+async def _server(service, options, workdir):
+    if service.kind == "wsgi" and importlib.util.find_spec("gunicorn") is None:
+        raise RuntimeError("server mode for WSGI services needs gunicorn (pip install gunicorn)")
+    port = options["port"]
+    command = service.server_command(port, options["workers"], options["threads"])
+    process = subprocess.Popen(command, cwd=service.directory)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        _wait_for(base_url + service.probe, process)
+        dataset, seed_seconds = _seed(service, options, workdir)
+        limits = httpx.Limits(max_connections=options["concurrency"])
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            return await _run_plan(client.request, service, dataset, options), dataset, seed_seconds
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _wait_for(url: str, process, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not answer {url} within {timeout}s")
+
+
+def _seed(service, options, workdir):
+    started = time.perf_counter()
+    spec = DataSpec(options["rows"], options["seed"], options["distribution"])
+    dataset = service.seed(service.database(workdir), spec)
+    return dataset, round(time.perf_counter() - started, 3)
+
+
+async def _run_plan(send, service, dataset, options) -> dict:
+    warmup = request_plan(service, dataset, options["warmup"], options["seed"] + 1)
+    if warmup:
+        await drive(send, warmup, options["concurrency"])
+    plan = request_plan(service, dataset, options["requests"], options["seed"])
+    samples, elapsed = await drive(send, plan, options["concurrency"])
+    return report(samples, elapsed)
+
+
+def run_worker(name: str, options: dict, workdir: str) -> dict:
+    service = SERVICES[name]
+    os.environ.update(service.env(workdir))
+    # the apps resolve templates, schemas and logs relative to their directory
+    os.chdir(service.directory)
+    if options["mode"] == "server":
+        runner = _server
+    else:
+        runner = _inprocess_asgi if service.kind == "asgi" else _inprocess_wsgi
+    results, dataset, seed_seconds = asyncio.run(runner(service, options, workdir))
+    return {
+        "kind": service.kind,
+        "mix": {scenario: round(weight, 3) for scenario, weight in service.mix().items()},
+        "dataset": dataset.to_dict(),
+        "seed_seconds": seed_seconds,
+        **results,
+    }
+
+
+# parent: one worker process per service
+
+def run_service(name: str, options: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    result_path = os.path.join(workdir, "result.json")
+    log_path = os.path.join(workdir, "worker.log")
+    command = [sys.executable, os.path.abspath(__file__), "worker", name, json.dumps(options), workdir, result_path]
+    try:
+        with open(log_path, "w") as log:
+            status = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+        if status != 0:
+            with open(log_path) as log:
+                tail = log.read()[-2000:]
+            return {"error": f"worker exited with status {status}", "log": tail}
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> int:
+    names = list(SERVICES) if args.services == "all" else [name.strip() for name in args.services.split(",")]
+    unknown = [name for name in names if name not in SERVICES]
+    if unknown:
+        print("Unknown services: " + ", ".join(unknown) + " (choose from " + ", ".join(SERVICES) + ")", file=sys.stderr)
+        return 2
+    if not MIN_ROWS <= args.rows <= MAX_ROWS and not args.allow_any_size:
+        print(f"--rows must be between {MIN_ROWS} and {MAX_ROWS} (or pass --allow-any-size)", file=sys.stderr)
+        return 2
+
+    options = {key: getattr(args, key) for key in (
+        "mode", "rows", "seed", "distribution", "requests", "warmup", "concurrency", "port", "workers", "threads")}
+    results = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **options,
+        },
+        "services": {},
+    }
+    for name in names:
+        print(f"{name}: seeding {args.rows} rows, {args.requests} requests at concurrency {args.concurrency} ({args.mode})", flush=True)
+        result = results["services"][name] = run_service(name, options)
+        print("  " + _summary_line(result), flush=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, "{}-{}.json".format(datetime.now().strftime("%Y%m%d-%H%M%S"), args.mode))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 1 if any("error" in result for result in results["services"].values()) else 0
+
+
+def _summary_line(result: dict) -> str:
+    if "error" in result:
+        return "ERROR: " + result["error"] + "\n" + result.get("log", "")
+    overall = result["overall"]
+    latency = overall["latency_ms"]
+    return (
+        f"{overall['throughput_rps']} req/s, p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+        f"{overall['db_queries_per_request']} queries/req, {overall['errors']} errors"
+    )
+
+
+# compare
+
+def compare(args) -> int:
+    """Print throughput and p95 changes per service/scenario; exit 1 if any is worse than --threshold."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = 0
+    for name, result in current["services"].items():
+        before = baseline["services"].get(name)
+        if before is None or "error" in before or "error" in result:
+            continue
+        print(name)
+        rows = [("overall", before["overall"], result["overall"])]
+        rows += [(scenario, before["scenarios"][scenario], stats)
+                 for scenario, stats in result["scenarios"].items() if scenario in before["scenarios"]]
+        for label, old, new in rows:
+            rps = _change(old["throughput_rps"], new["throughput_rps"])
+            p95 = _change(old["latency_ms"]["p95"], new["latency_ms"]["p95"])
+            worse = rps < -args.threshold or p95 > args.threshold
+            regressions += worse
+            print(f"  {label:<16} req/s {old['throughput_rps']:>9} -> {new['throughput_rps']:<9} ({rps:+.1%})"
+                  f"  p95 {old['latency_ms']['p95']:>8} -> {new['latency_ms']['p95']:<8} ({p95:+.1%})"
+                  + ("  REGRESSION" if worse else ""))
+    differing = [key for key in ("rows", "distribution", "mode") if baseline["meta"].get(key) != current["meta"].get(key)]
+    if differing:
+        print("warning: the runs used different " + ", ".join("--" + key for key in differing), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old if old else 0.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the catalog services")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark services and write a JSON result file")
+    run_parser.add_argument("--services", default="all", help="comma separated: " + ", ".join(SERVICES))
+    run_parser.add_argument("--mode", choices=MODES, default="inprocess",
+                            help="inprocess: ASGI/WSGI transport in the worker; server: uvicorn/gunicorn on --port")
+    run_parser.add_argument("--rows", type=int, default=MIN_ROWS, help=f"cars to seed ({MIN_ROWS}-{MAX_ROWS})")
+    run_parser.add_argument("--allow-any-size", action="store_true", help="allow --rows outside the supported range")
+    run_parser.add_argument("--seed", type=int, default=0, help="seed for the dataset and the request plan")
+    run_parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf",
+                            help="zipf: skewed brands/models (datagen.py); uniform: the apps' own seeding pattern")
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--warmup", type=int, default=200)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--port", type=int, default=8095, help="server mode port")
+    run_parser.add_argument("--workers", type=int, default=1, help="server mode worker processes (keep 1 for fast_cars_catalog, which resets its DB per worker)")
+    run_parser.add_argument("--threads", type=int, default=8, help="server mode threads per gunicorn worker")
+    run_parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<mode>.json)")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative throughput drop or p95 increase counted as a regression")
+
+    worker_parser = commands.add_parser("worker")  # internal: one service, see run_service()
+    worker_parser.add_argument("service")
+    worker_parser.add_argument("options")
+    worker_parser.add_argument("workdir")
+    worker_parser.add_argument("result")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    if args.command == "compare":
+        return compare(args)
+    result = run_worker(args.service, json.loads(args.options), args.workdir)
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import sqlite3
+from datagen import DataSpec, cars, engines, graph_cars
+
+
+# Bulk loading of generated datasets into a service's SQLite file.
+#
+# The services seed themselves with a handful of random rows on startup.
+# The harness replaces those rows with a dataset from datagen.py, so two
+# runs with the same DataSpec query exactly the same data. Rows go in with
+# executemany in one transaction. Triggers on the tables (e.g. the
+# Fast_pagination full-text index) are dropped during the load and
+# recreated afterwards, and any FTS5 index is rebuilt once at the end.
+
+BATCH_SIZE = 10000
+
+CAR_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS {table} (id VARCHAR(50) PRIMARY KEY, brand VARCHAR(50), model VARCHAR(50), "
+    "transmission VARCHAR(20), price INTEGER, release_year INTEGER)"
+)
+
+GRAPHQL_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS engines (engine_id VARCHAR(36) PRIMARY KEY, name VARCHAR(50) NOT NULL, "
+    "capacity_cc INTEGER, horsepower INTEGER, torque INTEGER)",
+    "CREATE TABLE IF NOT EXISTS cars (car_id VARCHAR(36) PRIMARY KEY, brand VARCHAR(50) NOT NULL, "
+    "model VARCHAR(50) NOT NULL, transmission VARCHAR(20) NOT NULL, price INTEGER, release_year INTEGER, "
+    "description VARCHAR(50), engine_id VARCHAR(36) REFERENCES engines (engine_id))",
+    "CREATE TABLE IF NOT EXISTS features (feature_id VARCHAR(36) PRIMARY KEY, name VARCHAR(50) NOT NULL, "
+    "installation_price INTEGER, car_id VARCHAR(36) REFERENCES cars (car_id))",
+)
+
+
+class Dataset:
+    """What the request mixes need to know about the seeded data."""
+
+    def __init__(self, rows: int, spec: DataSpec, sample: list):
+        self.rows = rows
+        self.spec = spec
+        # {"id", "brand", "price"} of cars spread over the whole table
+        self.sample = sample
+
+    def to_dict(self) -> dict:
+        return dict(self.spec.to_dict(), rows=self.rows)
+
+
+def _batches(records, size: int = BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_sql(table: str, columns: list) -> str:
+    return "INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(columns), ", ".join("?" * len(columns)))
+
+
+def _insert(conn, table: str, records) -> int:
+    count = 0
+    sql = None
+    for batch in _batches(records):
+        if sql is None:
+            columns = list(batch[0])
+            sql = _insert_sql(table, columns)
+        conn.executemany(sql, [tuple(record[c] for c in columns) for record in batch])
+        count += len(batch)
+    return count
+
+
+def _sampled(records, sample: list, key: str, step: int):
+    """Pass `records` through, keeping every `step`-th one (id, brand, price) in `sample`."""
+    for i, record in enumerate(records):
+        if i % step == 0:
+            sample.append({"id": record[key], "brand": record["brand"], "price": record["price"]})
+        yield record
+
+
+def _step(rows: int, sample_size: int) -> int:
+    # cars spread over the whole table, not just its first rows
+    return max(1, rows // sample_size)
+
+
+def _without_triggers(conn, tables: tuple, load):
+    """Run `load()` with the triggers on `tables` dropped, then restore them and rebuild FTS5 indexes."""
+    placeholders = ", ".join("?" * len(tables))
+    triggers = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})", tables
+    ).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    result = load()
+    for _, sql in triggers:
+        conn.execute(sql)
+    fts_tables = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%USING fts5%'"
+    ).fetchall()
+    for (name,) in fts_tables:
+        conn.execute(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+    return result
+
+
+def create_tables(path: str, layout: str = 'car', table: str = 'car'):
+    """Create the tables of `layout` if missing (without the services' secondary indexes)."""
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for ddl in ([CAR_TABLE_DDL.format(table=table)] if layout == 'car' else GRAPHQL_TABLE_DDL):
+                conn.execute(ddl)
+    finally:
+        conn.close()
+
+
+def seed_cars(path: str, spec: DataSpec, table: str = 'car', sample_size: int = 1000) -> Dataset:
+    """Replace the rows of the catalog `car` table with the cars of `spec`."""
+    sample = []
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            def load():
+                conn.execute(f"DELETE FROM {table}")
+                return _insert(conn, table, _sampled(cars(spec), sample, "id", _step(spec.rows, sample_size)))
+            inserted = _without_triggers(conn, (table,), load)
+    finally:
+        conn.close()
+    return Dataset(inserted, spec, sample)
+
+
+def seed_graphql(path: str, spec: DataSpec, sample_size: int = 1000) -> Dataset:
+    """Replace the FlaskGraphQL engines, cars and features with the graph of `spec`."""
+    sample = []
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            def load():
+                for table in ("features", "cars", "engines"):
+                    conn.execute(f"DELETE FROM {table}")
+                engine_ids = []
+
+                def engine_rows():
+                    for engine in engines(spec):
+                        engine_ids.append(engine["engine_id"])
+                        yield engine
+                _insert(conn, "engines", engine_rows())
+
+                # cars and their features go in batch by batch, cars first
+                inserted = 0
+                graph = _sampled_graph(graph_cars(spec, engine_ids), sample, _step(spec.rows, sample_size))
+                for batch in _batches(graph):
+                    inserted += _insert(conn, "cars", (car for car, _ in batch))
+                    _insert(conn, "features", (feature for _, features in batch for feature in features))
+                return inserted
+            inserted = _without_triggers(conn, ("features", "cars", "engines"), load)
+    finally:
+        conn.close()
+    return Dataset(inserted, spec, sample)
+
+
+def _sampled_graph(graph, sample: list, step: int):
+    for i, (car, features) in enumerate(graph):
+        if i % step == 0:
+            sample.append({"id": car["car_id"], "brand": car["brand"], "price": car["price"]})
+        yield car, features
@@ -0,0 +1,189 @@
+import os
+import sys
+from urllib.parse import urlencode
+from seed import seed_cars, seed_graphql
+
+
+# The five catalog services, how to start them and which requests they can
+# serve. Some services run twice: FlaskGraphQL as its WSGI and ASGI apps,
+# Fast_Cars_Catalog with DB_MODE=sync and DB_MODE=async.
+#
+# Each scenario is a function `(rng, dataset) -> (method, path, json body)`.
+# Filters and ids come from cars sampled out of the seeded data, so hot
+# brands are queried more often than the long tail. Services leave out
+# scenarios they have no endpoint for, and the mix weights are renormalized
+# over the ones they do have.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE_SIZE = 20
+
+# Share of each scenario in the request mix
+MIX = {
+    "deep_page": 0.25,
+    "multisort": 0.20,
+    "filtered": 0.25,
+    "by_id": 0.20,
+    "graphql_nested": 0.10,
+}
+
+
+class Service:
+    """One catalog app: where it lives, how to import or serve it, how to seed it."""
+
+    def __init__(self, name, directory, kind, target, database, scenarios, seed=seed_cars, env=None, probe="/metrics"):
+        self.name = name
+        self.directory = os.path.join(ROOT, directory)
+        self.kind = kind            # "asgi" or "wsgi"
+        self.target = target        # "module:attribute", or "module:factory()"
+        self.database = database    # workdir -> SQLite file the app uses
+        self.scenarios = scenarios
+        self.seed = seed
+        self.env = env or (lambda workdir: {})
+        self.probe = probe
+
+    def mix(self) -> dict:
+        weights = {name: MIX[name] for name in self.scenarios}
+        total = sum(weights.values())
+        return {name: weight / total for name, weight in weights.items()}
+
+    def load_app(self):
+        """Import the app in this process (the service directory goes first on sys.path)."""
+        sys.path.insert(0, self.directory)
+        module_name, attribute = self.target.split(":")
+        module = __import__(module_name, fromlist=["_"])
+        if attribute.endswith("()"):
+            return getattr(module, attribute[:-2])()
+        return getattr(module, attribute)
+
+    def server_command(self, port: int, workers: int, threads: int) -> list:
+        if self.kind == "asgi":
+            return [
+                sys.executable, "-m", "uvicorn", self.target, "--app-dir", self.directory,
+                "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+            ]
+        # --preload imports (and seeds) the app once, before the workers fork
+        return [
+            sys.executable, "-m", "gunicorn", self.target, "--pythonpath", self.directory, "--preload",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--worker-class", "gthread",
+            "--threads", str(threads), "--log-level", "warning",
+        ]
+
+
+# Request builders
+
+def _page(rng, dataset) -> int:
+    # deep pages: somewhere in the second half of the catalog
+    pages = max(1, dataset.rows // PAGE_SIZE)
+    return rng.randint(pages // 2 + 1, pages) if pages > 1 else 1
+
+
+def _price_band(car: dict) -> tuple:
+    # +-10% around a real price, so the band is never empty
+    return int(car["price"] * 0.9), int(car["price"] * 1.1)
+
+
+def _filter_params(rng, dataset) -> dict:
+    car = rng.choice(dataset.sample)
+    price, price_max = _price_band(car)
+    return {"brand": car["brand"], "price_operator": "between", "price": price, "price_max": price_max}
+
+
+def _get(path: str, **params) -> tuple:
+    return "GET", path + "?" + urlencode(params), None
+
+
+def rest_scenarios(page_path: str, multisort_path: str, by_id_path: str = None) -> dict:
+    scenarios = {
+        "deep_page": lambda rng, ds: _get(page_path, page=_page(rng, ds), size=PAGE_SIZE),
+        "multisort": lambda rng, ds: _get(
+            multisort_path, page=_page(rng, ds), size=PAGE_SIZE, sort_by="brand,price", sort_direction="asc,desc"),
+        "filtered": lambda rng, ds: _get(page_path, **_filter_params(rng, ds), sort_by="price", size=PAGE_SIZE),
+    }
+    if by_id_path:
+        scenarios["by_id"] = lambda rng, ds: ("GET", by_id_path.format(id=rng.choice(ds.sample)["id"]), None)
+    return scenarios
+
+
+CAR_FIELDS = "brand model price engine { name horsepower } features { name installation_price }"
+
+def _graphql_filter(rng, dataset) -> dict:
+    car = rng.choice(dataset.sample)
+    price_min, price_max = _price_band(car)
+    return {"brand": car["brand"], "price_min": price_min, "price_max": price_max}
+
+
+GRAPHQL_SCENARIOS = {
+    "filtered": lambda rng, ds: ("POST", "/graphql", {
+        "query": "query($filter: CarFilter) { carsConnection(first: %d, filter: $filter, orderBy: {field: PRICE}) "
+                 "{ edges { node { brand price } } } }" % PAGE_SIZE,
+        "variables": {"filter": _graphql_filter(rng, ds)},
+    }),
+    "by_id": lambda rng, ds: ("POST", "/graphql", {
+        "query": "query($id: String!) { find_car_by_id(car_id: $id) { %s } }" % CAR_FIELDS,
+        "variables": {"id": rng.choice(ds.sample)["id"]},
+    }),
+    "graphql_nested": lambda rng, ds: ("POST", "/graphql", {
+        "query": "query($brand: String) { carsConnection(first: %d, filter: {brand: $brand}, "
+                 "orderBy: {field: PRICE, direction: DESC}) { totalCount edges { node { %s } } } }" % (PAGE_SIZE, CAR_FIELDS),
+        "variables": {"brand": rng.choice(ds.sample)["brand"]},
+    }),
+}
+
+
+def _database_url(scheme: str, name: str):
+    # services that read DATABASE_URL get a fresh file in the run's work directory
+    return lambda workdir: {"DATABASE_URL": f"{scheme}:///" + os.path.join(workdir, name)}
+
+
+def _instance_db(directory: str, name: str):
+    # Flask-SQLAlchemy puts a relative sqlite:/// path in the app's instance folder
+    return lambda workdir: os.path.join(ROOT, directory, "instance", name)
+
+
+SERVICES = {
+    service.name: service for service in (
+        Service(
+            "fast_pagination", "Fast_pagination", "asgi", "app:app",
+            database=lambda workdir: os.path.join(workdir, "carcatalog.db"),
+            env=_database_url("sqlite+aiosqlite", "carcatalog.db"),
+            scenarios=rest_scenarios("/api/cars", "/api/multisort", "/api/cars/{id}"),
+        ),
+        Service(
+            "fast_cars_catalog", "Fast_Cars_Catalog", "asgi", "app:app",
+            database=lambda workdir: os.path.join(workdir, "carcatlog.db"),
+            env=_database_url("sqlite", "carcatlog.db"),
+            scenarios=rest_scenarios(
+                "/v1/carsdetails/requests/getcarsbypage", "/v1/carsdetails/requests/getcarsbypagebymultisort"),
+        ),
+        Service(
+            "fast_cars_catalog_async", "Fast_Cars_Catalog", "asgi", "app:app",
+            database=lambda workdir: os.path.join(workdir, "carcatlog.db"),
+            env=lambda workdir: dict(_database_url("sqlite", "carcatlog.db")(workdir), DB_MODE="async"),
+            scenarios=rest_scenarios(
+                "/v1/carsdetails/requests/getcarsbypage", "/v1/carsdetails/requests/getcarsbypagebymultisort"),
+        ),
+        Service(
+            "flask_pagination", "Flask_Pagination", "wsgi", "app:app",
+            database=_instance_db("Flask_Pagination", "carcatlog.db"),
+            scenarios=rest_scenarios("/api/cars", "/api/multisort"),
+        ),
+        Service(
+            "cars_catalog", "cars_catalog", "wsgi", "app:create_app()",
+            database=_instance_db("cars_catalog", "carcatlog.db"),
+            scenarios=rest_scenarios(
+                "/v1/carsdetails/requests/getcarsbypage", "/v1/carsdetails/requests/getcarsbypagebymultisort"),
+        ),
+        Service(
+            "flaskgraphql", "FlaskGraphQL", "wsgi", "app:app",
+            database=_instance_db("FlaskGraphQL", "cars.db"),
+            scenarios=GRAPHQL_SCENARIOS, seed=seed_graphql,
+        ),
+        Service(
+            "flaskgraphql_asgi", "FlaskGraphQL", "asgi", "asgi:app",
+            database=lambda workdir: os.path.join(workdir, "cars.db"),
+            env=_database_url("sqlite+aiosqlite", "cars.db"),
+            scenarios=GRAPHQL_SCENARIOS, seed=seed_graphql,
+        ),
+    )
+}
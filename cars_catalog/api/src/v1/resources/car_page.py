@@ -0,0 +1,37 @@
+import math
+from flask import request
+from api.models.models import Car, db
+from api.models.query_builder import CarQuery
+
+car_query = CarQuery(Car, entities=True)
+
+
+def car_spec_from_args():
+    price_value = request.args.get('price', 0, type = int)
+
+    return car_query.spec(
+        brand = request.args.get('brand', '%'),
+        model = request.args.get('model', '%'),
+        transmission = request.args.get('transmission', '%'),
+        price_operator = request.args.get('price_operator'),
+        price = price_value,
+        price_max = request.args.get('price_max', price_value + 1, type = int),
+        sort_by = request.args.get('sort_by'),
+        sort_direction = request.args.get('sort_direction', 'asc')
+    )
+
+
+def fetch_car_page(spec, page, size):
+    stmt, params = car_query.count(spec)
+    total = db.session.execute(stmt, params).scalar_one()
+
+    stmt, params = car_query.page(spec, (page - 1) * size, size)
+    cars = db.session.execute(stmt, params).scalars().all()
+
+    return {
+        'data': [car.to_json() for car in cars],
+        'page': page,
+        'size': size,
+        'total_elements': total,
+        'total_page': math.ceil(total / size)
+    }
@@ -0,0 +1,63 @@
+import io
+import csv
+import json
+from flask import Response, jsonify, make_response, request, stream_with_context
+from flask_restful import Resource
+from sqlalchemy import select
+from api.models.models import Car, db
+
+# Rows fetched from the cursor per batch; memory use is bounded by one batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def ndjson_chunks(columns, partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def csv_chunks(columns, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_cars(fmt, batch_size = EXPORT_BATCH_SIZE):
+    columns = [c.name for c in Car.__table__.columns]
+    stmt = select(*Car.__table__.columns).execution_options(stream_results = True, yield_per = batch_size)
+    encode = ndjson_chunks if fmt == 'ndjson' else csv_chunks
+
+    result = db.session.execute(stmt)
+    try:
+        yield from encode(columns, result.partitions())
+    finally:
+        result.close()
+
+
+class ExportCars(Resource):
+    """
+    Stream the whole car catalog without loading it into memory.
+    Accepted url parms below
+    format: ndjson (default) or csv
+    """
+    def get(self):
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return make_response(jsonify({'error': 'Invalid export format: ' + fmt}), 400)
+
+        return Response(
+            stream_with_context(stream_cars(fmt)),
+            mimetype = EXPORT_FORMATS[fmt],
+            headers = {'Content-Disposition': 'attachment; filename="cars.' + fmt + '"'}
+        )
@@ -1,6 +1,7 @@
 import os
 from flask import jsonify, make_response
 from flask_restful import Resource, Api
+from db_pool import PoolTimeout, flask_pool_timeout_response
 from api.models.models import Car
 
 
@@ -12,5 +13,7 @@ class GetCars(Resource):
             cars_response = [car.to_json() for car in cars]
     
             return make_response(jsonify(cars_response), 200)
+        except PoolTimeout:
+            return flask_pool_timeout_response()
         except Exception as e:
             return {'error': str(e)}
\ No newline at end of file
@@ -1,8 +1,8 @@
 import os
 from flask import jsonify, make_response, request
 from flask_restful import Resource, Api
-from api.models.models import Car
-from sqlalchemy import and_, text
+from db_pool import PoolTimeout, flask_pool_timeout_response
+from .car_page import car_spec_from_args, fetch_car_page
 
 class GetCarsByPage(Resource):
     """
@@ -23,49 +23,20 @@ class GetCarsByPage(Resource):
         try:
             page = request.args.get('page', 1, type = int)
             size = request.args.get('size', 10, type = int)
-            brand = request.args.get('brand', '%')
-            model = request.args.get('model', '%')
-            transmission = request.args.get('transmission', '%')
-        
-            price_operator = request.args.get('price_operator')
-            price_value = request.args.get('price', 0, type = int)
-            price_max_value = request.args.get('price_max', price_value + 1, type = int)
 
             sort_by = request.args.get('sort_by')
-            sort_direction = request.args.get('sort_direction', 'asc')
+            if sort_by and ',' in sort_by:
+                raise ValueError('Invalid sort field: ' + sort_by)
 
-            query = Car.query
-        
-            query = query.filter( \
-                    and_( \
-                        Car.brand.ilike('%' + brand + '%'), \
-                        Car.model.ilike('%' + model + '%'), \
-                        Car.transmission.ilike('%' + transmission + '%') \
-                    ) \
-                ) \
+            if page < 1 or size < 1:
+                raise ValueError('page and size must be positive')
 
-            if price_operator == 'lte':
-                query = query.filter(Car.price <= price_value)
-            elif price_operator == 'gte':
-                query = query.filter(Car.price >= price_value)
-            elif price_operator == 'between':
-                query = query.filter(Car.price >= price_value, Car.price <= price_max_value)
-        
-            if sort_by and sort_direction == 'asc':
-                query = query.order_by( getattr(Car, sort_by).asc() );
-            elif sort_by and sort_direction == 'desc':
-                query = query.order_by( getattr(Car, sort_by).desc() );
-            cars = query.paginate(page = page, per_page = size)
-        
-            cars_response = [car.to_json() for car in cars.items]
+            spec = car_spec_from_args()
 
-            return make_response(jsonify({
-                'data': cars_response, 
-                'page': page, 
-                'size': size, 
-                'total_elements': cars.total, 
-                'total_page': cars.pages
-            }), 200)
+            return make_response(jsonify(fetch_car_page(spec, page, size)), 200)
 
+        except PoolTimeout:
+            # Flask-RESTful would turn it into a 500; answer 503 here
+            return flask_pool_timeout_response()
         except Exception as e:
             return make_response(jsonify({'error': str(e)}), 400)
\ No newline at end of file
@@ -4,8 +4,10 @@ from flask_restful import Api
 from .resources.get_cars import GetCars
 from .resources.getcars_bypage import GetCarsByPage
 from .resources.getcars_multisort import GetCarsByMultiSort
+from .resources.export_cars import ExportCars
 
 request_bp = Blueprint('requests', __name__, url_prefix='/requests')
 Api(request_bp).add_resource(GetCars, '/getcars')
 Api(request_bp).add_resource(GetCarsByPage, '/getcarsbypage')
-Api(request_bp).add_resource(GetCarsByMultiSort, '/getcarsbypagebymultisort')
\ No newline at end of file
+Api(request_bp).add_resource(GetCarsByMultiSort, '/getcarsbypagebymultisort')
+Api(request_bp).add_resource(ExportCars, '/export')
\ No newline at end of file
@@ -2,13 +2,17 @@ import os
 import uuid
 import random
 from flask import Flask, render_template, redirect, request, url_for, jsonify, make_response
-from sqlalchemy import and_, text
+from sqlalchemy import insert
 from api.models.models import Car, db
+from metrics import init_flask
+import db_pool
 
 
 app = Flask(__name__)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///carcatlog.db"
+# Pool sizing, pre-ping and pool metrics from the DB_POOL_* settings (see db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SECRET_KEY'] = 'mysecretkey'
 app.config['SESSION_COOKIE_SAMESITE'] = 'None'
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -17,6 +21,11 @@ app.config['PREFERRED_URL_SCHEME'] = 'https'
 
 db.init_app(app)
 
+# /metrics and Server-Timing (see metrics.py)
+init_flask(app)
+# 503 with Retry-After when no pooled connection frees up in time
+db_pool.init_flask(app)
+
 
 @app.route('/', methods=['GET'])
 def index():
@@ -27,6 +36,8 @@ def create_app():
         db.drop_all()
         db.create_all()
 
+        # Seed in one executemany and one commit instead of a commit per row
+        rows = []
         for i in range(1, 101):
             if i <= 33:
                 brand = 'Honda'
@@ -45,9 +56,11 @@ def create_app():
             price = random.randint(30000, 80000)
             release_year = 2020 + (i % 3)
 
-            car = Car( str(uuid.uuid4()), brand, model, transmission, price, release_year )
-            db.session.add(car)
-            db.session.commit()
+            rows.append({ 'id': str(uuid.uuid4()), 'brand': brand, 'model': model,
+                'transmission': transmission, 'price': price, 'release_year': release_year })
+
+        db.session.execute(insert(Car), rows)
+        db.session.commit()
 
     return app
 from api.src.v1 import v1_bp
@@ -0,0 +1,219 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+# Non-blocking, structured logging.
+#
+# The handlers that do I/O (a rotating file and the console) run on a
+# QueueListener thread. Code that logs only formats the message and puts
+# the record on a bounded queue, so disk writes and log rotation no longer
+# stall the event loop. When the writer falls behind and the queue is full,
+# records are dropped and counted rather than blocking the caller.
+#
+# Records are written as one JSON object per line: time, level, logger,
+# message, plus any `extra={...}` fields. INFO records that carry an
+# `endpoint` field can be sampled per endpoint; the sample rate is written
+# with each kept record.
+#
+# setup_logging() is idempotent. Calling it again for the same logger (a
+# module reload, a second import, a Streamlit rerun) returns the logger
+# already set up instead of adding another handler.
+
+LOG_FORMATS = ("json", "text")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+# LogRecord attributes that are not `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_setups = {}
+_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the record's `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def parse_sample_rates(value: str) -> dict:
+    """`"find_cars=0.1,getcars=0.5"` -> {"find_cars": 0.1, "getcars": 0.5}"""
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        endpoint, _, rate = item.partition("=")
+        try:
+            rates[endpoint.strip()] = float(rate)
+        except ValueError:
+            raise ValueError(f"Invalid log sample rate: {item.strip()!r}") from None
+        if not 0 <= rates[endpoint.strip()] <= 1:
+            raise ValueError(f"Log sample rate out of range [0, 1]: {item.strip()!r}")
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the INFO (and lower) records of each sampled endpoint."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "endpoint", None))
+        if rate is None or record.levelno > logging.INFO:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that never blocks: records that do not fit are counted in `dropped`."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Like QueueHandler.prepare, but the traceback stays in exc_text for the
+        # formatter on the other side instead of being folded into the message.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class LogSetup:
+    """What one setup_logging() call attached: the logger, its queue handler and listener, and the writers."""
+
+    def __init__(self, logger, writers: list, handler=None, listener=None, sampling=None):
+        self.logger = logger
+        self.writers = writers
+        self.handler = handler
+        self.listener = listener
+        self.sampling = sampling
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped if self.handler is not None else 0
+
+    def close(self):
+        if self.listener is not None:
+            # writes out the records still queued
+            self.listener.stop()
+        for handler in (self.handler, *self.writers):
+            if handler is not None:
+                self.logger.removeHandler(handler)
+                handler.close()
+        if self.sampling is not None:
+            self.logger.removeFilter(self.sampling)
+
+
+def make_formatter(fmt: str) -> logging.Formatter:
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Invalid log format: {fmt!r} (expected one of {', '.join(LOG_FORMATS)})")
+    return JSONFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logging(
+    name: str,
+    filename: str = None,
+    *,
+    level=logging.INFO,
+    fmt: str = "json",
+    console: bool = True,
+    sample_rates: dict = None,
+    queued: bool = True,
+    queue_size: int = 10000,
+    max_bytes: int = 5 * 1024 * 1024,
+    backup_count: int = 5,
+) -> logging.Logger:
+    """Log `name` to a rotating `filename` (None: no file) and/or stderr, through a queue.
+
+    `queued=False` attaches the handlers to the logger directly (blocking),
+    which bench_logging.py uses as the baseline.
+    """
+    with _lock:
+        existing = _setups.get(name)
+        if existing is not None:
+            return existing.logger
+
+        formatter = make_formatter(fmt)
+        writers = []
+        if filename:
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            writers.append(RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count))
+        if console:
+            writers.append(logging.StreamHandler(sys.stderr))
+        for writer in writers:
+            writer.setFormatter(formatter)
+
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        sampling = None
+        if sample_rates:
+            # sampled-out records are dropped before they are queued or written
+            sampling = SamplingFilter(sample_rates)
+            logger.addFilter(sampling)
+        if queued:
+            handler = DroppingQueueHandler(queue.Queue(queue_size))
+            listener = QueueListener(handler.queue, *writers, respect_handler_level=True)
+            listener.start()
+            logger.addHandler(handler)
+            _setups[name] = LogSetup(logger, writers, handler, listener, sampling)
+        else:
+            for writer in writers:
+                logger.addHandler(writer)
+            _setups[name] = LogSetup(logger, writers, sampling=sampling)
+        return logger
+
+
+def get_setup(name: str) -> LogSetup:
+    return _setups.get(name)
+
+
+def shutdown_logging(name: str = None):
+    """Flush and close the setups (all of them by default); setup_logging() may be called again."""
+    with _lock:
+        for setup_name in ([name] if name is not None else list(_setups)):
+            setup = _setups.pop(setup_name, None)
+            if setup is not None:
+                setup.close()
+
+
+# write out whatever is still queued when the process exits
+atexit.register(shutdown_logging)
@@ -1,8 +1,7 @@
 import os
 from pathlib import Path
-import logging
 import configparser
-from logging.handlers import RotatingFileHandler
+from .queue_logging import setup_logging
 
 
 def read_config():
@@ -22,22 +21,19 @@ def read_config():
 
 
 def applogger(config_dict):
+    """The app logger, writing to the configured rotating file from a background thread.
 
+    Streamlit reruns app.py on every interaction; later calls return the
+    logger set up by the first one instead of adding another handler.
+    """
     logs_dir = config_dict['Log']['path']
     logs_filename = config_dict['Log']['filename']
 
-    os.makedirs(logs_dir, exist_ok=True)
-    log_path = os.path.join(logs_dir, logs_filename)
-
-    handler = RotatingFileHandler(
-        log_path, maxBytes=5*1024*1024, backupCount=5
+    return setup_logging(
+        "my_streamlit_logger",
+        os.path.join(logs_dir, logs_filename),
+        fmt=config_dict['Log'].get('format', 'json'),
+        console=False,
+        max_bytes=5*1024*1024,
+        backup_count=5,
     )
-
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-
-    logger = logging.getLogger("my_streamlit_logger")
-    logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
-
-    return logger